@@ -82,11 +82,12 @@ def get_column_map(csv_path: str) -> dict:
     return col_map
 
 # returns a list of files it modified
+# files are written together once the whole CSV has been applied - and only if their contents changed
 def modify_from_csv(path: str, key_map: dict, create_files: bool=False) -> list[str]:
     rows = []
     filenames = []
 
-    with open(path, newline="") as csvfile:
+    with open(path, newline="") as csvfile, yaml_io.AssetWriter() as writer:
         reader = csv.reader(csvfile, delimiter=',', quotechar='"')
 
         # skip header row?
@@ -97,20 +98,20 @@ def modify_from_csv(path: str, key_map: dict, create_files: bool=False) -> list[
             filename = f"{YAML_DIR}{row[key_map['hostname']]}.{row[key_map['domain']]}.yaml"
             filenames.append(filename)
 
-            if create_files:
+            # an earlier row for the same asset hasn't been written yet - keep building on it
+            asset = writer.get(filename)
+
+            if asset is None and create_files:
                 # check if the new file is already tracked
                 if chk_file_tracked(filename):
                     # skip the asset if it already exists
                     continue
 
-
-                # create a blank yaml file
+                # start from a blank asset - it's written out with the rest of the batch
                 asset = yaml_io.Asset(fqdn=f"{row[key_map['hostname']]}.{row[key_map['domain']]}")
-                yaml_io.write_yaml(asset, filename)
-
-            # load the file
-            # TODO does this work in the constructor?
-            asset = yaml_io.Asset(file=filename)
+            elif asset is None:
+                # load the file
+                asset = yaml_io.Asset(file=filename)
 
             # modify the fields
             for key in key_map:
@@ -123,8 +124,8 @@ def modify_from_csv(path: str, key_map: dict, create_files: bool=False) -> list[
                         continue
                     asset.put(key, cell)
 
-            # write back to the file
-            yaml_io.write_yaml(asset, filename)
+            # queue the write back to the file
+            writer.add(asset, filename)
 
     return filenames
 
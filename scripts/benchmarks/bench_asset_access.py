@@ -0,0 +1,100 @@
+#!/bin/python3
+
+# a microbenchmark comparing yaml_io.Asset field access against the
+# old flatten + unflatten implementation of get() and put()
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_asset_access.py
+
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+
+import yaml_io
+import dict_utils
+
+# the tags a typical validation pass reads for each asset
+READ_KEYS = [
+    "hardware.condo_chassis.identifier",
+    "tags.uw",
+    "acquisition.date",
+    "acquisition.po",
+    "location.rack",
+    "hardware.model",
+]
+
+# the old Asset.get() - flattens and rebuilds the whole asset per call
+def legacy_get(asset: yaml_io.Asset, key: str):
+    flat = dict_utils.flatten_dict(asset.asset)
+    ret = flat[key]
+    asset.asset = dict_utils.unflatten_dict(flat)
+    return ret
+
+# the old Asset.put()
+def legacy_put(asset: yaml_io.Asset, key: str, value: str):
+    flat = dict_utils.flatten_dict(asset.asset)
+    flat[key] = value
+    asset.asset = dict_utils.unflatten_dict(flat)
+
+def make_assets(count: int) -> list[yaml_io.Asset]:
+    assets = []
+    for i in range(count):
+        asset = yaml_io.Asset(fqdn=f"bench{i}.chtc.wisc.edu")
+        asset.put_many({
+            "location.rack" : f"R{i % 40}",
+            "location.elevation" : str(i % 42),
+            "hardware.model" : "Dell PowerEdge R640",
+            "acquisition.po" : f"PO{i // 16}",
+        })
+        assets.append(asset)
+
+    return assets
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", help="number of assets to benchmark against", type=int, default=2000)
+    parser.add_argument("-r", "--repeat", help="number of timed repetitions (best is reported)", type=int, default=5)
+    args = parser.parse_args()
+
+    assets = make_assets(args.count)
+
+    def run_legacy_get():
+        for asset in assets:
+            for key in READ_KEYS:
+                legacy_get(asset, key)
+
+    def run_get():
+        for asset in assets:
+            for key in READ_KEYS:
+                asset.get(key)
+
+    def run_get_many():
+        for asset in assets:
+            asset.get_many(READ_KEYS)
+
+    def run_legacy_put():
+        for asset in assets:
+            legacy_put(asset, "hardware.notes", "benchmarked")
+
+    def run_put():
+        for asset in assets:
+            asset.put("hardware.notes", "benchmarked")
+
+    cases = [
+        ("get (flatten/unflatten)", run_legacy_get),
+        ("get (compiled path)", run_get),
+        ("get_many (compiled path)", run_get_many),
+        ("put (flatten/unflatten)", run_legacy_put),
+        ("put (compiled path)", run_put),
+    ]
+
+    print(f"{args.count} assets, {len(READ_KEYS)} reads per asset")
+    for name, fun in cases:
+        best = min(timeit.repeat(fun, number=1, repeat=args.repeat))
+        print(f"{name:<28} {best * 1000:10.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/bin/python3
+
+# compares ways of classifying asset values as "missing" on a realistic value
+# distribution: every column of a synthetic inventory, with a share of each column
+# replaced by the usual ways of writing "missing" ("", "none", "???", ...)
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_missing_values.py
+
+import os
+import sys
+import re
+import random
+import timeit
+import argparse
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import dict_utils
+import missing_values
+import synthetic
+
+# builds one list of values per tag - share of each column is swapped for a missing spelling
+def make_columns(count: int, share: float, seed: int=0) -> dict:
+    rng = random.Random(seed)
+    columns = dict()
+
+    for asset in synthetic.make_asset_dicts(count, seed):
+        for tag, value in dict_utils.flatten_dict(asset).items():
+            if rng.random() < share:
+                value = rng.choice(synthetic.MISSING_SPELLINGS)
+            columns.setdefault(tag, []).append(value)
+
+    return columns
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", help="number of synthetic assets", type=int, default=20000)
+    parser.add_argument("-s", "--share", help="share of values replaced with a missing spelling", type=float, default=0.1)
+    parser.add_argument("-r", "--repeat", help="number of timed repetitions (best is reported)", type=int, default=3)
+    args = parser.parse_args()
+
+    columns = make_columns(args.count, args.share)
+    values = [value for column in columns.values() for value in column]
+
+    # the old way - an uncompiled pattern looked up in re's cache on every call
+    legacy = lambda: [re.fullmatch(missing_values.MISSING_RXP, str(value)) is not None for value in values]
+    compiled = lambda: [missing_values.MISSING_PATTERN.fullmatch(str(value)) is not None for value in values]
+    memoized = lambda: [missing_values.is_missing(value) for value in values]
+    batch = lambda: [flag for column in columns.values() for flag in missing_values.missing_mask(column)]
+
+    expected = legacy()
+    cases = [
+        ("re.fullmatch(MISSING_RXP)", legacy),
+        ("MISSING_PATTERN.fullmatch", compiled),
+        ("is_missing() (memoized)", memoized),
+        ("missing_mask() per column", batch),
+    ]
+
+    distinct = len(set(str(value) for value in values))
+    print(f"{len(values)} values ({distinct} distinct) from {args.count} assets, {sum(expected)} missing")
+
+    for name, fun in cases:
+        if fun() != expected:
+            print(f"{name} disagrees with the regex")
+            exit(1)
+
+        best = min(timeit.repeat(fun, number=1, repeat=args.repeat))
+        print(f"{name:<28} {best * 1000:10.2f} ms {len(values) / best:14.0f} values/s")
+
+if __name__ == "__main__":
+    main()
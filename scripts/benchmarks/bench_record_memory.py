@@ -0,0 +1,68 @@
+#!/bin/python3
+
+# compares the per-asset memory use and field access speed of
+# yaml_io.Asset (nested dicts) against asset_record.AssetRecord (slots)
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_record_memory.py
+
+import os
+import sys
+import gc
+import timeit
+import argparse
+import tracemalloc
+import yaml
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import yaml_io
+import asset_record
+import synthetic
+
+# returns the number of bytes still allocated after calling build()
+# along with build()'s result (which must be kept alive to be measured)
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    result = build()
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before, result)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", help="number of synthetic assets", type=int, default=20000)
+    args = parser.parse_args()
+
+    # parse documents the same way read_yaml() does - so strings aren't shared between assets
+    docs = [yaml_io.dump_asset(a) for a in synthetic.make_asset_dicts(args.count)]
+    load = lambda doc: yaml.load(doc, Loader=yaml_io.AssetLoader)
+
+    dict_bytes, assets = measure(lambda: [yaml_io.Asset(f"bench{i}.yaml", data=load(doc)) for i, doc in enumerate(docs)])
+
+    # records are built straight from the parsed dicts, which are then dropped
+    record_bytes, records = measure(lambda: [asset_record.AssetRecord.from_dict(f"bench{i}", load(doc), f"bench{i}.yaml") for i, doc in enumerate(docs)])
+
+    print(f"{args.count} assets")
+    print(f"{'Asset (nested dict)':<24} {dict_bytes / args.count:10.0f} bytes/asset")
+    print(f"{'AssetRecord (slots)':<24} {record_bytes / args.count:10.0f} bytes/asset")
+    print(f"{'saved':<24} {100 * (1 - record_bytes / dict_bytes):10.1f} %")
+
+    # time reading the tags a validation pass looks at
+    read_dict = lambda: [(a.get("location.rack"), a.get("tags.uw"), a.get("acquisition.date")) for a in assets]
+    read_record = lambda: [(r.location_rack, r.tags_uw, r.acquisition_date) for r in records]
+    read_record_get = lambda: [(r.get("location.rack"), r.get("tags.uw"), r.get("acquisition.date")) for r in records]
+
+    for name, fun in [("Asset.get()", read_dict), ("AssetRecord.get()", read_record_get), ("AssetRecord attributes", read_record)]:
+        best = min(timeit.repeat(fun, number=1, repeat=3))
+        print(f"{name:<24} {best * 1000:10.2f} ms for 3 reads/asset")
+
+if __name__ == "__main__":
+    main()
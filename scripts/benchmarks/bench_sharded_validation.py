@@ -0,0 +1,59 @@
+#!/bin/python3
+
+# times a full integrity check (every rule in check_data.RULES) on a large synthetic
+# inventory with the pass split across 1, 2, 4, and 8 worker processes
+# every run must report exactly the same errors, in the same order, as the single process run
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_sharded_validation.py
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/integrity_checker/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import yaml_io
+import inventory_table
+import check_data
+import synthetic
+
+# returns count in-memory assets - the synthetic data already has missing tags, shared
+# UW tags, and misplaced servers, so every rule finds something
+def make_assets(count: int) -> list[yaml_io.Asset]:
+    return [yaml_io.Asset(f"{fqdn}.yaml", data=data) for fqdn, data in synthetic.make_inventory(count)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", help="number of synthetic assets", type=int, default=200000)
+    parser.add_argument("-j", "--jobs", help="worker counts to time", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    assets = make_assets(args.count)
+
+    expected = None
+    base = None
+    print(f"{args.count} assets, {os.cpu_count()} cpus")
+
+    for jobs in args.jobs:
+        # the table is rebuilt for every run - the missing rule marks cells in it
+        table = inventory_table.InventoryTable(assets)
+
+        start = time.perf_counter()
+        errs = [str(err) for err in check_data.run_checks(table, jobs=jobs)]
+        elapsed = time.perf_counter() - start
+
+        if expected is None:
+            expected, base = errs, elapsed
+            print(f"{len(errs)} errors")
+        elif errs != expected:
+            print(f"{jobs} workers reported different errors than {args.jobs[0]}")
+            exit(1)
+
+        print(f"{jobs:>3} workers {elapsed:10.2f} s {base / elapsed:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/bin/python3
+
+# replays sheet_update's sync of the inventory tab against the offline Sheets stand-in
+# (see scripts/sheets/fake_service.py) - no Google API quota is used
+#
+# for each inventory size and change rate, a tab holding a synthetic inventory is synced
+# to a changed copy of it (assets removed, added, moved to other rooms, and edited) with
+# each sync strategy. the time, API calls, sub-requests, and bytes sent are printed, and
+# every run must leave the tab sorted and holding exactly the changed inventory
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_sheet_sync.py
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/sheets/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import yaml_io
+import inventory_table
+import format_vars
+import api_helpers
+import fake_service
+import sync_plan
+import sheet_update
+import synthetic
+
+SPREADSHEET_ID = "bench"
+
+# of the changed assets - how many are removed, moved to another room, or just edited
+# (plus this many again are added)
+REMOVE_RATE = 0.1
+MOVE_RATE = 0.2
+ADD_RATE = 0.1
+
+# the tags edited assets get a new value for
+EDITED_TAGS = ["hardware.notes", "hardware.purpose", "tags.uw", "location.elevation"]
+
+# returns count synthetic assets as a table's rows - fqdns get prefix so added assets
+# don't share them with the original ones
+def make_rows(count: int, seed: int, prefix: str="") -> list:
+    assets = [yaml_io.Asset(f"{prefix}{fqdn}.yaml", data=data) for fqdn, data in synthetic.make_inventory(count, seed)]
+    return inventory_table.InventoryTable(assets).rows()
+
+# returns a changed copy of an inventory - about rate of the assets are changed
+def change_rows(rows: list, rate: float, seed: int) -> list:
+    rng = random.Random(seed)
+    rooms = sorted({row.get("location.room") for row in rows})
+    changed = []
+
+    for row in rows:
+        if rng.random() >= rate:
+            changed.append(row)
+            continue
+
+        roll = rng.random()
+        if roll < REMOVE_RATE:
+            continue
+
+        if roll < REMOVE_RATE + MOVE_RATE:
+            row.table.set(row.row, "location.room", rng.choice(rooms))
+        else:
+            row.table.set(row.row, rng.choice(EDITED_TAGS), f"edited {rng.randrange(1000)}")
+
+        changed.append(row)
+
+    changed.extend(make_rows(int(len(rows) * rate * ADD_RATE), seed, "new"))
+    return changed
+
+# returns a fake service holding a spreadsheet whose inventory tab is synced to rows
+def make_service(rows: list):
+    service = fake_service.FakeSheetsService()
+    spreadsheet = service.add_spreadsheet("bench", SPREADSHEET_ID)
+
+    sheet = spreadsheet.sheets[0]
+    sheet.title = format_vars.MAIN_SHEET_NAME
+    sheet.write(0, 0, [["Hostname"] + format_vars.PRETTY_COL_NAMES])
+
+    tab = sorted((sync_plan.sheet_row(row) for row in rows), key=sync_plan.sort_key)
+    sheet.write(1, 0, tab)
+
+    return service
+
+# syncs the tab to rows with strategy
+#
+# returns: (seconds, the service's FakeStats, the SyncPlan)
+def run_sync(base, rows: list, strategy: str) -> tuple:
+    service = fake_service.FakeSheetsService()
+    service.spreadsheets_by_id[SPREADSHEET_ID] = base
+    api_helpers.use_services(service)
+
+    start = time.perf_counter()
+
+    # apply_plans() prints each plan
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = api_helpers.get_sheets_client(SPREADSHEET_ID)
+        plans = sheet_update.plan_tabs(client, [(rows, 0, format_vars.MAIN_SHEET_NAME)], strategy)
+        sheet_update.apply_plans(client, plans)
+
+    elapsed = time.perf_counter() - start
+    api_helpers.use_services()
+
+    return (elapsed, service.stats, plans[0])
+
+# returns True if the tab holds exactly rows - in sorted order
+def check_tab(sheet, rows: list) -> bool:
+    tab = [sync_plan.pad_row(line) for line in sheet.read(1)]
+    keys = [sync_plan.sort_key(line) for line in tab]
+
+    return keys == sorted(keys) and sorted(tab) == sorted(sync_plan.sheet_row(row) for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", help="inventory sizes to sync", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("-r", "--rates", help="fractions of the inventory that change", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5])
+    parser.add_argument("--strategies", help="sync strategies to time", type=str, nargs="+", choices=sync_plan.STRATEGIES, default=sync_plan.STRATEGIES)
+    parser.add_argument("--seed", help="seed for the synthetic inventories", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'assets':>8} {'rate':>6} {'strategy':<12} {'seconds':>8} {'calls':>6} {'sub-requests':>12} {'KB sent':>10}  plan")
+    for count in args.sizes:
+        for rate in args.rates:
+            rows = make_rows(count, args.seed)
+            base = make_service(rows).spreadsheet(SPREADSHEET_ID)
+            rows = change_rows(rows, rate, args.seed + 1)
+
+            # every strategy starts from a copy of the same tab
+            grid = [list(line) for line in base.sheets[0].grid]
+
+            for strategy in args.strategies:
+                base.sheets[0].grid = [list(line) for line in grid]
+                elapsed, stats, plan = run_sync(base, rows, strategy)
+
+                if not check_tab(base.sheets[0], rows):
+                    print(f"{count} assets, {rate} changed: the {strategy} sync left the tab wrong")
+                    exit(1)
+
+                kind = "rewrite" if plan.rewrite else "patch"
+                print(f"{count:>8} {rate:>6} {strategy:<12} {elapsed:8.3f} {stats.calls:>6} {stats.subrequests:>12} {stats.sent_bytes / 1024:10.1f}  {kind}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/bin/python3
+
+# times loading, checking, grouping, and reporting on realistic synthetic inventories
+# (see synthetic.make_inventory()) at several sizes and writes the results to a JSON
+# file - run it on two commits and pass the older file to --compare to see what changed
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_suite.py
+#
+# NOTE: a million assets take several GB of memory - pick smaller --sizes on small machines
+
+import os
+import sys
+import json
+import time
+import shutil
+import datetime
+import argparse
+import platform
+import tempfile
+import subprocess
+import yaml
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/integrity_checker/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import yaml_io
+import inventory_table
+import validate_tools
+import check_data
+import email_report
+import synthetic
+
+# returns (seconds, result) for a single call of fun
+def timed(fun) -> tuple:
+    start = time.perf_counter()
+    result = fun()
+    return (time.perf_counter() - start, result)
+
+# returns the commit the tree is at - or None outside of a git checkout
+def current_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return out.stdout.strip()
+
+# builds the weekly report (which runs every check and writes the error file) in scratch
+def make_report(table, scratch: str) -> str:
+    stats_path = os.path.join(scratch, "weekly_stats.yaml")
+    with open(stats_path, 'w') as outfile:
+        yaml.safe_dump({"added_this_week" : 0, "decom_this_week" : 0}, outfile)
+
+    # the report writes its error file to the working directory
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        return str(email_report.Report(table, stats_path))
+    finally:
+        os.chdir(cwd)
+
+# times every stage on an inventory of count assets
+#
+# params:
+#   count - the number of assets
+#   seed - the synthetic.make_inventory() seed
+#   load - also write the inventory out and time reading it back
+#
+# returns: a dict of the results for this size
+def run_size(count: int, seed: int, load: bool) -> dict:
+    stages = dict()
+
+    stages["generate"], inventory = timed(lambda: synthetic.make_inventory(count, seed))
+
+    scratch = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        if load:
+            yaml_dir = os.path.join(scratch, "assets") + "/"
+            synthetic.write_inventory(yaml_dir, inventory)
+            del inventory
+
+            # every file is parsed - no cache or snapshot
+            stages["load"], assets = timed(lambda: yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False))
+        else:
+            stages["load"] = None
+            assets = [yaml_io.Asset(f"{fqdn}.yaml", data=data) for fqdn, data in inventory]
+            del inventory
+
+        stages["table"], table = timed(lambda: inventory_table.InventoryTable(assets))
+
+        # the checks write their fixes (ex. MISSING) into the table they're given - so every
+        # stage gets its own table, built outside the timer, and sees the assets as loaded
+        def fresh() -> inventory_table.InventoryTable:
+            return inventory_table.InventoryTable(assets)
+
+        # each check on its own - then every rule in one pass
+        checked = fresh()
+        stages["chk_all_missing"], missing = timed(lambda: check_data.chk_all_missing(checked))
+        checked = fresh()
+        stages["chk_conflicting"], conflicting = timed(lambda: check_data.chk_conflicting(checked))
+        checked = fresh()
+        stages["chk_overlap"], overlap = timed(lambda: check_data.run_checks(checked, ["overlap"]))
+        checked = fresh()
+        stages["chk_uw_tag"], uwtag = timed(lambda: check_data.chk_uw_tag(checked))
+        checked = fresh()
+        stages["run_checks"], errs = timed(lambda: check_data.run_checks(checked))
+
+        keys = ["location.rack", "acquisition.po", "hardware.condo_chassis.identifier", "tags.uw"]
+        stages["group_by_attrib"], _ = timed(lambda: [validate_tools.group_by_attrib(table, key) for key in keys])
+        stages["group_index"], _ = timed(lambda: validate_tools.GroupIndex.build(table, keys))
+
+        stages["report"], _ = timed(lambda: make_report(table, scratch))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        "assets" : count,
+        "errors" : {
+            "missing" : len(missing),
+            "conflicting" : len(conflicting),
+            "overlap" : len(overlap),
+            "uwtag" : len(uwtag),
+            "all" : len(errs),
+        },
+        "seconds" : {stage : (None if seconds is None else round(seconds, 6)) for stage, seconds in stages.items()},
+    }
+
+# prints each stage's time next to the time in an older results file
+def compare(old: dict, new: dict):
+    print(f"\n{'size':>9} {'stage':<18} {'old s':>10} {'new s':>10} {'new/old':>8}")
+
+    for size, result in new["sizes"].items():
+        before = old["sizes"].get(size)
+        if before is None:
+            continue
+
+        for stage, seconds in result["seconds"].items():
+            was = before["seconds"].get(stage)
+            if seconds is None or not was:
+                continue
+
+            print(f"{size:>9} {stage:<18} {was:10.3f} {seconds:10.3f} {seconds / was:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", help="inventory sizes to time", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("-o", "--output", help="the JSON file to write the results to", type=str, default="bench_suite.json")
+    parser.add_argument("-c", "--compare", help="a results file (from another commit) to compare against", type=str, default="")
+    parser.add_argument("--max-load", help="only time loading from files up to this many assets (writing them out is slow)", type=int, default=100000)
+    parser.add_argument("--seed", help="seed for the synthetic inventories", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {
+        "commit" : current_commit(),
+        "created" : datetime.datetime.now().isoformat(timespec="seconds"),
+        "python" : platform.python_version(),
+        "cpus" : os.cpu_count(),
+        "seed" : args.seed,
+        "sizes" : dict(),
+    }
+
+    for count in args.sizes:
+        result = run_size(count, args.seed, count <= args.max_load)
+        results["sizes"][str(count)] = result
+
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["seconds"].items() if seconds is not None)
+        print(f"{count} assets: {stages}")
+
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+        outfile.write("\n")
+
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as infile:
+            compare(json.load(infile), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/bin/python3
+
+# compares YAML load and dump throughput of the pure Python and libyaml (C)
+# backends on synthetic assets, and checks that both dump byte-identical files
+#
+# run from the repo's top level directory: ./scripts/benchmarks/bench_yaml_backend.py
+
+import os
+import sys
+import time
+import argparse
+import yaml
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+sys.path.append(os.path.abspath("scripts/benchmarks/"))
+
+import yaml_io
+import synthetic
+
+# times fun(item) over every item - returns the best total of repeat runs (in seconds)
+def best_time(fun, items: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fun(item)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", help="number of synthetic assets", type=int, default=3000)
+    parser.add_argument("-r", "--repeat", help="number of timed repetitions (best is reported)", type=int, default=3)
+    args = parser.parse_args()
+
+    if not yaml_io.LIBYAML:
+        print("PyYAML was built without libyaml - only the pure Python backend is available")
+        exit(1)
+
+    assets = synthetic.make_asset_dicts(args.count)
+
+    # the old write path - the Python emitter for everything
+    python_dump = lambda a: yaml.dump(a, Dumper=yaml_io.AssetDumper, sort_keys=False)
+    docs = [python_dump(a) for a in assets]
+
+    # output must not change no matter which emitter yaml_io picks
+    mismatched = sum(1 for a, doc in zip(assets, docs) if yaml_io.dump_asset(a) != doc)
+    on_c = sum(1 for a in assets if yaml_io._fits_unfolded(a))
+
+    cases = [
+        ("load (SafeLoader)", lambda d: yaml.load(d, Loader=yaml.SafeLoader), docs),
+        ("load (CSafeLoader)", lambda d: yaml.load(d, Loader=yaml.CSafeLoader), docs),
+        ("dump (AssetDumper)", python_dump, assets),
+        ("dump (yaml_io.dump_asset)", yaml_io.dump_asset, assets),
+    ]
+
+    print(f"{args.count} assets ({on_c} dumped by libyaml, {args.count - on_c} fall back to Python)")
+    for name, fun, items in cases:
+        elapsed = best_time(fun, items, args.repeat)
+        print(f"{name:<28} {elapsed * 1000:10.2f} ms {len(items) / elapsed:12.0f} assets/s")
+
+    print(f"byte-identical dumps: {args.count - mismatched}/{args.count}")
+    if mismatched:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
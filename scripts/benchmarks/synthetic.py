@@ -0,0 +1,218 @@
+# generates synthetic asset data for the benchmark scripts
+# assets are built from yaml_io.ASSET_TEMPLATE so they have the same shape as real ones
+
+import os
+import sys
+import copy
+import random
+
+sys.path.append(os.path.abspath("../shared/"))
+sys.path.append(os.path.abspath("scripts/shared/"))
+
+import yaml_io
+
+MODELS = [
+    "Dell PowerEdge R640",
+    "Dell PowerEdge R740xd",
+    "Dell PowerEdge C6525",
+    "SuperMicro AS-2124BT",
+    "KingStar K-2000",
+]
+
+ROOMS = [
+    ("CS B240", "Computer Sciences"),
+    ("CS 2360", "Computer Sciences"),
+    ("CS 3370a", "Computer Sciences"),
+    ("WID", "WID"),
+    ("OneNeck", "OneNeck"),
+]
+
+# the ways "missing" shows up in the inventory spreadsheet
+MISSING_SPELLINGS = ["", " ", "none", "None", "NONE", "?", "???", "MISSING", "missing"]
+
+# the tags make_inventory() leaves empty now and then - and how often (per asset)
+MISSING_RATES = {
+    "acquisition.po"         : 0.02,
+    "acquisition.date"       : 0.02,
+    "acquisition.owner"      : 0.01,
+    "hardware.model"         : 0.005,
+    "hardware.serial_number" : 0.01,
+    "hardware.service_tag"   : 0.03,
+    "hardware.purpose"       : 0.02,
+    "location.elevation"     : 0.01,
+}
+
+# (purpose, hostname prefix, weight)
+PURPOSES = [
+    ("HTC execute node", "e", 70),
+    ("HPC compute node", "spark-", 15),
+    ("storage server", "s", 8),
+    ("HTC access point", "ap", 4),
+    ("GPU server", "gpu", 3),
+]
+
+# how many units a server takes up - (units, weight)
+# condo nodes are handled separately (several nodes share one 2U chassis)
+FORM_FACTORS = [(1, 55), (2, 35), (4, 10)]
+
+# units in a rack
+RACK_UNITS = 42
+
+# the chance the next server placed in a rack is a 2U condo chassis - and the nodes in each one
+CONDO_RATE = 0.08
+CONDO_NODES = 4
+
+# purchases come in batches that share a PO, a date, and a model - (batch size, weight)
+BATCH_SIZES = [(1, 45), (2, 15), (4, 15), (8, 12), (16, 8), (32, 4), (64, 1)]
+
+# the share of assets with no UW tag yet, and of assets that reuse another's UW tag
+# (half of those are fabrications, the rest are mistakes)
+UW_MISSING_RATE = 0.05
+UW_SHARED_RATE = 0.002
+
+# the share of assets placed at a unit that's already taken (a data entry mistake)
+MISPLACED_RATE = 0.005
+
+# the first and last purchase years - later years are more likely (the inventory grows)
+FIRST_YEAR = 2010
+LAST_YEAR = 2025
+
+# returns a "missing" spelling or value - for a tag that is left empty at rate
+def _maybe_missing(rng: random.Random, value, rate: float):
+    if rng.random() < rate:
+        return rng.choice(MISSING_SPELLINGS)
+
+    return value
+
+# returns count synthetic assets with realistic distributions - racks fill up from
+# the bottom with 1, 2, and 4U servers and condo chassis, purchases come in batches,
+# newer years are more common, and a share of the tags is missing or misentered
+#
+# params:
+#   count - the number of assets
+#   seed - output is the same for the same seed
+#
+# returns: a list of (fqdn, nested dict shaped like ASSET_TEMPLATE) - ordered by fqdn
+def make_inventory(count: int, seed: int=0) -> list[tuple]:
+    rng = random.Random(seed)
+
+    years = list(range(FIRST_YEAR, LAST_YEAR + 1))
+    year_weights = [1 + i for i in range(len(years))]
+    room_weights = [45, 20, 15, 10, 10]
+
+    inventory = []
+    uw_tags = []
+
+    rack = 0
+    room, building = rng.choices(ROOMS, room_weights)[0]
+    unit = 1
+
+    # the batch being handed out
+    batch_left = 0
+    po = date = model = purpose = prefix = None
+
+    # the condo chassis being filled and how many nodes are left in it
+    chassis = ""
+    chassis_left = 0
+    elevation = ""
+
+    for i in range(count):
+        if batch_left == 0:
+            batch_left = rng.choices([size for size, weight in BATCH_SIZES], [weight for size, weight in BATCH_SIZES])[0]
+            po = f"{rng.randrange(1000000, 9999999)}"
+            date = f"{rng.choices(years, year_weights)[0]}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+            model = rng.choice(MODELS)
+            purpose, prefix, _ = rng.choices(PURPOSES, [weight for _, _, weight in PURPOSES])[0]
+        batch_left -= 1
+
+        asset = copy.deepcopy(yaml_io.ASSET_TEMPLATE)
+
+        # condo nodes share their chassis' units - everything else is placed on its own
+        if chassis_left == 0:
+            if rng.random() < CONDO_RATE:
+                chassis = f"c{rng.getrandbits(40):010x}"
+                chassis_left = CONDO_NODES
+                size = 2
+            else:
+                chassis = ""
+                size = rng.choices([units for units, weight in FORM_FACTORS], [weight for units, weight in FORM_FACTORS])[0]
+
+            # on to the next rack once this one is full
+            if unit + size - 1 > RACK_UNITS:
+                rack += 1
+                unit = 1
+                room, building = rng.choices(ROOMS, room_weights)[0]
+
+            first = unit
+            if unit > 1 and rng.random() < MISPLACED_RATE:
+                first = rng.randrange(1, unit)
+            else:
+                unit += size
+
+            elevation = str(first) if size == 1 else f"{first}-{first + size - 1}"
+
+        if chassis_left > 0:
+            chassis_left -= 1
+            asset["hardware"]["condo_chassis"]["identifier"] = yaml_io.quoted(chassis)
+            asset["hardware"]["condo_chassis"]["model"] = yaml_io.quoted("Dell PowerEdge C6400")
+
+        asset["acquisition"]["po"] = yaml_io.quoted(_maybe_missing(rng, po, MISSING_RATES["acquisition.po"]))
+        asset["acquisition"]["date"] = yaml_io.quoted(_maybe_missing(rng, date, MISSING_RATES["acquisition.date"]))
+        asset["acquisition"]["reason"] = yaml_io.quoted(rng.choice(["new server", "new server", "replacement", ""]))
+        asset["acquisition"]["owner"] = yaml_io.quoted(_maybe_missing(rng, rng.choice(["CHTC", "CHTC", "CHTC", "Morgridge", "Physics"]), MISSING_RATES["acquisition.owner"]))
+
+        asset["hardware"]["model"] = yaml_io.quoted(_maybe_missing(rng, model, MISSING_RATES["hardware.model"]))
+        asset["hardware"]["serial_number"] = yaml_io.quoted(_maybe_missing(rng, f"sn{i:08x}", MISSING_RATES["hardware.serial_number"]))
+        asset["hardware"]["service_tag"] = yaml_io.quoted(_maybe_missing(rng, f"st{i:08x}", MISSING_RATES["hardware.service_tag"]))
+        asset["hardware"]["purpose"] = yaml_io.quoted(_maybe_missing(rng, purpose, MISSING_RATES["hardware.purpose"]))
+        asset["hardware"]["notes"] = yaml_io.quoted(rng.choice(["", "", "", "A condo node" if chassis else "former HPC node"]))
+
+        asset["location"]["rack"] = yaml_io.quoted(f"{chr(ord('A') + rack % 26)}{rack // 26 + 1}")
+        asset["location"]["elevation"] = yaml_io.quoted(_maybe_missing(rng, elevation, MISSING_RATES["location.elevation"]))
+        asset["location"]["room"] = yaml_io.quoted(room)
+        asset["location"]["building"] = yaml_io.quoted(building)
+
+        roll = rng.random()
+        if roll < UW_MISSING_RATE:
+            uw = ""
+        elif roll < UW_MISSING_RATE + UW_SHARED_RATE and uw_tags:
+            uw = rng.choice(uw_tags)
+            asset["acquisition"]["fabrication"] = rng.random() < 0.5
+        else:
+            uw = f"U{rng.randrange(10000000):07d}"
+            uw_tags.append(uw)
+        asset["tags"]["uw"] = yaml_io.quoted(uw)
+
+        inventory.append((f"{prefix}{i:07d}.chtc.wisc.edu", asset))
+
+    inventory.sort(key=lambda item: item[0])
+    return inventory
+
+# writes an inventory from make_inventory() to yaml_dir - one file per asset
+#
+# returns: the list of paths written
+def write_inventory(yaml_dir: str, inventory: list[tuple]) -> list[str]:
+    if not os.path.exists(yaml_dir):
+        os.makedirs(yaml_dir)
+
+    paths = []
+    with yaml_io.AssetWriter() as writer:
+        for fqdn, data in inventory:
+            path = os.path.join(yaml_dir, f"{fqdn}.yaml")
+            asset = yaml_io.Asset(fqdn=fqdn)
+            asset.asset = data
+            writer.add(asset, path)
+            paths.append(path)
+
+    return paths
+
+# returns the nested dicts of make_inventory(count, seed) - for benchmarks that don't
+# need the fqdns
+def make_asset_dicts(count: int, seed: int=0) -> list[dict]:
+    return [data for fqdn, data in make_inventory(count, seed)]
+
+# writes make_inventory(count, seed) to yaml_dir - one file per asset
+#
+# returns: the list of paths written
+def write_asset_files(yaml_dir: str, count: int, seed: int=0) -> list[str]:
+    return write_inventory(yaml_dir, make_inventory(count, seed))
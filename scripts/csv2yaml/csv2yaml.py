@@ -14,6 +14,7 @@ sys.path.append(os.path.abspath("scripts/integrity_checker/"))
 
 import config
 import check_data
+import validate_engine
 import yaml_io
 import dict_utils
 
@@ -261,13 +262,12 @@ def main():
 
     validate_assets = yaml_io.read_yaml(c.yaml_path)
 
-    # do a data validation 
+    # do a data validation
     # right now we do nothing with the errors, but the files are
-    # modified to contain the 'MISSING' string   # do data validation
-    errs = []
-    errs.extend(check_data.chk_all_missing(validate_assets))
-    errs.extend(check_data.chk_conflicting(validate_assets))
-    errs.extend(check_data.chk_uw_tag(validate_assets))
+    # modified to contain the 'MISSING' string
+    fixes = []
+    check_data.run_checks(validate_assets, fixes=fixes)
+    validate_engine.apply_fixes(fixes)
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,6 @@
 #!/bin/python3
 
 import sys
-import re
 import os
 import io
 import itertools
@@ -9,6 +8,9 @@ import argparse
 import datetime
 import smtplib
 import email
+import functools
+import time
+import json
 from collections import defaultdict
 from typing import Callable
 
@@ -20,9 +22,16 @@ import config
 import dict_utils
 import validate_tools
 import errortypes
+import inventory_table
+import git_index
+import validate_engine
+import check_state
+import rack_index
+import rule_config
+from missing_values import is_missing
 
-# regex to match possible ways of saying "missing"
-MISSING_RXP = "(?i)none|missing|\\?+|^\\s*$"
+# every rule in rules.yaml - see rule_config.py
+DEFINITIONS = rule_config.load_rules()
 
 # checks a single asset for missing data fields
 #
@@ -31,139 +40,498 @@ MISSING_RXP = "(?i)none|missing|\\?+|^\\s*$"
 #
 # returns: a a MissingDataError or None
 def chk_single_missing(asset: yaml_io.Asset):
-    bad_tags = []
-
-    # a list of keys that are exempt from "missing" checks
-    exempt_keys = [
-        "acquisition.reason",
-        "tags.uw",
-        "tags.morgridge",
-        "tags.csl",
-        "hardware.notes",
-        "hardware.swap_reason",
-        "hardware.condo_chassis.identifier",
-    ]
-
-    # condo model is conditional - if condo id not present - ignore it
-    if re.fullmatch(MISSING_RXP, asset.get("hardware.condo_chassis.identifier")):
-        exempt_keys.append("hardware.condo_chassis.model")
-
-    # use a regex for ways "missing" is said in the speadsheet
-    # i.e. "", "none", "???", etc.
-    flat = dict_utils.flatten_dict(asset.asset)
-    for key, value in flat.items():
-        if key not in exempt_keys and re.fullmatch(MISSING_RXP, str(value)):
-            bad_tags.append(": ".join((key, str(value))))
+    required = DEFINITIONS["missing"]
 
-            # MISSING will be the "magic string"
-            asset.put(key, yaml_io.quoted("MISSING"))
+    flat = dict_utils.flatten_dict(asset.asset)
+    bad_tags = required.missing_tags(flat)
 
     if bad_tags:
-        # write back changes we"ve made and return and error
-        yaml_io.write_yaml(asset, asset.filepath)
-        return errortypes.MissingDataError(asset.fqdn + ".yaml", bad_tags, "tags are missing values")
+        return required.error(asset.fqdn, flat, bad_tags)
 
     # otherwise no error - return None
     return None
 
-def chk_all_missing(assets: list):
-    errs = []
+# finds tags that are missing values (see rule_config.Required) and proposes marking
+# them MISSING - the files are only changed if the fixes are applied afterwards
+class RequiredRule(validate_engine.Rule):
+    shardable = True
 
-    for asset in assets:
-        err = chk_single_missing(asset)
-        if err:
-            errs.append(err)
+    # params:
+    #   definition: a rule_config.Required
+    def __init__(self, definition):
+        self.name = definition.name
+        self.definition = definition
 
-    return errs
+    def start(self, table):
+        self.table = table
+        self.errs = []
 
-# validates assets with respect to each other
-def chk_conflicting(assets: list):
+        # (row, fix) for every asset with missing tags
+        self.fixes = []
 
-    # list of keys we want to grab
-    # adding a key here will make the next expression groups for it
-    keys = [
-        "location.rack",
-        "acquisition.po",
-        "hardware.condo_chassis.identifier",
-        "tags.uw",
-    ]
+    def visit(self, table, row: int, flat: dict):
+        bad_tags = self.definition.missing_tags(flat)
+        if not bad_tags:
+            return
 
-    groups = { key:validate_tools.group_by_attrib(assets, key) for key in keys}
+        self.errs.append(self.definition.error(table.fqdn[row], flat, bad_tags))
 
-    # run checks to compare groups as follows
-    # - a group with the same rack and elevation should all share hardware.condo_chassis.identifier
-    # - a group with the same hardware.condo_chassis.identifier should all share rack + elevation
-    # - a group with the same UW tag should share a condo chassis OR be part of a fabrication
-    # - a group with the same UW PO # should share a condo chassis OR be part of a fabrication
+        fix = self.definition.fix(bad_tags)
+        self.fixes.append((row, fix))
 
-    errs = []
+        # the rules after this one see the asset as if the fix had been made
+        for key, value in fix.items():
+            flat[key] = value
+            table.set(row, key, value)
 
-    # check rack against condo_chassis.identifier
-    # TODO account for elevation "ranges" instead of checking pure equality
-    location_conflicts = validate_tools.get_conflicts("location.rack", groups,
-                                "hardware.condo_chassis.identifier",
-                                "assets share rack-elevation without common hardware.condo_chassis.identifier")
-
-    if location_conflicts != None:
-        errs.extend(location_conflicts)
-
-    # check condo_id against rack
-    condo_id_confls = validate_tools.get_conflicts("hardware.condo_chassis.identifier", groups,
-                                           "location.rack",
-                                           "assets share hardware.condo_chassis.id but show different rack-elevation")
-    if condo_id_confls != None:
-        errs.extend(condo_id_confls)
-
-
-    # check tags.uw against hardware.condo_chassis.identifier OR acquisition.fabrication    
-    condo_tag_confls = validate_tools.get_conflicts("tags.uw", groups,
-                                    "hardware.condo_chassis.identifier",
-                                    "assets share UW tags, but do not belong to a common condo or fabrication")
-    if condo_tag_confls != None:
-        for group in groups["tags.uw"]:
-            for a in group:
-                if a.get("acquisition.fabrication") != True:
-                    errs.extend(condo_tag_confls)
-                    return errs
+    def finish(self) -> list:
+        return self.errs
 
-    return errs
+    def proposed_fixes(self) -> list:
+        return [validate_engine.Fix(self.table.assets[row], fix) for row, fix in self.fixes]
 
-def chk_uw_tag(assets: list):
-    errs = []
+    def shard_state(self):
+        return (self.errs, self.fixes)
+
+    # the shard's fixes are made to the main table too - for the rules that finish() after this one
+    def merge(self, state):
+        errs, fixes = state
+        self.errs.extend(errs)
+        self.fixes.extend(fixes)
+
+        for row, fix in fixes:
+            for key, value in fix.items():
+                self.table.set(row, key, value)
+
+# validates assets with respect to each other - see rule_config.Consistent
+# rows are added to a validate_tools.GroupIndex during the pass - the groups
+# are only compared once every asset has been seen
+#
+# elevation ranges that overlap (instead of matching exactly) are checked by OverlapRule
+class ConsistentRule(validate_engine.Rule):
+    shardable = True
+
+    # params:
+    #   definition: a rule_config.Consistent
+    def __init__(self, definition):
+        self.name = definition.name
+        self.definition = definition
+
+    def start(self, table):
+        self.table = table
+        self.groups = validate_tools.GroupIndex(self.definition.keys)
+
+    def visit(self, table, row: int, flat: dict):
+        self.groups.add(row, flat)
+
+    def finish(self) -> list:
+        table = self.table
+        groups = self.groups
+
+        errs = []
+        for check in self.definition.checks:
+            found = validate_tools.get_conflicts(table, check.group_by, groups, check.must_share, check.message)
+            if not found:
+                continue
+
+            if check.unless_all is not None:
+                values = (table.row(row).get(check.unless_all) for group in groups[check.group_by] for row in group)
+                if check.excused(values):
+                    continue
+
+            errs.extend(found)
+
+        return errs
+
+    def shard_state(self):
+        return self.groups
+
+    def merge(self, state):
+        self.groups.merge(state)
+
+# checks for assets whose rack units overlap (ex. a 2U server at "3-4" and another at "4")
+# without being in the same condo chassis - see rack_index.py
+class OverlapRule(validate_engine.Rule):
+    shardable = True
+
+    # params:
+    #   definition: a rule_config.Overlap
+    def __init__(self, definition):
+        self.name = definition.name
+        self.definition = definition
+
+    def start(self, table):
+        self.table = table
+        self.racks = rack_index.RackIndex()
+
+    def visit(self, table, row: int, flat: dict):
+        self.racks.add(row, flat)
+
+    def finish(self) -> list:
+        errs = []
+        for rack, rows in self.racks.overlaps():
+            err = rack_index.overlap_conflict([(self.table.fqdn[row], self.table.row(row)) for row in rows], self.definition.message)
+            if err is not None:
+                errs.append(err)
 
-    for asset in assets:
-        if re.fullmatch(MISSING_RXP, asset.get("tags.uw")):
-            asset_date = asset.get("acquisition.date")
-            if re.fullmatch(MISSING_RXP, asset_date):
-                errs.append(errortypes.MissingDataError(asset.fqdn + ".yaml", ["tags.uw"], "asset with no purchase date lacks UW tag"))
+        return errs
+
+    def shard_state(self):
+        return self.racks
+
+    def merge(self, state):
+        self.racks.merge(state)
+
+# checks for assets that have gone too long without a tag (ex. a UW tag 180+ days after purchase)
+# see rule_config.Age
+class AgeRule(validate_engine.Rule):
+    shardable = True
+
+    # the date is taken when the rule is made so every shard of a run uses the same one
+    #
+    # params:
+    #   definition: a rule_config.Age
+    def __init__(self, definition):
+        self.name = definition.name
+        self.definition = definition
+        self.currdate = datetime.datetime.today()
+
+    def start(self, table):
+        self.errs = []
+
+    def visit(self, table, row: int, flat: dict):
+        err = self.definition.check(table.fqdn[row], flat, self.currdate)
+        if err is not None:
+            self.errs.append(err)
+
+    def finish(self) -> list:
+        return self.errs
+
+    def shard_state(self):
+        return self.errs
+
+    def merge(self, state):
+        self.errs.extend(state)
+
+# the Rule class for each type of rule in rules.yaml
+RULE_CLASSES = {
+    "required"   : RequiredRule,
+    "consistent" : ConsistentRule,
+    "overlap"    : OverlapRule,
+    "age"        : AgeRule,
+}
+
+# every rule - in the order they run (and their errors are reported)
+# keys match the long command-line options
+RULES = {name : functools.partial(RULE_CLASSES[definition.type], definition) for name, definition in DEFINITIONS.items()}
+
+# runs the named rules over assets in a single pass
+#
+# params:
+#   assets: an inventory_table.InventoryTable (or a list of assets)
+#   names: the rules to run (keys of RULES) - all of them if empty
+#   fixes: a list the fixes the rules propose are added to (see validate_engine.apply_fixes())
+#   jobs: the number of worker processes to split the pass across
+#   stats: a list a validate_engine.RuleStats for each rule is added to
+#
+# returns: a list of DataErrors - grouped by rule, in RULES order
+def run_checks(assets, names: list[str]=None, fixes: list=None, jobs: int=1, stats: list=None) -> list[errortypes.DataError]:
+    rules = [rule() for name, rule in RULES.items() if not names or name in names]
+    return validate_engine.run_rules(assets, rules, fixes, jobs, stats)
+
+# the tags the rules other than required ones read - remembered for every asset between runs
+CHECKED_TAGS = list(dict.fromkeys(tag for definition in DEFINITIONS.values() for tag in definition.tags))
+
+# the keys run_incremental() groups assets by - plus each asset's rack if any rule looks for overlaps
+GROUP_KEYS = list(dict.fromkeys(key for definition in DEFINITIONS.values() if definition.type == "consistent" for key in definition.keys))
+if any(definition.type == "overlap" for definition in DEFINITIONS.values()):
+    GROUP_KEYS.append(rule_config.Overlap.KEY)
+
+# returns the groups (key -> value) an asset belongs to - same as GroupIndex.add()
+# plus the rack it is placed in, if any - same as RackIndex.add()
+def _asset_groups(flat: dict) -> dict:
+    groups = dict()
+    for key in GROUP_KEYS:
+        if key == rule_config.Overlap.KEY:
+            rack = rack_index.rack_key(flat)
+            if rack is not None and rack_index.parse_elevation(flat.get("location.elevation", "")) is not None:
+                groups[key] = rack
+            continue
+
+        value = flat.get(key)
+        if value is not None and not is_missing(value):
+            groups[key] = validate_tools.group_value(flat, key)
+
+    return groups
+
+# finds the conflicts of a single group again for every rule that looks at it
+#
+# params:
+#   state: the CheckState - conflicts are stored as (rule, check, value) -> ConflictingGroupError
+#          for consistent rules and (rule, rack) -> list of ConflictingGroupError for overlap rules
+#   key, value: the group
+#   spent: rule name -> the time spent in it - the time spent on the group is added
+#   looked: rule name -> the files it looked at - the group's members are added for every
+#           rule that checks the group
+def _recheck_group(state, key: str, value, spent: dict, looked: dict):
+    members = state.group(key, value)
+
+    for definition in DEFINITIONS.values():
+        clock = time.perf_counter()
+
+        if definition.type == "consistent":
+            checks = [(i, check) for i, check in enumerate(definition.checks) if check.group_by == key]
+            if not checks:
                 continue
 
-            # uses ISO 8601 date format (aka. yyyy-mm-dd)
-            fmt = "%Y-%m-%d"
-            currdate = datetime.datetime.today()
-            olddate = datetime.datetime.strptime(asset_date, fmt)
+            for i, check in checks:
+                state.conflicts.pop((definition.name, i, value), None)
+                if len(members) < 2:
+                    continue
+
+                err = validate_tools.group_conflict([(filename.removesuffix(".yaml"), state.results[filename].values) for filename in members], check.group_by, check.must_share, check.message)
+                if err is not None:
+                    state.conflicts[(definition.name, i, value)] = err
+
+        elif definition.type == "overlap" and key == rule_config.Overlap.KEY:
+            state.conflicts.pop((definition.name, value), None)
+
+            spans = []
+            for filename in members:
+                low, high = rack_index.parse_elevation(state.results[filename].values["location.elevation"])
+                spans.append((low, high, filename))
+
+            found = []
+            for group in rack_index.overlapping(spans):
+                err = rack_index.overlap_conflict([(filename.removesuffix(".yaml"), state.results[filename].values) for filename in group], definition.message)
+                if err is not None:
+                    found.append(err)
+
+            if found:
+                state.conflicts[(definition.name, value)] = found
+
+        else:
+            continue
 
-            diff = currdate - olddate
+        spent[definition.name] += time.perf_counter() - clock
+        looked[definition.name].update(members)
 
-            # warn about a missing UW tag if it"s been more than 180 days
-            if diff.days >= 180:
-                errs.append(errortypes.MissingDataError(asset.fqdn + ".yaml", ["tags.uw"], f"asset with PO: '{asset.get('acquisition.po')}' purchased on {asset_date} lacks UW tag"))
+# runs the named rules like run_checks() - but only re-checks what changed since the last run
+#
+# the results of the last run are kept in a state file (see check_state.py). assets whose
+# files are unchanged reuse their results, and conflicts are only looked for again in the
+# groups a changed (or new, or removed) asset joins or leaves. a state saved under other
+# rules (ex. rules.yaml was edited) is thrown away and every asset is checked again. the
+# errors are exactly the ones run_checks() would return. age rules depend on today's date,
+# so they are always re-run - from the tags remembered for each asset
+#
+# like run_checks() nothing is written - the fixes are only proposed
+#
+# params:
+#   assets: a list of yaml_io.Asset - every asset in the directory, ordered by filename
+#   names: the rules to run (keys of RULES) - all of them if empty
+#   state_path: the state file (see check_state.state_path_for())
+#   fixes: a list the proposed fixes are added to (see validate_engine.apply_fixes())
+#   stats: a list a validate_engine.RuleStats for each rule is added to - a rule's assets
+#          are the ones it looked at again
+#
+# returns: a list of DataErrors - grouped by rule, in RULES order
+def run_incremental(assets: list[yaml_io.Asset], names: list[str], state_path: str, fixes: list=None, stats: list=None) -> list[errortypes.DataError]:
+    selected = [definition for name, definition in DEFINITIONS.items() if not names or name in names]
+
+    # the other rules see assets as if the fixes of the selected required rules were made
+    required = [definition for definition in selected if definition.type == "required"]
+    state = check_state.CheckState(state_path, GROUP_KEYS, [definition.name for definition in required], rule_config.rules_stamp(DEFINITIONS))
+
+    by_file = {os.path.basename(asset.filepath) : asset for asset in assets}
+
+    # files that are new or changed
+    todo = []
+    for filename, asset in by_file.items():
+        result = state.results.get(filename)
+        if result is None or asset.digest is None or result.digest != asset.digest:
+            todo.append(filename)
+
+    removed = [filename for filename in state.results if filename not in by_file]
+
+    # rule name -> the time spent in it / the files it looked at - every rule looks at
+    # the new and changed files, plus the other members of the groups it re-checks
+    spent = {name : 0.0 for name in DEFINITIONS}
+    looked = {name : set(todo) for name in DEFINITIONS}
+
+    # (key, value) for every group a changed asset leaves...
+    touched = set()
+    for filename in removed + todo:
+        old = state.remove(filename)
+        if old is not None:
+            touched.update(old.groups.items())
+
+    # ...re-check the changed assets exactly as the required rules would, and
+    # add them to every group they join
+    for filename in todo:
+        asset = by_file[filename]
+        flat = dict_utils.flatten_dict(asset.asset)
+
+        errors = dict()
+        fixed = dict()
+        for definition in required:
+            clock = time.perf_counter()
+
+            bad_tags = definition.missing_tags(flat)
+            if bad_tags:
+                errors[definition.name] = definition.error(asset.fqdn, flat, bad_tags)
+                fixed[definition.name] = definition.fix(bad_tags)
+                flat.update(fixed[definition.name])
+
+            spent[definition.name] += time.perf_counter() - clock
+
+        values = {tag : flat[tag] for tag in CHECKED_TAGS if tag in flat}
+        result = check_state.AssetResult(asset.digest, errors, fixed, values, _asset_groups(flat))
+        state.add(filename, result)
+        touched.update(result.groups.items())
+
+    # look for conflicts again in the touched groups only
+    for key, value in touched:
+        _recheck_group(state, key, value, spent, looked)
+
+    state.save()
+
+    # put the results together in the same order run_checks() reports them
+    errs = []
+    files = sorted(by_file)
+    currdate = datetime.datetime.today()
+
+    for definition in selected:
+        clock = time.perf_counter()
+        found = []
+
+        if definition.type == "required":
+            for filename in files:
+                result = state.results[filename]
+                if definition.name in result.errors:
+                    found.append(result.errors[definition.name])
+
+                if fixes is not None and definition.name in result.fixes:
+                    fixes.append(validate_engine.Fix(by_file[filename], result.fixes[definition.name]))
+
+        elif definition.type == "consistent":
+            for i, check in enumerate(definition.checks):
+                groups = sorted(key[2] for key in state.conflicts if key[:2] == (definition.name, i))
+                if not groups:
+                    continue
+
+                if check.unless_all is not None:
+                    shared = [members for members in state.members[check.group_by].values() if len(members) > 1]
+                    if check.excused(state.results[filename].values.get(check.unless_all) for members in shared for filename in members):
+                        continue
+
+                found.extend(state.conflicts[(definition.name, i, value)] for value in groups)
+
+        elif definition.type == "overlap":
+            racks = sorted(key[1] for key in state.conflicts if len(key) == 2 and key[0] == definition.name)
+            found.extend(err for rack in racks for err in state.conflicts[(definition.name, rack)])
+
+        elif definition.type == "age":
+            for filename in files:
+                err = definition.check(filename.removesuffix(".yaml"), state.results[filename].values, currdate)
+                if err is not None:
+                    found.append(err)
+
+            looked[definition.name].update(files)
+
+        spent[definition.name] += time.perf_counter() - clock
+        errs.extend(found)
+
+        if stats is not None:
+            stats.append(validate_engine.RuleStats(definition.name, found, len(looked[definition.name]), spent[definition.name]))
 
     return errs
 
+# checks every asset for missing data fields
+#
+# params:
+#   assets: an inventory_table.InventoryTable (or a list of assets)
+#
+# returns: a list of MissingDataErrors
+def chk_all_missing(assets):
+    return run_checks(assets, ["missing"])
+
+# validates assets with respect to each other
+#
+# params:
+#   assets: an inventory_table.InventoryTable (or a list of assets)
+def chk_conflicting(assets):
+    return run_checks(assets, ["conflicting"])
+
+# checks for assets that have been missing a UW tag for 180+ days
+#
+# params:
+#   assets: an inventory_table.InventoryTable (or a list of assets)
+def chk_uw_tag(assets):
+    return run_checks(assets, ["uwtag"])
+
+# the machine readable output formats - "json" is one document, "jsonl" is one
+# record per line (every error and unreadable file, then the summary)
+OUTPUT_FORMATS = ["text", "json", "jsonl"]
+
+# returns an UnreadableFileError for every asset file in yaml_path that the loader skipped
+#
+# params:
+#   yaml_path: the directory that was read
+#   assets: the assets read from it
+def unreadable_files(yaml_path: str, assets: list[yaml_io.Asset]) -> list[errortypes.UnreadableFileError]:
+    read = {os.path.basename(asset.filepath) for asset in assets}
+    names = [os.path.basename(path) for path in yaml_io._list_yaml(os.path.join(yaml_path, ''))]
+    return [errortypes.UnreadableFileError(name) for name in names if name not in read]
+
+# renders the results of a run as JSON
+#
+# params:
+#   stats: a validate_engine.RuleStats for each rule that ran - in order
+#   summary: the rest of the summary (ex. the path and the number of assets)
+#   lines: one record per line (JSON lines) instead of one document
+#   unreadable: an UnreadableFileError for each file no rule could check (see unreadable_files())
+#
+# returns: the JSON text
+def format_json(stats: list, summary: dict, lines: bool=False, unreadable: list=()) -> str:
+    records = []
+    for rule in stats:
+        for err in rule.errors:
+            records.append({"rule" : rule.name, **err.to_dict()})
+
+    summary = dict(summary)
+    summary["errors"] = len(records)
+    summary["unreadable"] = len(unreadable)
+
+    # files no rule saw are reported after the errors
+    records.extend({"rule" : "unreadable", **err.to_dict()} for err in unreadable)
+    summary["rules"] = [{"rule" : rule.name, "errors" : len(rule.errors), "assets" : rule.assets, "seconds" : round(rule.seconds, 6)} for rule in stats]
+
+    # tag values can be anything YAML reads (ex. dates) - so fall back to str()
+    if lines:
+        out = [json.dumps(record, default=str) for record in records]
+        out.append(json.dumps({"summary" : summary}, default=str))
+        return "\n".join(out) + "\n"
+
+    return json.dumps({"summary" : summary, "errors" : records}, indent=2, default=str) + "\n"
+
 # performs the validation and outputs the results
 # if email_addr is "" - will output to stdout otherwise
 # will send and email to the specified address
 #
 # params:
-#   assets: list of assets to check
-#   chk_fun: the checking function - returns a list of DataError
+#   errs: the errors to output
 #   email_addr: email address to send to - if any
+#   yaml_path: the directory that was checked
+#   body: the output to use instead of the errors' text (ex. format_json()) - if any
 #
-def output_chks(errs: list[errortypes.DataError], email_addr: str="", yaml_path: str=""):
+def output_chks(errs: list[errortypes.DataError], email_addr: str="", yaml_path: str="", body: str=None):
     output = io.StringIO()
-    for err in errs:
-        print(err, file=output)
+    if body is not None:
+        output.write(body)
+    else:
+        for err in errs:
+            print(err, file=output)
 
     if email_addr:
         header = "[this message was auto-generated by validate.py]\n\n"
@@ -188,6 +556,9 @@ def output_chks(errs: list[errortypes.DataError], email_addr: str="", yaml_path:
 
         email_out.close()
 
+    elif body is not None:
+        print(output.getvalue(), end="")
+
     else:
         print(output.getvalue())
 
@@ -199,22 +570,21 @@ def main():
     parser = argparse.ArgumentParser()
 
     # add new options here
-    parser.add_argument("-m", "--missing", help="only check for asset tags that are missing values", action="store_true")
-    parser.add_argument("-c", "--conflicting", help="only check for conflicting asset data", action="store_true")
-    parser.add_argument("-u", "--uwtag", help="check for missing UW tags on assets older than 180 days", action="store_true")
+    # every rule in rules.yaml gets an option
+    for name, definition in DEFINITIONS.items():
+        flags = [definition.option] if definition.option else []
+        parser.add_argument(*flags, f"--{name}", dest=name, help=definition.help, action="store_true")
+
     parser.add_argument("-p", "--path", help="the path to a directory containing YAML asset files to validate", type=str)
+    parser.add_argument("-e", "--email", help="email the results to this address instead of printing them", type=str, default="")
+    parser.add_argument("-f", "--full", help="check every asset again instead of only the ones that changed since the last run", action="store_true")
+    parser.add_argument("-j", "--jobs", help="check every asset (like --full) split across this many worker processes", type=int, default=1)
+    parser.add_argument("--fix", help="make the fixes the checks propose (ex. marking missing tags MISSING)", action="store_true")
+    parser.add_argument("--dry-run", help="show the changes --fix would make without writing them", action="store_true")
+    parser.add_argument("--format", help="output the errors as text, one JSON document, or JSON lines - with a summary of each rule's errors, assets, and time", choices=OUTPUT_FORMATS, default="text")
 
     args = parser.parse_args()
 
-    # dict of functions called during validate
-    # keys match the long command-line options
-    # it should invoke
-    validate_funcs = {
-        "missing"     : chk_all_missing,
-        "conflicting" : chk_conflicting,
-        "uwtag"       : chk_uw_tag,
-    }
-
     # scripts can be run "manually" too
     yaml_path = ""
     if args.path:
@@ -224,23 +594,51 @@ def main():
         # NOTE: scripts are from from the same dir as config.yaml in the GitHub action
         yaml_path = config.get_config("config.yaml").yaml_path
 
-    # read all yaml files from the dir. at yaml_path
-    assets = yaml_io.read_yaml(yaml_path)
+    # read all yaml files from the dir. at yaml_path (only re-parsing what git says
+    # changed since the last run)
+    assets = git_index.read_yaml(yaml_path, args.jobs)
 
-    # if no optional arguments are specified - run all checks
+    # the options select which rules run - if none are specified run all of them
     opts = vars(args)
-    checks = [opts[key] for key in validate_funcs]
+    selected = [name for name in RULES if opts[name]]
 
-    errs = []
-    if not any(checks):
-        for fun in validate_funcs.values():
-             errs.extend(fun(assets))
-    else:
-        for fun in checks:
-            if fun:
-                errs.extend(fun(assets))
+    # checking never changes the files - fixes are collected and made afterwards
+    fixes = []
+    stats = []
+    start = time.perf_counter()
 
-    output = output_chks(errs, args.email, yaml_path)
+    if args.full or args.jobs > 1:
+        # every selected rule is checked in a single pass over a table of all the assets
+        # (sharded across worker processes with --jobs)
+        errs = run_checks(inventory_table.InventoryTable(assets), selected, fixes, args.jobs, stats)
+    else:
+        errs = run_incremental(assets, selected, check_state.state_path_for(yaml_path), fixes, stats)
+
+    body = None
+    if args.format != "text":
+        summary = {
+            "path" : yaml_path,
+            "mode" : "full" if args.full or args.jobs > 1 else "incremental",
+            "jobs" : args.jobs,
+            "assets" : len(assets),
+            "seconds" : round(time.perf_counter() - start, 6),
+        }
+        body = format_json(stats, summary, args.format == "jsonl", unreadable_files(yaml_path, assets))
+
+    output = output_chks(errs, args.email, yaml_path, body)
+
+    # keep stdout machine readable
+    log = sys.stdout if args.format == "text" else sys.stderr
+
+    if args.fix or args.dry_run:
+        writer = validate_engine.apply_fixes(fixes, args.dry_run)
+
+        if args.dry_run:
+            for diff in writer.diffs.values():
+                print(diff, end="", file=log)
+            print(f"check_data: would rewrite {len(writer.written)} files", file=log)
+        else:
+            print(f"check_data: rewrote {len(writer.written)} files", file=log)
 
 if __name__ == "__main__":
     main()
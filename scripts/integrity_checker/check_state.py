@@ -0,0 +1,126 @@
+# the persisted results of the last integrity check (see check_data.run_incremental())
+#
+# besides each asset's own results, the state keeps a reverse index from every
+# (key, value) group to the files in it, and the conflict found in each group
+# so after a change only the changed assets - and the groups they join or leave -
+# have to be checked again
+import sys
+import os
+import pickle
+sys.path.append(os.path.abspath('../shared'))
+
+import yaml_io
+
+# bump this if the layout of the state file (or what the checks report) changes
+STATE_FORMAT = 5
+
+# returns the default state location for a YAML directory
+# the state lives next to (not inside) the directory
+# ex. current_assets/ -> .current_assets.check_state
+def state_path_for(yaml_dir: str) -> str:
+    yaml_dir = os.path.normpath(yaml_dir)
+    parent, name = os.path.split(yaml_dir)
+    return os.path.join(parent, f".{name}.check_state")
+
+# what the last check found for a single asset file
+class AssetResult:
+    __slots__ = ("digest", "errors", "fixes", "values", "groups")
+
+    # params:
+    #   digest - the content hash of the file the results are for
+    #   errors - required rule name -> the MissingDataError the file gives (only rules with errors)
+    #   fixes - required rule name -> the tags it would change -> their new values
+    #   values - tag -> value for the tags the other rules read
+    #   groups - key -> value for every group the asset belongs to
+    def __init__(self, digest: str, errors: dict, fixes: dict, values: dict, groups: dict):
+        self.digest = digest
+        self.errors = errors
+        self.fixes = fixes
+        self.values = values
+        self.groups = groups
+
+class CheckState:
+    # params:
+    #   path - the state file
+    #   keys - the keys assets are grouped by
+    #   view - the required rules whose fixes values and groups are made with
+    #          (a state saved with other ones is thrown away)
+    #   rules - the stamp of the rules the results were found with (see rule_config.rules_stamp())
+    #           (a state saved under other rules is thrown away too)
+    def __init__(self, path: str, keys: list[str], view: list[str]=(), rules: str=""):
+        self.path = path
+        self.keys = list(keys)
+        self.view = list(view)
+        self.rules = rules
+
+        # filename -> AssetResult
+        self.results = dict()
+
+        # key -> value -> set of filenames in the group
+        self.members = {key : dict() for key in self.keys}
+
+        # the conflicts found in each group (only groups with conflicts) - see check_data._recheck_group()
+        self.conflicts = dict()
+
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as infile:
+                state = pickle.load(infile)
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            print(f"WARNING: ignoring unreadable check state '{self.path}': {err}", file=sys.stderr)
+            return
+
+        # states in an older format are thrown away (and rebuilt) without a warning
+        if state[0] != STATE_FORMAT:
+            return
+
+        fmt, stamp, rules, keys, view, results, members, conflicts = state
+        if stamp == yaml_io.template_stamp() and rules == self.rules and keys == self.keys and view == self.view:
+            self.results = results
+            self.members = members
+            self.conflicts = conflicts
+
+    # writes the state back out - to a temp file first so a crash never leaves a truncated state
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as outfile:
+                state = (STATE_FORMAT, yaml_io.template_stamp(), self.rules, self.keys, self.view, self.results, self.members, self.conflicts)
+                pickle.dump(state, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print(f"WARNING: could not write check state '{self.path}': {err}", file=sys.stderr)
+
+    # stores the result for a file and adds it to its groups
+    def add(self, filename: str, result: AssetResult):
+        self.results[filename] = result
+
+        for key, value in result.groups.items():
+            self.members[key].setdefault(value, set()).add(filename)
+
+    # drops the result for a file and takes it out of its groups
+    #
+    # returns: the AssetResult that was dropped - or None
+    def remove(self, filename: str):
+        result = self.results.pop(filename, None)
+        if result is None:
+            return None
+
+        for key, value in result.groups.items():
+            group = self.members[key].get(value)
+            if group is None:
+                continue
+
+            group.discard(filename)
+            if not group:
+                del self.members[key][value]
+
+        return result
+
+    # returns the files in a group - in file order
+    def group(self, key: str, value) -> list[str]:
+        return sorted(self.members[key].get(value, ()))
@@ -11,15 +11,31 @@ class DataError:
 
     def __str__(self):
         return ' '.join((self.__class__.__name__, 'in file', self.file, '\n', self.message))
+
+    # returns the error as a dict of plain values - for JSON output
+    def to_dict(self) -> dict:
+        return {"type": self.__class__.__name__, "file": self.file, "message": self.message}
        
 # represents a single item missing 1 or more tags
 class MissingDataError(DataError):
 
-    def __init__(self, file: str, missing_tags: list[str], message=''):
+    # values - the offending tags -> their values, if missing_tags also shows the values
+    def __init__(self, file: str, missing_tags: list[str], message='', values: dict=None):
         self.missing_tags = missing_tags
+        self.values = values
         self.file = file
         DataError.__init__(self, file, message)
 
+    def to_dict(self) -> dict:
+        out = DataError.to_dict(self)
+        if self.values is not None:
+            out["tags"] = list(self.values)
+            out["values"] = dict(self.values)
+        else:
+            out["tags"] = list(self.missing_tags)
+
+        return out
+
     def __str__(self):
         return ''.join(( DataError.__str__(self),'\n', 
                           'offending tag(s):\n\t', 
@@ -38,6 +54,9 @@ class ConflictItem:
     def __str__(self):
         return f'{self.hostname}: ("{self.group}", "{self.conflicting}")'
 
+    def to_dict(self) -> dict:
+        return {"file": self.hostname, "group": self.group, "value": self.conflicting}
+
 # represents an error where 1 or more assets in a certain group (ex. same condo_chassis)
 # have other conflicting values (ex. different elevation)
 class ConflictingGroupError(DataError):
@@ -51,3 +70,14 @@ class ConflictingGroupError(DataError):
                           'the following items contain conflicts:\n\t',
                           ',\n\t'.join(str(confl) for confl in self.conflicting), '\n',
                           '_____________________________________________________', '\n'))
+
+    def to_dict(self) -> dict:
+        out = DataError.to_dict(self)
+        out["members"] = [confl.to_dict() for confl in self.conflicting]
+        return out
+
+# represents an asset file that could not be read or parsed - so none of the checks saw it
+class UnreadableFileError(DataError):
+
+    def __init__(self, file: str, message='could not be read or parsed'):
+        DataError.__init__(self, file, message)
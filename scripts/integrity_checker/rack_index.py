@@ -0,0 +1,132 @@
+# an index of the rack units (U) every asset occupies - for finding hardware that overlaps
+#
+# elevations are parsed into U ranges ("3" -> 3-3, "1-2" -> 1-2) and kept per rack
+# (building, room, rack). groups of occupants that overlap each other are found by
+# sorting each rack's ranges and sweeping them once instead of comparing every pair
+import sys
+import os
+import re
+sys.path.append(os.path.abspath('../shared'))
+
+import errortypes
+import inventory_table
+from missing_values import is_missing
+
+# "3", "1-2", " 10 - 12 "
+ELEVATION_PATTERN = re.compile(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?")
+
+# parses an elevation into the range of rack units it covers
+#
+# returns: (lowest U, highest U) - or None if the elevation isn't a U number or range
+def parse_elevation(value) -> tuple:
+    match = ELEVATION_PATTERN.fullmatch(str(value))
+    if match is None:
+        return None
+
+    low = int(match.group(1))
+    high = int(match.group(2) or low)
+
+    # someone wrote the range top down (ex. "4-3")
+    if high < low:
+        low, high = high, low
+
+    return (low, high)
+
+# returns the rack an asset is in - (building, room, rack) - from its flattened tags
+# or None if any of them is missing
+def rack_key(flat: dict) -> tuple:
+    key = (flat.get("location.building"), flat.get("location.room"), flat.get("location.rack"))
+    for value in key:
+        if value is None or is_missing(value):
+            return None
+
+    return key
+
+# groups ranges that overlap each other - every range in a group shares at least one U
+# with every other one (ex. 1-2, 2-3, and 3-4 give the groups 1-2 + 2-3 and 2-3 + 3-4,
+# not one group - 1-2 and 3-4 don't overlap)
+#
+# ranges that overlap pairwise always share a U, so the groups are the largest sets of
+# ranges covering a single U - found in the same sweep: a group is complete once a range
+# ends after the last one started
+#
+# params:
+#   spans: a list of (lowest U, highest U, member)
+#
+# returns: a list of groups (lists of members) with more than one member - ordered by
+#          the rack bottom up, each ordered by (lowest U, highest U, member)
+def overlapping(spans: list[tuple]) -> list[list]:
+    groups = []
+    active = []
+    grown = False
+
+    for span in sorted(spans):
+        low = span[0]
+
+        # ranges that end below this one - the group they were part of is complete
+        if any(high < low for _, high, _ in active):
+            if grown and len(active) > 1:
+                groups.append([member for _, _, member in active])
+            active = [other for other in active if other[1] >= low]
+
+        active.append(span)
+        grown = True
+
+    if grown and len(active) > 1:
+        groups.append([member for _, _, member in active])
+
+    return groups
+
+# the occupied U ranges of every rack
+class RackIndex:
+    def __init__(self):
+        # (building, room, rack) -> list of (lowest U, highest U, row)
+        self.racks = dict()
+
+    # adds a single row from its flattened tags
+    # assets without a full rack location or a readable elevation aren't placed
+    def add(self, row, flat: dict):
+        key = rack_key(flat)
+        if key is None:
+            return
+
+        span = parse_elevation(flat.get("location.elevation", ""))
+        if span is None:
+            return
+
+        self.racks.setdefault(key, []).append((span[0], span[1], row))
+
+    # adds the racks of another index (ex. one built over another shard of the same table)
+    def merge(self, other):
+        for key, spans in other.racks.items():
+            self.racks.setdefault(key, []).extend(spans)
+
+    # returns: a list of (rack, rows) for every group of occupants that overlap each other
+    #          (see overlapping()) - ordered by rack
+    def overlaps(self) -> list[tuple]:
+        return [(key, rows) for key in sorted(self.racks) for rows in overlapping(self.racks[key])]
+
+# checks a group of overlapping occupants of a rack - they must all be in one condo chassis
+#
+# params:
+#   members: a list of (fqdn, flattened tags) for each asset in the group
+#   msg: an error message to display if the validation fails
+#
+# returns: a ConflictingGroupError or None if the group has no conflicts
+def overlap_conflict(members: list[tuple], msg: str):
+    chassis = set()
+    for fqdn, flat in members:
+        identifier = flat.get("hardware.condo_chassis.identifier", "")
+
+        # an asset outside of any chassis is its own chassis
+        chassis.add(("asset", fqdn) if is_missing(identifier) else ("chassis", identifier))
+
+    if len(chassis) < 2:
+        return None
+
+    conflicting = []
+    for fqdn, flat in members:
+        location = '.'.join(flat[tag] for tag in inventory_table.LOCATION_TAGS)
+        conflicting.append(errortypes.ConflictItem(fqdn + '.yaml', location, flat.get("hardware.condo_chassis.identifier", "")))
+
+    return errortypes.ConflictingGroupError(conflicting, msg)
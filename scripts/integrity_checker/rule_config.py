@@ -0,0 +1,214 @@
+# reads the integrity checks declared in rules.yaml (next to config.yaml) and compiles
+# each one into a definition with the predicates check_data.py's rules evaluate
+#
+# definitions are plain objects (no lambdas) so rules holding them can be copied to
+# worker processes (see validate_engine.py)
+import sys
+import os
+import re
+import datetime
+import hashlib
+import json
+import yaml
+sys.path.append(os.path.abspath('../shared'))
+
+import yaml_io
+import errortypes
+import inventory_table
+from missing_values import is_missing
+
+# rules.yaml lives at the top of the repo - with config.yaml
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "rules.yaml")
+
+# the date format age rules read (ISO 8601 aka. yyyy-mm-dd) unless a rule gives its own
+DATE_FORMAT = "%Y-%m-%d"
+
+# "{acquisition.po}" in a message is replaced with the asset's acquisition.po
+MESSAGE_FIELD = re.compile(r"\{([\w.]+)\}")
+
+# returns a message template filled in with an asset's tags
+def format_message(template: str, flat: dict) -> str:
+    return MESSAGE_FIELD.sub(lambda match: str(flat.get(match.group(1), "")), template)
+
+# returns the tags a message template reads
+def message_tags(template: str) -> list[str]:
+    return MESSAGE_FIELD.findall(template)
+
+# the settings every rule has
+class RuleDef:
+    # params:
+    #   name - the rule's key in rules.yaml
+    #   spec - the rule's settings from rules.yaml
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.type = spec["type"]
+        self.option = spec.get("option")
+        self.help = spec.get("help", "")
+
+        # the settings as written - see rules_stamp()
+        self.spec = spec
+
+        # the tags the rule reads - remembered for every asset by incremental checks
+        self.tags = []
+
+    def _read(self, spec: dict, key: str):
+        if key not in spec:
+            raise ValueError(f"rule '{self.name}' ({self.type}) needs a '{key}'")
+
+        return spec[key]
+
+# every tag needs a value - except the exempt ones
+class Required(RuleDef):
+    def __init__(self, name: str, spec: dict):
+        RuleDef.__init__(self, name, spec)
+        self.message = self._read(spec, "message")
+        self.exempt = set(spec.get("exempt", []))
+        self.exempt_unless = dict(spec.get("exempt_unless", {}))
+        self.mark = str(spec.get("mark", "MISSING"))
+
+    # finds the tags of a single (flattened) asset that are missing values
+    #
+    # returns: a list of the offending tags
+    def missing_tags(self, flat: dict) -> list[str]:
+        exempt = self.exempt
+
+        # conditional tags - if the tag they depend on isn't present ignore them
+        conditional = [tag for tag, other in self.exempt_unless.items() if is_missing(flat.get(other))]
+        if conditional:
+            exempt = exempt.union(conditional)
+
+        # i.e. "", "none", "???", etc.
+        return [key for key, value in flat.items() if key not in exempt and is_missing(value)]
+
+    # returns the MissingDataError describing an asset's missing tags
+    def error(self, fqdn: str, flat: dict, bad_tags: list[str]):
+        return errortypes.MissingDataError(fqdn + ".yaml", [": ".join((key, str(flat[key]))) for key in bad_tags], self.message, {key : flat[key] for key in bad_tags})
+
+    # returns the fix for an asset's missing tags - they're marked with the magic string
+    def fix(self, bad_tags: list[str]) -> dict:
+        return {key : yaml_io.quoted(self.mark) for key in bad_tags}
+
+# a single "all assets that share X must share Y" check
+class GroupCheck:
+    __slots__ = ("group_by", "must_share", "unless_all", "message")
+
+    # params:
+    #   group_by - the tag (X) the groups are made by
+    #   must_share - the tag (Y) every asset in a group must have
+    #   unless_all - a tag that excuses all of the check's conflicts if it is true
+    #                for every asset in every group (or None)
+    #   message - the error message
+    def __init__(self, group_by: str, must_share: str, unless_all: str, message: str):
+        self.group_by = group_by
+        self.must_share = must_share
+        self.unless_all = unless_all
+        self.message = message
+
+    # returns True if values (the unless_all tag of every asset in a group) excuse the conflicts
+    def excused(self, values) -> bool:
+        if self.unless_all is None:
+            return False
+
+        for value in values:
+            if value != True:
+                return False
+
+        return True
+
+# assets that share one tag must share another
+class Consistent(RuleDef):
+    def __init__(self, name: str, spec: dict):
+        RuleDef.__init__(self, name, spec)
+
+        self.checks = []
+        for check in self._read(spec, "checks"):
+            self.checks.append(GroupCheck(check["group_by"], check["must_share"], check.get("unless_all"), check["message"]))
+
+        # the tags assets are grouped by - in the order checks first use them
+        self.keys = list(dict.fromkeys(check.group_by for check in self.checks))
+
+        self.tags = list(inventory_table.LOCATION_TAGS)
+        for check in self.checks:
+            self.tags += [check.group_by, check.must_share] + ([check.unless_all] if check.unless_all else [])
+
+# assets in the same rack can't take up the same rack units (see rack_index.py)
+class Overlap(RuleDef):
+    # the group key incremental checks keep each asset's rack under
+    KEY = "rack"
+
+    def __init__(self, name: str, spec: dict):
+        RuleDef.__init__(self, name, spec)
+        self.message = self._read(spec, "message")
+        self.tags = list(inventory_table.LOCATION_TAGS) + ["hardware.condo_chassis.identifier"]
+
+# a tag has to be filled in within some number of days of a date
+class Age(RuleDef):
+    def __init__(self, name: str, spec: dict):
+        RuleDef.__init__(self, name, spec)
+        self.tag = self._read(spec, "tag")
+        self.since = self._read(spec, "since")
+        self.days = int(self._read(spec, "days"))
+        self.message = self._read(spec, "message")
+        self.undated = spec.get("undated", self.message)
+        self.date_format = spec.get("format", DATE_FORMAT)
+
+        self.tags = [self.tag, self.since] + message_tags(self.message) + message_tags(self.undated)
+
+    # checks a single asset
+    #
+    # params:
+    #   fqdn - the asset's fqdn
+    #   flat - the asset's flattened tags
+    #   today - the date to measure age against
+    #
+    # returns: a MissingDataError or None
+    def check(self, fqdn: str, flat: dict, today: datetime.datetime):
+        if not is_missing(flat.get(self.tag, "")):
+            return None
+
+        since = flat.get(self.since, "")
+        if is_missing(since):
+            return errortypes.MissingDataError(fqdn + ".yaml", [self.tag], format_message(self.undated, flat))
+
+        olddate = datetime.datetime.strptime(since, self.date_format)
+        if (today - olddate).days >= self.days:
+            return errortypes.MissingDataError(fqdn + ".yaml", [self.tag], format_message(self.message, flat))
+
+        return None
+
+# the definition class for each rule type
+RULE_TYPES = {
+    "required"   : Required,
+    "consistent" : Consistent,
+    "overlap"    : Overlap,
+    "age"        : Age,
+}
+
+# returns a hash of the settings of every rule (and their order) - results saved under
+# one set of rules (ex. check_state.py) are stale once the hash changes
+def rules_stamp(rules: dict) -> str:
+    specs = [(name, definition.spec) for name, definition in rules.items()]
+    return hashlib.sha1(json.dumps(specs, sort_keys=True, default=str).encode()).hexdigest()
+
+# reads and compiles every rule in a rules file
+#
+# params:
+#   path - the rules file (defaults to rules.yaml next to config.yaml)
+#
+# returns: a dict of rule name -> RuleDef - in the order they're listed
+def load_rules(path: str=RULES_PATH) -> dict:
+    with open(path, 'r') as infile:
+        specs = yaml.safe_load(infile) or dict()
+
+    rules = dict()
+    for name, spec in specs.items():
+        kind = spec.get("type")
+        if kind not in RULE_TYPES:
+            raise ValueError(f"{path}: rule '{name}' has unknown type '{kind}'")
+
+        if kind == "required" and any(rule.type != "required" for rule in rules.values()):
+            raise ValueError(f"{path}: required rule '{name}' has to come before the other rules")
+
+        rules[name] = RULE_TYPES[kind](name, spec)
+
+    return rules
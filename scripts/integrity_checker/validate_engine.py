@@ -0,0 +1,247 @@
+# runs any number of validation rules over an inventory in a single pass
+#
+# each asset is flattened once and the flat dict is handed to every active rule in
+# turn - rules that propose a change to an asset (ex. marking missing tags) update the
+# flat dict in place, so the rules after them see the asset as if the fix had been made
+#
+# a rule implements some of:
+#   start(table) - called once before the pass
+#   visit(table, row, flat) - called for every asset (row) with its flattened tags
+#   finish() - called once after the pass - returns the rule's list of errortypes.DataError
+#   proposed_fixes() - called after finish() - returns the rule's list of Fixes
+#
+# errors come back grouped by rule, in the order the rules were given
+#
+# a rule that sets shardable = True can also be run across worker processes: each
+# worker visits a contiguous shard of the table's rows with its own copy of the rules
+# and hands back shard_state(), which the main process feeds to merge() in shard
+# order - so the errors come out in the same order as a single process run
+#
+# validation never changes asset files itself - rules only propose Fixes, which
+# are made (or previewed) afterwards, all in one batch, by apply_fixes()
+import sys
+import os
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.abspath('../shared'))
+
+import yaml_io
+import inventory_table
+
+# inventories smaller than this are always checked in a single process
+SHARD_MIN_ASSETS = 5000
+
+# the assets are split into this many shards per worker so a slow shard doesn't hold up the rest
+SHARDS_PER_JOB = 4
+
+# a change to a single asset that a rule proposes
+class Fix:
+    __slots__ = ("asset", "values")
+
+    # params:
+    #   asset - the yaml_io.Asset to change
+    #   values - the yaml style tags to change -> their new values (see Asset.put_many())
+    def __init__(self, asset: yaml_io.Asset, values: dict):
+        self.asset = asset
+        self.values = values
+
+# what a single rule found in a run - and what it cost
+class RuleStats:
+    __slots__ = ("name", "errors", "assets", "seconds")
+
+    # params:
+    #   name - the rule's name
+    #   errors - the rule's list of errortypes.DataError
+    #   assets - the number of assets the rule looked at
+    #   seconds - the time spent in the rule (summed over every worker process)
+    def __init__(self, name: str, errors: list, assets: int, seconds: float):
+        self.name = name
+        self.errors = errors
+        self.assets = assets
+        self.seconds = seconds
+
+# the base class for validation rules - every hook does nothing by default
+class Rule:
+    # the name the rule is selected by (ex. a check_data.py command line option)
+    name = ""
+
+    # True if the rule implements shard_state() and merge()
+    shardable = False
+
+    def start(self, table):
+        pass
+
+    def visit(self, table, row: int, flat: dict):
+        pass
+
+    def finish(self) -> list:
+        return []
+
+    def proposed_fixes(self) -> list[Fix]:
+        return []
+
+    # called in a worker after it has visited its shard - returns what merge() needs (must pickle)
+    def shard_state(self):
+        return None
+
+    # called in the main process (after start()) with the shard_state() of every shard in order
+    # rows in the state are rows of the whole table
+    def merge(self, state):
+        pass
+
+# the table being checked - set once in each worker process
+_shard_table = None
+
+# runs in each new worker process - the table is handed over once per worker (and isn't
+# pickled at all where workers are forked) instead of once per shard
+def _init_shard_worker(table):
+    global _shard_table
+    _shard_table = table
+
+# hands rows first up to (not including) last of table to every rule
+# the time spent in each rule is added to spent - one clock read per visit
+def _visit_rows(rules: list[Rule], table, first: int, last: int, spent: list[float]):
+    for row in range(first, last):
+        flat = table.row(row)
+
+        clock = time.perf_counter()
+        for i, rule in enumerate(rules):
+            rule.visit(table, row, flat)
+
+            now = time.perf_counter()
+            spent[i] += now - clock
+            clock = now
+
+# visits a shard of the table - this is the unit of work handed to each worker process
+#
+# params:
+#   rules - fresh (not started) Rule objects
+#   first, last - the shard's rows are first up to (not including) last
+#
+# returns: the shard_state() of each rule and the time spent in each rule
+def _run_shard(rules: list[Rule], first: int, last: int) -> tuple:
+    table = _shard_table
+    spent = [0.0] * len(rules)
+
+    for rule in rules:
+        rule.start(table)
+
+    _visit_rows(rules, table, first, last, spent)
+
+    return ([rule.shard_state() for rule in rules], spent)
+
+class ValidationEngine:
+    # params:
+    #   rules - a list of Rule objects - run in this order on every asset
+    def __init__(self, rules: list[Rule]):
+        self.rules = list(rules)
+
+        # the fixes proposed by the last run - in rule order
+        self.fixes = []
+
+        # a RuleStats for each rule in the last run
+        self.stats = []
+
+    # validates every asset in a single pass
+    #
+    # params:
+    #   assets: an inventory_table.InventoryTable (or a list of assets)
+    #   jobs: the number of worker processes to split the pass across
+    #
+    # returns: a list of errortypes.DataError - all of the first rule's errors, then the second's, etc.
+    def run(self, assets, jobs: int=1) -> list:
+        table = inventory_table.as_table(assets)
+
+        # the rules are copied for the workers before start() ties them to the table
+        shardable = all(rule.shardable for rule in self.rules)
+        if jobs > 1 and shardable and len(table) >= SHARD_MIN_ASSETS:
+            fresh = copy.deepcopy(self.rules)
+        else:
+            fresh = None
+
+        spent = [0.0] * len(self.rules)
+
+        for i, rule in enumerate(self.rules):
+            clock = time.perf_counter()
+            rule.start(table)
+            spent[i] += time.perf_counter() - clock
+
+        if fresh is not None:
+            self._run_sharded(table, fresh, jobs, spent)
+        else:
+            _visit_rows(self.rules, table, 0, len(table), spent)
+
+        found = []
+        for i, rule in enumerate(self.rules):
+            clock = time.perf_counter()
+            found.append(rule.finish())
+            spent[i] += time.perf_counter() - clock
+
+        self.fixes = []
+        for rule in self.rules:
+            self.fixes.extend(rule.proposed_fixes())
+
+        self.stats = [RuleStats(rule.name, errs, len(table), seconds) for rule, errs, seconds in zip(self.rules, found, spent)]
+
+        return [err for errs in found for err in errs]
+
+    # visits the table in contiguous shards across a process pool
+    # the shards are merged in order as they come back
+    def _run_sharded(self, table, fresh: list[Rule], jobs: int, spent: list[float]):
+        size = -(-len(table) // (jobs * SHARDS_PER_JOB))
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_shard_worker, initargs=(table,)) as pool:
+            pending = []
+            for first in range(0, len(table), size):
+                pending.append(pool.submit(_run_shard, fresh, first, min(first + size, len(table))))
+
+            for future in pending:
+                states, shard_spent = future.result()
+
+                for i, rule in enumerate(self.rules):
+                    clock = time.perf_counter()
+                    rule.merge(states[i])
+                    spent[i] += shard_spent[i] + time.perf_counter() - clock
+
+# runs rules over assets in a single pass - see ValidationEngine.run()
+#
+# params:
+#   fixes - a list the proposed fixes are added to (they're dropped if None)
+#   jobs - the number of worker processes to split the pass across
+#   stats - a list a RuleStats for each rule is added to (dropped if None)
+def run_rules(assets, rules: list[Rule], fixes: list=None, jobs: int=1, stats: list=None) -> list:
+    engine = ValidationEngine(rules)
+    errs = engine.run(assets, jobs)
+
+    if fixes is not None:
+        fixes.extend(engine.fixes)
+
+    if stats is not None:
+        stats.extend(engine.stats)
+
+    return errs
+
+# makes the changes proposed by a validation run
+# every changed file is written in one batch once all of the fixes have been made
+#
+# params:
+#   fixes - a list of Fixes
+#   dry_run - only work out what would change - neither the files nor the assets are touched
+#
+# returns: the yaml_io.AssetWriter used - writer.written lists the files that were (or
+#          would have been) rewritten and for a dry run, writer.diffs holds what would change
+def apply_fixes(fixes: list[Fix], dry_run: bool=False) -> yaml_io.AssetWriter:
+    with yaml_io.AssetWriter(dry_run) as writer:
+        for fix in fixes:
+            asset = copy.deepcopy(fix.asset) if dry_run else fix.asset
+
+            # several fixes for one asset pile up on the same (copied) object
+            pending = writer.pending.get(asset.filepath)
+            if dry_run and pending is not None:
+                asset = pending
+
+            asset.put_many(fix.values)
+            writer.add(asset, asset.filepath)
+
+    return writer
@@ -1,71 +1,151 @@
 # this file contains helper functions used in validate.py
 import sys
-import re
-import itertools
 import os
 sys.path.append(os.path.abspath('../shared'))
 
 import yaml_io
 import errortypes
+import inventory_table
+from missing_values import is_missing
 
-# regex to match possible ways of saying 'missing'
-missing_rxp = "(?i)none|missing|\\?+|^\\s*$"
+# the keys whose groups compare location as a whole ("elev.rack.room.building")
+FULL_LOCATION_KEYS = ['location.rack', 'location.elevation']
+
+# returns the value an asset is grouped (and compared) by for key - from its flattened tags
+# location.rack and location.elevation stand for the full location "elev.rack.room.building"
+# raises KeyError if the asset doesn't have the tag
+def group_value(flat: dict, key: str):
+    if key in FULL_LOCATION_KEYS:
+        return '.'.join(flat[tag] for tag in inventory_table.LOCATION_TAGS)
+
+    return flat[key]
+
+# hash buckets of assets (table rows) that share a value - for many keys at once
+# rows are added one at a time, so the buckets for every key are built in a single
+# linear pass instead of a sort per key
+class GroupIndex:
+    # params:
+    #   keys: the attributes to group by (in YAML style ex. 'location.rack')
+    def __init__(self, keys: list[str]):
+        self.keys = list(keys)
+        self.buckets = {key : dict() for key in self.keys}
+        self._groups = dict()
+
+    # builds an index over every row of table
+    @classmethod
+    def build(cls, table, keys: list[str]):
+        table = inventory_table.as_table(table)
+        index = cls(keys)
+
+        for key in index.keys:
+            missing = table.missing_mask(key)
+
+            if key in FULL_LOCATION_KEYS:
+                values = table.full_location_column()
+            else:
+                values = table.column(key)
+
+            bucket = index.buckets[key]
+            for row, value in enumerate(values):
+                if not missing[row]:
+                    bucket.setdefault(value, []).append(row)
+
+        return index
+
+    # adds a single row from its flattened tags
+    # assets that are missing the value for a key don't belong to a group for it
+    def add(self, row: int, flat: dict):
+        for key, bucket in self.buckets.items():
+            value = flat.get(key)
+            if value is None or is_missing(value):
+                continue
+
+            # want to compare location as a whole
+            if key in FULL_LOCATION_KEYS:
+                value = group_value(flat, key)
+
+            bucket.setdefault(value, []).append(row)
+
+        self._groups.clear()
+
+    # adds the buckets of another index (ex. one built over a later shard of the same table)
+    # other's rows come after every row already added
+    #
+    # params:
+    #   other: a GroupIndex with the same keys
+    #   offset: the row other's row 0 stands for
+    def merge(self, other, offset: int=0):
+        for key, bucket in self.buckets.items():
+            for value, rows in other.buckets[key].items():
+                bucket.setdefault(value, []).extend(row + offset for row in rows)
+
+        self._groups.clear()
+
+    # returns the groups for key - a list of lists of rows, ordered by the shared value
+    # only values shared by more than one row make a group
+    def groups(self, key: str) -> list[list[int]]:
+        if key not in self._groups:
+            bucket = self.buckets[key]
+            self._groups[key] = [bucket[value] for value in sorted(bucket) if len(bucket[value]) > 1]
+
+        return self._groups[key]
+
+    def __getitem__(self, key: str) -> list[list[int]]:
+        return self.groups(key)
 
 # groups assets that share a certain attribute
 #
 # params:
-#   assets: list of all assets
+#   table: an inventory_table.InventoryTable (a list of assets is turned into one)
 #   key: the attribute to group by (in YAML style ex. 'location.rack')
 #
-# returns: a list[list[yaml_io.Asset]] - a list of groups
+# returns: a list[list[int]] - a list of groups of table rows, ordered by the shared value
 #          all assets in a group posess the same value for the given key
 #
-def group_by_attrib(assets: list, key: str):
-    ret_group = []
+def group_by_attrib(table, key: str):
+    return GroupIndex.build(table, [key]).groups(key)
 
-    if key == 'location.rack' or key == 'location.elevation':
-        # want to compare location as a whole
-        keyfunc = lambda a: a.get_full_location()
-    else:
-        keyfunc = lambda a: a.get(key)
+# checks a single group of assets that share X for "all assets that share X must share Y"
+#
+# params:
+#   members: a list of (fqdn, flattened tags) for each asset in the group - in file order
+#   shared_tag: the tag (X) the group was made by
+#   tag: the tag to validate
+#   msg: an error message to display if the validation fails
+#
+# returns: a ConflictingGroupError or None if the group has no conflicts
+def group_conflict(members: list[tuple], shared_tag: str, tag: str, msg: str):
+    conflicting = []
+    for fqdn, flat in members:
+        # gather all conflicting items
+        value = group_value(flat, tag)
 
-    grp_list = list(filter(lambda a: not re.fullmatch(missing_rxp, a.get(key)), assets))
+        # do we really want to account for missing things? - UW tags make no sense
+        if is_missing(value):
+            conflicting.append(errortypes.ConflictItem(fqdn + '.yaml', flat[shared_tag], value))
 
-    # now group by each asset by value corresponding to key
-    grp_list = sorted(grp_list, key=keyfunc)
-    for k, g in itertools.groupby(grp_list, keyfunc):
-        group = list(g)
-        if len(group) > 1:
-            ret_group.append(group)
+    if conflicting:
+        return errortypes.ConflictingGroupError(conflicting, msg)
 
-    return ret_group
+    return None
 
 # makes validations of the form "all assets that share X must share Y"
 #
 # params:
-#   groups: a list of groups (lists) of Assets grouped by X
-#           most likely returned by get_key_grps()
+#   table: the InventoryTable the groups were made from
+#   shared_tag: the tag (X) the groups were made by
+#   groups: a GroupIndex with X as one of its keys
+#           (or a dict of tag -> list of groups of table rows, like group_by_attrib() returns)
 #   tag: the tag to validate
 #   msg: an error message to display if the validation fails
 #
 # returns: a list of ConflictingGroupErrors or None if no conflicts are found
 #
-def get_conflicts(shared_tag: str, groups: list, tag: str, msg: str): 
+def get_conflicts(table, shared_tag: str, groups: dict, tag: str, msg: str):
     errs = []
     for group in groups[shared_tag]:
-        conflicting = []
-        for asset in group:
-            # gather all conflicting items
-            if tag == 'location.rack' or tag == 'location.elevation':
-                value = asset.get_full_location()
-            else:
-                value = asset.get(tag)
-
-            # do we really want to account for missing things? - UW tags make no sense
-            if (re.fullmatch(missing_rxp, value)):
-                conflicting.append(errortypes.ConflictItem(asset.fqdn + '.yaml', asset.get(shared_tag) , value))
-
-        if conflicting:
-            errs.append(errortypes.ConflictingGroupError(conflicting, msg))
+        err = group_conflict([(table.fqdn[row], table.row(row)) for row in group], shared_tag, tag, msg)
+        if err is not None:
+            errs.append(err)
 
     return errs if errs else None
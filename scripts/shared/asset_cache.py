@@ -0,0 +1,138 @@
+# an on-disk cache of parsed asset files
+# lets yaml_io.read_yaml() skip re-parsing files that have not changed since the last run
+#
+# each entry is keyed by filename and remembers the file's mtime, size, and content hash
+# a file whose mtime and size still match is a hit without being opened - if only the
+# stat changed (ex. after a fresh git checkout) the content hash decides
+
+import os
+import sys
+import pickle
+import hashlib
+
+# bump this if the layout of the cache file changes
+CACHE_FORMAT = 2
+
+# an entry for a single asset file
+# the parsed dict is kept pickled so callers can freely modify
+# the dicts they are handed without changing what gets cached
+class CacheEntry:
+    __slots__ = ("mtime", "size", "digest", "blob")
+
+    def __init__(self, mtime: int, size: int, digest: str, data: dict):
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # returns a fresh copy of the parsed dict
+    def load(self) -> dict:
+        return pickle.loads(self.blob)
+
+# hashes the raw bytes of an asset file
+def hash_bytes(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()
+
+# returns the default cache location for a YAML directory
+# the cache lives next to (not inside) the directory
+# ex. current_assets/ -> .current_assets.asset_cache
+def cache_path_for(yaml_dir: str) -> str:
+    yaml_dir = os.path.normpath(yaml_dir)
+    parent, name = os.path.split(yaml_dir)
+    return os.path.join(parent, f".{name}.asset_cache")
+
+class AssetCache:
+    # params:
+    #   path - the cache file
+    #   stamp - a version stamp for the data (ex. derived from ASSET_TEMPLATE)
+    #           a cache written with a different stamp is thrown away
+    def __init__(self, path: str, stamp: str):
+        self.path = path
+        self.stamp = stamp
+        self.entries = dict()
+        self.dirty = False
+
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as infile:
+                fmt, stamp, entries = pickle.load(infile)
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            # a corrupt or truncated cache just means a cold read
+            print(f"WARNING: ignoring unreadable asset cache '{self.path}': {err}", file=sys.stderr)
+            return
+
+        if fmt == CACHE_FORMAT and stamp == self.stamp:
+            self.entries = entries
+        else:
+            # rewrite it with the current stamp
+            self.dirty = True
+
+    # looks up the cache entry for a file
+    #
+    # params:
+    #   path - the asset file
+    #   stat - the result of os.stat(path)
+    #
+    # returns: the CacheEntry - or None if the file is missing from the cache or stale
+    def lookup(self, path: str, stat: os.stat_result):
+        entry = self.entries.get(os.path.basename(path))
+        if entry is None or entry.size != stat.st_size:
+            return None
+
+        if entry.mtime == stat.st_mtime_ns:
+            return entry
+
+        # the file was touched - see if its contents actually changed
+        try:
+            with open(path, 'rb') as infile:
+                digest = hash_bytes(infile.read())
+        except OSError:
+            return None
+
+        if digest != entry.digest:
+            return None
+
+        entry.mtime = stat.st_mtime_ns
+        self.dirty = True
+        return entry
+
+    # records the freshly parsed contents of a file
+    # stat should be taken before the file was read
+    def store(self, path: str, stat: os.stat_result, digest: str, data: dict):
+        self.entries[os.path.basename(path)] = CacheEntry(stat.st_mtime_ns, stat.st_size, digest, data)
+        self.dirty = True
+
+    # drops entries for files that no longer exist
+    #
+    # params:
+    #   paths - every asset file currently in the directory
+    def evict(self, paths: list[str]):
+        live = {os.path.basename(path) for path in paths}
+        dead = [name for name in self.entries if name not in live]
+
+        for name in dead:
+            del self.entries[name]
+
+        if dead:
+            self.dirty = True
+
+    # writes the cache back to disk (if anything changed)
+    # the cache is written to a temp file first so a crash never leaves a truncated cache
+    def save(self):
+        if not self.dirty:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as outfile:
+                pickle.dump((CACHE_FORMAT, self.stamp, self.entries), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print(f"WARNING: could not write asset cache '{self.path}': {err}", file=sys.stderr)
+            return
+
+        self.dirty = False
@@ -0,0 +1,213 @@
+# a compact, fixed layout representation of an asset
+#
+# a yaml_io.Asset holds a nested dict of dicts per asset, with every key string repeated
+# per instance. an AssetRecord instead has one __slots__ field per flattened tag in
+# yaml_io.ASSET_TEMPLATE (ex. location.rack -> record.location_rack) which uses much less
+# memory for large inventories and makes field access a plain attribute lookup
+#
+# records convert losslessly to and from the nested dict, so they can be handed to
+# yaml_io.write_yaml() and to anything that uses Asset.get() / get_many() / put()
+#
+# yaml_io.read_yaml(path, records=True) loads a directory straight into records
+
+import yaml_io
+
+# stands in for template tags that an asset file doesn't have
+# so that to_dict() leaves them out again
+class _Absent:
+    def __repr__(self):
+        return "ABSENT"
+
+    # unpickles as the module level ABSENT - keeps 'is ABSENT' working across processes
+    def __reduce__(self):
+        return "ABSENT"
+
+ABSENT = _Absent()
+
+# shared tuples of tag orderings - most records use one of a handful of layouts
+_LAYOUTS = dict()
+
+# turns a yaml style tag into an attribute name (ex. location.rack -> location_rack)
+def slot_name(tag: str) -> str:
+    return tag.replace('.', '_')
+
+# flattens a nested dict like dict_utils.flatten_dict() does - except that empty
+# sub-dicts are kept as values, so nothing is lost when the dict is re-nested
+def _flatten(nested: dict, parent_key: str='', flat: dict=None) -> dict:
+    if flat is None:
+        flat = dict()
+
+    for key, value in nested.items():
+        newkey = key if parent_key == '' else parent_key + '.' + key
+
+        if isinstance(value, dict) and value:
+            _flatten(value, newkey, flat)
+        else:
+            flat[newkey] = value
+
+    return flat
+
+# the methods shared by every generated record type
+class RecordBase:
+    __slots__ = ()
+
+    # builds a record from an asset's nested dict
+    #
+    # params:
+    #   fqdn - the asset's fqdn
+    #   nested - the nested dict (ex. Asset.asset)
+    #   filepath - the file the asset was read from (if any)
+    #   digest - the content hash of that file (if known) - same as Asset.digest
+    @classmethod
+    def from_dict(cls, fqdn: str, nested: dict, filepath: str="", digest: str=None):
+        record = cls.__new__(cls)
+        record.fqdn = fqdn
+        record.filepath = filepath
+        record.digest = digest
+
+        flat = _flatten(nested)
+
+        for tag, slot in cls.SLOT_FOR.items():
+            setattr(record, slot, flat.get(tag, ABSENT))
+
+        # tags the template doesn't know about are kept on the side
+        extra = {tag : value for tag, value in flat.items() if tag not in cls.SLOT_FOR}
+        record._extra = extra if extra else None
+
+        # only remember the key order if it differs from the template's
+        layout = tuple(flat.keys())
+        if layout == cls.TAGS:
+            record._layout = None
+        else:
+            record._layout = _LAYOUTS.setdefault(layout, layout)
+
+        return record
+
+    # builds a record from a yaml_io.Asset
+    @classmethod
+    def from_asset(cls, asset: yaml_io.Asset):
+        return cls.from_dict(asset.fqdn, asset.asset, getattr(asset, "filepath", ""), asset.digest)
+
+    # re-nests the record into a dict identical to the one it was built from
+    def to_dict(self) -> dict:
+        ret = dict()
+
+        for tag in self._layout if self._layout is not None else self.TAGS:
+            value = self._value(tag)
+            if value is ABSENT:
+                continue
+
+            path = yaml_io.compile_path(tag)
+            node = ret
+            for key in path[:-1]:
+                node = node.setdefault(key, dict())
+
+            node[path[-1]] = value
+
+        return ret
+
+    # the nested dict - so a record can be passed to yaml_io.write_yaml()
+    @property
+    def asset(self) -> dict:
+        return self.to_dict()
+
+    def _value(self, tag: str):
+        slot = self.SLOT_FOR.get(tag)
+        if slot is not None:
+            return getattr(self, slot)
+
+        if self._extra is not None and tag in self._extra:
+            return self._extra[tag]
+
+        return ABSENT
+
+    # returns a data field from it's yaml style path (ex. location.rack)
+    # raises KeyError if the tag does not exist - same as Asset.get()
+    def get(self, key: str):
+        value = self._value(key)
+        if value is ABSENT or isinstance(value, dict):
+            raise KeyError(key)
+
+        return value
+
+    # returns a list of data fields - one for each tag in keys (in order)
+    def get_many(self, keys: list[str]) -> list:
+        return [self.get(key) for key in keys]
+
+    # stores value under a yaml style tag (ex. location.rack)
+    def put(self, key: str, value):
+        self.put_many({key : value})
+
+    # stores many values at once - like Asset.put_many(), every string
+    # is marked to be double quoted when the record is written out
+    def put_many(self, values: dict):
+        for key, value in values.items():
+            present = self._value(key) is not ABSENT
+
+            slot = self.SLOT_FOR.get(key)
+            if slot is not None:
+                setattr(self, slot, value)
+            else:
+                if self._extra is None:
+                    self._extra = dict()
+                self._extra[key] = value
+
+            # new tags go on the end - re-nesting then puts them at the end of their
+            # sub-dict, which is the same place Asset.put() would
+            if not present:
+                layout = (self._layout if self._layout is not None else self.TAGS) + (key,)
+                self._layout = _LAYOUTS.setdefault(layout, layout)
+
+        for slot in self.SLOTS:
+            value = getattr(self, slot)
+            if type(value) is str:
+                setattr(self, slot, yaml_io.quoted(value))
+
+        if self._extra is not None:
+            for tag, value in self._extra.items():
+                if type(value) is str:
+                    self._extra[tag] = yaml_io.quoted(value)
+
+    # returns the asset's full location "elev.rack.room.building" - same as Asset.get_full_location()
+    def get_full_location(self) -> str:
+        return '.'.join((self.location_elevation, self.location_rack, self.location_room, self.location_building))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.fqdn!r})"
+
+# generates a record class with one slot per flattened tag in template
+#
+# params:
+#   template - a nested dict like yaml_io.ASSET_TEMPLATE
+#   name - the name of the generated class
+#
+# returns: the new class
+def make_record_type(template: dict, name: str="Record") -> type:
+    tags = tuple(_flatten(template).keys())
+    slots = tuple(slot_name(tag) for tag in tags)
+
+    if len(set(slots)) != len(slots):
+        raise ValueError(f"template tags do not map to unique attribute names: {tags}")
+
+    namespace = {
+        "__slots__" : ("fqdn", "filepath", "digest", "_extra", "_layout") + slots,
+        "TAGS" : tags,
+        "SLOTS" : slots,
+        "SLOT_FOR" : dict(zip(tags, slots)),
+    }
+
+    return type(name, (RecordBase,), namespace)
+
+# the record type for the current asset template
+# (it has to stay reachable by this name for records to be pickled)
+AssetRecord = make_record_type(yaml_io.ASSET_TEMPLATE, "AssetRecord")
+
+# yields an AssetRecord for each asset file in yaml_dir
+# takes the same keyword arguments as yaml_io.iter_yaml()
+def iter_records(yaml_dir: str, **kwargs):
+    for asset in yaml_io.iter_yaml(yaml_dir, **kwargs):
+        yield AssetRecord.from_asset(asset)
+
+# reads all asset files in yaml_dir into a list of AssetRecords
+def read_records(yaml_dir: str, **kwargs) -> list:
+    return list(iter_records(yaml_dir, **kwargs))
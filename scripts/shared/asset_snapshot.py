@@ -0,0 +1,249 @@
+#!/bin/python3
+
+# a packed, single file snapshot of a whole YAML asset directory
+# lets yaml_io.read_yaml() load an inventory with one open() instead of one per asset
+#
+# the per-asset YAML files stay the source of truth - a snapshot is derived from them
+# (see yaml_io.export_snapshot()) and can be checked against them (yaml_io.verify_snapshot())
+#
+# file layout - every line is one JSON document:
+#   header  {"magic", "format", "stamp", "count"}
+#   records [fqdn, content hash of the YAML file, parsed dict] - one per asset, ordered by filename
+#   index   {"index" : {fqdn : byte offset of its record}, "skipped" : [files that failed to parse],
+#            "files" : {filename : [mtime in ns, size]} for every file the snapshot was made from}
+#   footer  the byte offset of the index line - zero padded to a fixed width
+#
+# the footer lets a reader jump straight to the index, and the index lets it seek
+# straight to any one record without scanning the file
+
+import os
+import json
+import datetime
+
+SNAPSHOT_MAGIC = "asset-snapshot"
+
+# bump this if the layout of the snapshot file changes
+SNAPSHOT_FORMAT = 2
+
+# the footer is always this many bytes (digits + '\n')
+FOOTER_WIDTH = 21
+
+# YAML can hold dates, which JSON can't - they're stored as tagged objects instead
+# ex. date(2021, 3, 4) -> {"$date" : "2021-03-04"}
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime" : value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date" : value.isoformat()}
+
+    raise TypeError(f"cannot store {type(value).__name__} in a snapshot")
+
+def _decode(obj: dict):
+    if len(obj) == 1:
+        if "$date" in obj:
+            return datetime.date.fromisoformat(obj["$date"])
+        if "$datetime" in obj:
+            return datetime.datetime.fromisoformat(obj["$datetime"])
+
+    return obj
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, default=_encode, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def _loads(line: bytes):
+    return json.loads(line, object_hook=_decode)
+
+# returns the default snapshot location for a YAML directory
+# the snapshot lives next to (not inside) the directory
+# ex. current_assets/ -> .current_assets.snapshot
+def snapshot_path_for(yaml_dir: str) -> str:
+    yaml_dir = os.path.normpath(yaml_dir)
+    parent, name = os.path.split(yaml_dir)
+    return os.path.join(parent, f".{name}.snapshot")
+
+# writes a snapshot one record at a time
+# the snapshot is written to a temp file and only moved into place by close()
+#
+# usage:
+#   with SnapshotWriter(path, stamp, files) as writer:
+#       writer.add(fqdn, digest, data)
+class SnapshotWriter:
+    # params:
+    #   path - the snapshot file
+    #   stamp - a version stamp for the data (ex. yaml_io.template_stamp())
+    #   files - filename -> (mtime in ns, size) of every file in the directory - taken before
+    #           they were read, so a file changed during the export makes the snapshot stale
+    def __init__(self, path: str, stamp: str, files: dict):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.stamp = stamp
+        self.files = files
+        self.index = dict()
+        self.skipped = []
+
+        # the header is rewritten with the final count when the snapshot is closed
+        # so it's padded to keep every record's offset the same
+        self.outfile = open(self.tmp_path, 'wb')
+        self.outfile.write(self._header(0))
+
+    def _header(self, count: int) -> bytes:
+        header = {
+            "magic" : SNAPSHOT_MAGIC,
+            "format" : SNAPSHOT_FORMAT,
+            "stamp" : self.stamp,
+            "count" : f"{count:012d}",
+        }
+        return _dumps(header)
+
+    def add(self, fqdn: str, digest: str, data: dict):
+        self.index[fqdn] = self.outfile.tell()
+        self.outfile.write(_dumps([fqdn, digest, data]))
+
+    # remembers a file that could not be parsed - so loading the snapshot can report it too
+    def skip(self, filename: str):
+        self.skipped.append(filename)
+
+    def close(self):
+        index_at = self.outfile.tell()
+        files = {name : list(stat) for name, stat in self.files.items()}
+        self.outfile.write(_dumps({"index" : self.index, "skipped" : self.skipped, "files" : files}))
+        self.outfile.write(f"{index_at:0{FOOTER_WIDTH - 1}d}\n".encode())
+
+        self.outfile.seek(0)
+        self.outfile.write(self._header(len(self.index)))
+        self.outfile.close()
+
+        os.replace(self.tmp_path, self.path)
+
+    # throws the partially written snapshot away
+    def abort(self):
+        self.outfile.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+# a read-only view of a snapshot file
+# raises ValueError if the file isn't a snapshot this code can read
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        self.infile = open(path, 'rb')
+
+        try:
+            self._read_index()
+        except Exception:
+            self.infile.close()
+            raise
+
+    def _read_index(self):
+        try:
+            self.header = _loads(self.infile.readline())
+        except ValueError:
+            raise ValueError(f"'{self.path}' is not an asset snapshot")
+
+        if not isinstance(self.header, dict) or self.header.get("magic") != SNAPSHOT_MAGIC:
+            raise ValueError(f"'{self.path}' is not an asset snapshot")
+        if self.header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"'{self.path}' has snapshot format {self.header.get('format')} - expected {SNAPSHOT_FORMAT}")
+
+        self.records_at = self.infile.tell()
+
+        self.infile.seek(-FOOTER_WIDTH, os.SEEK_END)
+        self.index_at = int(self.infile.read(FOOTER_WIDTH))
+
+        self.infile.seek(self.index_at)
+        trailer = _loads(self.infile.readline())
+        self.index = trailer["index"]
+        self.skipped = trailer["skipped"]
+        self.files = {name : tuple(stat) for name, stat in trailer["files"].items()}
+
+    @property
+    def stamp(self) -> str:
+        return self.header["stamp"]
+
+    # returns True if a file still has the mtime and size it had when the snapshot was made
+    #
+    # params:
+    #   filename - the file's name (ex. "host.chtc.wisc.edu.yaml")
+    #   stat - the result of os.stat() on it
+    def current(self, filename: str, stat: os.stat_result) -> bool:
+        return self.files.get(filename) == (stat.st_mtime_ns, stat.st_size)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, fqdn: str) -> bool:
+        return fqdn in self.index
+
+    # reads the record for a single asset - seeking straight to it
+    #
+    # returns: a tuple of (content hash, parsed dict)
+    #          raises KeyError if the asset isn't in the snapshot
+    def get(self, fqdn: str) -> tuple:
+        self.infile.seek(self.index[fqdn])
+        name, digest, data = _loads(self.infile.readline())
+
+        if name != fqdn:
+            raise ValueError(f"'{self.path}' index is corrupt: {fqdn} points at {name}")
+
+        return (digest, data)
+
+    # yields (fqdn, content hash, parsed dict) for every record - in file order
+    def __iter__(self):
+        self.infile.seek(self.records_at)
+
+        # one sequential read - records are read back in the order they were written
+        raw = self.infile.read(self.index_at - self.records_at)
+        for line in raw.splitlines():
+            yield tuple(_loads(line))
+
+    def close(self):
+        self.infile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# command line usage (from the repo's top level directory):
+#   ./scripts/shared/asset_snapshot.py export current_assets/
+#   ./scripts/shared/asset_snapshot.py verify current_assets/
+def main():
+    import sys
+    import argparse
+
+    # yaml_io imports this module - so it's only pulled in when run as a script
+    sys.path.append(os.path.abspath("scripts/shared/"))
+    import yaml_io
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", help="export a new snapshot or verify an existing one", choices=["export", "verify"])
+    parser.add_argument("yaml_path", help="the YAML asset directory", type=str)
+    parser.add_argument("-o", "--output", help="the snapshot file (defaults to next to yaml_path)", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.action == "export":
+        count = yaml_io.export_snapshot(args.yaml_path, args.output)
+        print(f"asset_snapshot: packed {count} assets")
+        return
+
+    problems = yaml_io.verify_snapshot(args.yaml_path, args.output)
+    for problem in problems:
+        print(problem)
+
+    if problems:
+        print(f"asset_snapshot: {len(problems)} problems found")
+        exit(1)
+
+    print("asset_snapshot: snapshot matches")
+
+if __name__ == "__main__":
+    main()
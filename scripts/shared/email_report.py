@@ -26,15 +26,71 @@ sys.path.append(os.path.abspath("scripts/integrity_checker/"))
 import config
 import check_data
 import yaml_io
+import inventory_table
+from missing_values import is_missing
 
 ERROR_FILE_NAME = "integrity_errors.txt"
 CONFIG_PATH = "config.yaml"
 STATS_PATH = ".weekly_stats.yaml"
 
-MISSING_RXP = "(?i)none|missing|\\?+|^\\s*$"
+# tallies vendors and models, and counts assets that are at least (>=) ten years old
+# makes a single pass over assets, so it can be fed a stream (ex. yaml_io.iter_yaml())
+#
+# returns: a tuple of (dict of vendor -> list of models, number of assets >= ten years old)
+def tally_inventory(assets) -> tuple:
+    # NOTE: since vendor is not it's own tag this is only a heuristic
+    # each dict value is a list (not a set) of models
+    vendors = dict()
+    atleast_ten = 0
+    today = datetime.datetime.today()
+
+    for asset in assets:
+        # to make this work, the vendor should be the first word in
+        # hardware.model and the model should make up the rest 
+        # example: "Dell PowerEdge C6400" will be read as
+        # vendor: "Dell" - Model: "PowerEdge C6400"
+        splitlist = asset.get("hardware.model").split(" ", 1)
+        vendor = splitlist[0]
+        if not is_missing(vendor):
+
+            lower = ' '.join([s.lower() for s in splitlist])
+            key = vendor
+
+            # try to catch a couple different vendor name spellings
+            if "poweredge" in lower:
+                key = "Dell"
+            elif "super" in lower and "micro" in lower:
+                key = "SuperMicro"
+            elif "king" in lower and "star" in lower:
+                key = "KingStar"
+
+            if key not in vendors:
+                vendors[key] = []
+
+            if not len(splitlist) > 1:
+                vendors[key].append("")
+            else:
+                vendors[key].append(splitlist[1])
+
+        acq_date = asset.get("acquisition.date")
+
+        if acq_date and not is_missing(acq_date):
+            date = datetime.datetime.strptime(acq_date, "%Y-%m-%d")
+
+            # datetime has no 'years' attribute
+            # so 3650 days is 10 years
+            if abs((today - date).days) >= 3650:
+                atleast_ten += 1
+
+    return (vendors, atleast_ten)
 
 class Report:
-    def __init__(self, assets: list[yaml_io.Asset], stats_file: str):
+    # params:
+    #   assets - an inventory_table.InventoryTable (or a list of assets)
+    #   stats_file - the weekly stats file
+    def __init__(self, assets, stats_file: str):
+        # the checks and tallies below all share one table
+        table = inventory_table.as_table(assets)
         delta = dict()
 
         with open(stats_file, 'r') as infile:
@@ -42,13 +98,10 @@ class Report:
 
         self.added = delta["added_this_week"]
         self.decom = delta["decom_this_week"]
-        self.total = len(assets)
+        self.total = len(table)
 
-        # run all integrity checks to tally errors
-        errs = []
-        errs.extend(check_data.chk_all_missing(assets))
-        errs.extend(check_data.chk_conflicting(assets))
-        errs.extend(check_data.chk_uw_tag(assets))
+        # run all integrity checks (in one pass) to tally errors
+        errs = check_data.run_checks(table)
 
         self.integrity_errs = len(errs)
 
@@ -58,53 +111,8 @@ class Report:
                 errfile.write(str(err))
 
 
-        # tally vendors and model
-        # NOTE: since vendor is not it's own tag this is only a heuristic
-        # each dict value is a list (not a set) of models
-        self.vendors = dict()
-
-        # to make this work, the vendor should be the first word in
-        # hardware.model and the model should make up the rest 
-        # example: "Dell PowerEdge C6400" will be read as
-        # vendor: "Dell" - Model: "PowerEdge C6400"
-        for asset in assets:
-            splitlist = asset.get("hardware.model").split(" ", 1)
-            vendor = splitlist[0]
-            if not re.fullmatch(MISSING_RXP, vendor):
-
-                lower = ' '.join([s.lower() for s in splitlist])
-                key = vendor
-
-                # try to catch a couple different vendor name spellings
-                if "poweredge" in lower:
-                    key = "Dell"
-                elif "super" in lower and "micro" in lower:
-                    key = "SuperMicro"
-                elif "king" in lower and "star" in lower:
-                    key = "KingStar"
-
-                if key not in self.vendors:
-                    self.vendors[key] = []
-
-                if not len(splitlist) > 1:
-                    self.vendors[key].append("")
-                else:
-                    self.vendors[key].append(splitlist[1])
-
-        # count the number of assets that are at least (>=) ten
-        # years old
-        self.atleast_ten = 0
-        for asset in assets:
-            acq_date = asset.get("acquisition.date")
-
-            if acq_date and not re.fullmatch(MISSING_RXP, acq_date):
-                date = datetime.datetime.strptime(acq_date, "%Y-%m-%d")
-                today = datetime.datetime.today()
-
-                # datetime has no 'years' attribute
-                # so 3650 days is 10 years
-                if abs((today - date).days) >= 3650:
-                    self.atleast_ten += 1
+        # tally vendors, models, and asset ages
+        self.vendors, self.atleast_ten = tally_inventory(table.rows())
 
     def __str__(self):
         # these are here because f-strings don't apprciate escape chars
@@ -0,0 +1,224 @@
+# loads a YAML asset directory incrementally using git history
+#
+# the inventory lives in a git working tree, so git already knows which asset files
+# changed between two commits. a GitIndex remembers the parsed contents of every asset
+# file along with the commit it last indexed, and on later runs re-parses only the
+# files git reports as added, modified, deleted, or renamed since then
+# (plus any uncommitted or untracked changes in the working tree)
+#
+# GitPython is optional - without it (or outside of a git repo, or when the last
+# indexed commit is gone) the directory is read with yaml_io.read_yaml(), which still
+# skips unchanged files through the parsed asset cache and snapshot
+
+import os
+import sys
+import pickle
+
+import yaml_io
+
+try:
+    import git
+except ImportError:
+    git = None
+
+# bump this if the layout of the index file changes
+INDEX_FORMAT = 1
+
+# returns the default index location for a YAML directory
+# the index lives next to (not inside) the directory
+# ex. current_assets/ -> .current_assets.git_index
+def index_path_for(yaml_dir: str) -> str:
+    yaml_dir = os.path.normpath(yaml_dir)
+    parent, name = os.path.split(yaml_dir)
+    return os.path.join(parent, f".{name}.git_index")
+
+class GitIndex:
+    # params:
+    #   yaml_dir - the directory of asset files to index (ex. config.yaml_path)
+    #   path - the index file (defaults to next to yaml_dir)
+    def __init__(self, yaml_dir: str, path: str=None):
+        if not yaml_dir.endswith('/'):
+            yaml_dir += '/'
+
+        self.yaml_dir = yaml_dir
+        self.path = path if path is not None else index_path_for(yaml_dir)
+
+        # the commit the entries were last brought up to date with
+        self.commit = None
+
+        # filename -> (content hash, pickled dict)
+        self.entries = dict()
+
+        # files whose entries may not match the commit - they were read from an
+        # uncommitted working tree, or failed to parse - and are re-checked every run
+        self.dirty = set()
+
+        # the filenames re-parsed by the last call to load() (every file after a full load)
+        self.changed = []
+        self.full = False
+
+        self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as infile:
+                fmt, stamp, commit, dirty, entries = pickle.load(infile)
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            print(f"WARNING: ignoring unreadable git index '{self.path}': {err}", file=sys.stderr)
+            return
+
+        if fmt == INDEX_FORMAT and stamp == yaml_io.template_stamp():
+            self.commit = commit
+            self.dirty = dirty
+            self.entries = entries
+
+    # writes the index back out - to a temp file first so a crash never leaves a truncated index
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as outfile:
+                pickle.dump((INDEX_FORMAT, yaml_io.template_stamp(), self.commit, self.dirty, self.entries), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print(f"WARNING: could not write git index '{self.path}': {err}", file=sys.stderr)
+
+    # returns the git repo yaml_dir is in and its head commit - or (None, None)
+    def _repo(self) -> tuple:
+        if git is None:
+            return (None, None)
+
+        try:
+            repo = git.Repo(self.yaml_dir, search_parent_directories=True)
+            return (repo, repo.head.commit)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+            return (None, None)
+        except ValueError:
+            # a repo without any commits yet
+            return (None, None)
+
+    # returns the names of the asset files among paths (relative to the repo's top level)
+    # only files directly in yaml_dir are assets
+    def _asset_names(self, repo, paths) -> set:
+        rel_dir = os.path.relpath(os.path.realpath(self.yaml_dir), os.path.realpath(repo.working_tree_dir))
+        rel_dir = rel_dir.replace(os.sep, '/')
+
+        names = set()
+        for path in paths:
+            if path is not None and path.endswith('.yaml') and os.path.dirname(path) == rel_dir:
+                names.add(os.path.basename(path))
+
+        return names
+
+    # returns the asset files that were added, modified, deleted, or renamed between
+    # the last indexed commit and head - or None if git can't say
+    def _committed_changes(self, repo, head) -> set:
+        try:
+            last = repo.commit(self.commit)
+        except (ValueError, git.BadName):
+            # history was rewritten or the commit was never fetched
+            return None
+
+        # renames show up with the old name in a_path and the new one in b_path
+        diffs = last.diff(head, paths=os.path.abspath(self.yaml_dir))
+        return self._asset_names(repo, [d.a_path for d in diffs] + [d.b_path for d in diffs])
+
+    # returns the asset files that differ from head in the working tree (including untracked ones)
+    def _worktree_changes(self, repo, head) -> set:
+        diffs = head.diff(None, paths=os.path.abspath(self.yaml_dir))
+        return self._asset_names(repo, [d.a_path for d in diffs] + [d.b_path for d in diffs] + repo.untracked_files)
+
+    # returns the entries for assets read in full - along with the files that couldn't be parsed
+    def _entries_from(self, assets: list[yaml_io.Asset], present: set) -> tuple:
+        entries = dict()
+        for asset in assets:
+            entries[os.path.basename(asset.filepath)] = (asset.digest, pickle.dumps(asset.asset, protocol=pickle.HIGHEST_PROTOCOL))
+
+        return (entries, present - entries.keys())
+
+    # brings the index up to date with the files in yaml_dir
+    #
+    # params:
+    #   workers - passed on to the parser (see yaml_io.iter_yaml())
+    #   records - return asset_record.AssetRecords instead of Assets (see yaml_io.iter_yaml())
+    #
+    # returns: a list of Assets for every file in yaml_dir - ordered by filename
+    def load(self, workers: int=0, records: bool=False) -> list[yaml_io.Asset]:
+        files = [os.path.basename(path) for path in yaml_io._list_yaml(self.yaml_dir)]
+        present = set(files)
+
+        repo, head = self._repo()
+
+        self.full = True
+        self.changed = files
+
+        if head is None:
+            # no git to ask - the cache and snapshot are the best there is, and without
+            # a commit to tie the entries to there is nothing worth saving
+            return yaml_io.read_yaml(self.yaml_dir, workers, records=records)
+
+        worktree = self._worktree_changes(repo, head)
+        changed = None
+        if self.commit is not None:
+            changed = self._committed_changes(repo, head)
+
+        if changed is None:
+            # git can't say what changed - read everything (through the cache and snapshot)
+            # and index it so the next run can go by git
+            assets = yaml_io.read_yaml(self.yaml_dir, workers, records=records)
+            self.entries, failed = self._entries_from(assets, present)
+
+            self.commit = head.hexsha
+            self.dirty = (worktree & present) | failed
+            self.save()
+
+            return assets
+
+        todo = changed | worktree | self.dirty
+
+        # files git didn't mention but that aren't indexed (or the other way around)
+        # can only come from an index out of step with the directory - fix those up too
+        todo |= present - self.entries.keys()
+        todo |= self.entries.keys() - present
+
+        for name in todo - present:
+            self.entries.pop(name, None)
+
+        parse = sorted(todo & present)
+        paths = [self.yaml_dir + name for name in parse]
+        failed = set()
+
+        for name, (data, err, digest) in zip(parse, yaml_io._parse_stream(paths, workers)):
+            if err:
+                print(f"WARNING: skipping asset file '{self.yaml_dir}{name}': {err}", file=sys.stderr)
+                self.entries.pop(name, None)
+                failed.add(name)
+                continue
+
+            self.entries[name] = (digest, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+        self.full = False
+        self.commit = head.hexsha
+        self.dirty = (worktree & present) | failed
+        self.changed = parse
+        self.save()
+
+        make = yaml_io._record if records else yaml_io._asset
+
+        assets = []
+        for name in files:
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+
+            digest, blob = entry
+            assets.append(make(self.yaml_dir + name, pickle.loads(blob), digest))
+
+        return assets
+
+# reads all asset files in yaml_dir - re-parsing only what git says changed since the last run
+#
+# returns: a list of Asset objects - ordered by filename, the same as yaml_io.read_yaml()
+def read_yaml(yaml_dir: str, workers: int=0, records: bool=False) -> list[yaml_io.Asset]:
+    return GitIndex(yaml_dir).load(workers, records)
@@ -0,0 +1,195 @@
+# a columnar, in-memory view of a whole inventory
+#
+# assets are loaded and flattened once, into one list (column) per yaml style tag,
+# plus an fqdn column and a fqdn -> row index. validators, reports, and the sheet sync
+# can then all share one table instead of each re-walking and re-flattening every asset
+#
+# rows are plain ints. table.rows() hands out TableRow objects that have the same
+# get() / get_many() / get_full_location() / fqdn interface as yaml_io.Asset
+
+import yaml_io
+import dict_utils
+from asset_record import ABSENT
+from missing_values import missing_mask
+
+# the tags in ASSET_TEMPLATE - in template order
+TEMPLATE_TAGS = list(dict_utils.flatten_dict(yaml_io.ASSET_TEMPLATE).keys())
+
+# the tags that make up an asset's full location - in get_full_location() order
+LOCATION_TAGS = ["location.elevation", "location.rack", "location.room", "location.building"]
+
+# a single row of a table - quacks like a yaml_io.Asset for reading
+class TableRow:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def fqdn(self) -> str:
+        return self.table.fqdn[self.row]
+
+    @property
+    def filepath(self) -> str:
+        return self.table.filepath[self.row]
+
+    # the nested dict of the underlying asset
+    @property
+    def asset(self) -> dict:
+        return self.table.assets[self.row].asset
+
+    def get(self, key: str):
+        return self.table.value(self.row, key)
+
+    def get_many(self, keys: list[str]) -> list:
+        return [self.table.value(self.row, key) for key in keys]
+
+    def get_full_location(self) -> str:
+        return self.table.full_location(self.row)
+
+class InventoryTable:
+    # params:
+    #   assets - a list of yaml_io.Asset (or asset_record.AssetRecord) objects
+    def __init__(self, assets: list):
+        self.assets = list(assets)
+        self.fqdn = [asset.fqdn for asset in self.assets]
+        self.filepath = [getattr(asset, "filepath", "") for asset in self.assets]
+        self.index = {fqdn : row for row, fqdn in enumerate(self.fqdn)}
+
+        # every template tag gets a column - then any extra tags found in the files
+        self.columns = {tag : [] for tag in TEMPLATE_TAGS}
+
+        for row, asset in enumerate(self.assets):
+            flat = dict_utils.flatten_dict(asset.asset)
+
+            for tag, column in self.columns.items():
+                column.append(flat.get(tag, ABSENT))
+
+            for tag, value in flat.items():
+                if tag not in self.columns:
+                    self.columns[tag] = [ABSENT] * row + [value]
+
+    # builds a table from every asset file in yaml_dir
+    # takes the same keyword arguments as yaml_io.iter_yaml()
+    @classmethod
+    def from_yaml(cls, yaml_dir: str, **kwargs):
+        return cls(yaml_io.iter_yaml(yaml_dir, **kwargs))
+
+    def __len__(self) -> int:
+        return len(self.fqdn)
+
+    # returns the whole column for a yaml style tag (ex. location.rack)
+    # raises KeyError if no asset has the tag
+    def column(self, tag: str) -> list:
+        return self.columns[tag]
+
+    # returns a single value - raises KeyError if the asset doesn't have the tag
+    def value(self, row: int, tag: str):
+        value = self.columns[tag][row]
+        if value is ABSENT:
+            raise KeyError(tag)
+
+        return value
+
+    # stores a single value - the underlying asset is left alone
+    def set(self, row: int, tag: str, value):
+        if tag not in self.columns:
+            self.columns[tag] = [ABSENT] * len(self)
+
+        self.columns[tag][row] = value
+
+    # returns the flattened asset for a row (tag -> value)
+    def row(self, row: int) -> dict:
+        return {tag : column[row] for tag, column in self.columns.items() if column[row] is not ABSENT}
+
+    # returns the row as a TableRow
+    def row_view(self, row: int) -> TableRow:
+        return TableRow(self, row)
+
+    # returns a TableRow for every row - in order
+    def rows(self) -> list[TableRow]:
+        return [TableRow(self, row) for row in range(len(self))]
+
+    # returns "elev.rack.room.building" for a row - same as Asset.get_full_location()
+    def full_location(self, row: int) -> str:
+        return '.'.join(self.value(row, tag) for tag in LOCATION_TAGS)
+
+    # returns the full location of every row
+    def full_location_column(self) -> list[str]:
+        columns = [self.columns[tag] for tag in LOCATION_TAGS]
+        return ['.'.join(values) for values in zip(*columns)]
+
+    # applies pred to every value in a column
+    #
+    # returns: a list of bools (a mask) - one per row
+    def mask(self, tag: str, pred) -> list[bool]:
+        return [value is not ABSENT and bool(pred(value)) for value in self.columns[tag]]
+
+    # returns a mask of the rows whose value for tag is "missing"
+    # (ex. "", "none", "???") - rows without the tag at all count as missing
+    def missing_mask(self, tag: str) -> list[bool]:
+        column = self.columns[tag]
+        return [value is ABSENT or missing for value, missing in zip(column, missing_mask(column))]
+
+    # returns the row numbers where mask is True
+    def where(self, mask: list[bool]) -> list[int]:
+        return [row for row, keep in enumerate(mask) if keep]
+
+    # returns a new table holding only the rows where mask is True
+    # the new table shares the underlying asset objects
+    def filter(self, mask: list[bool]):
+        rows = self.where(mask)
+
+        table = InventoryTable.__new__(InventoryTable)
+        table.assets = [self.assets[row] for row in rows]
+        table.fqdn = [self.fqdn[row] for row in rows]
+        table.filepath = [self.filepath[row] for row in rows]
+        table.index = {fqdn : row for row, fqdn in enumerate(table.fqdn)}
+        table.columns = {tag : [column[row] for row in rows] for tag, column in self.columns.items()}
+
+        return table
+
+    # groups rows by their value for tag
+    #
+    # params:
+    #   tag - the yaml style tag to group on
+    #   rows - only group these rows (defaults to all of them)
+    #   full_location - group on the full location instead of the value of tag
+    #
+    # returns: a dict of value -> list of rows (in row order), in first-seen order
+    def group(self, tag: str, rows: list[int]=None, full_location: bool=False) -> dict:
+        if full_location:
+            keys = self.full_location_column()
+        else:
+            keys = self.columns[tag]
+
+        if rows is None:
+            rows = range(len(self))
+
+        groups = dict()
+        for row in rows:
+            key = keys[row]
+            if key is ABSENT:
+                continue
+
+            if key not in groups:
+                groups[key] = []
+            groups[key].append(row)
+
+        return groups
+
+# returns assets as an InventoryTable - building one only if it isn't one already
+def as_table(assets) -> InventoryTable:
+    if isinstance(assets, InventoryTable):
+        return assets
+
+    return InventoryTable(assets)
+
+# returns something that can be iterated for asset-like objects
+# a table is iterated by its TableRows - anything else is returned as is
+def iter_assets(assets):
+    if isinstance(assets, InventoryTable):
+        return assets.rows()
+
+    return assets
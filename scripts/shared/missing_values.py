@@ -0,0 +1,56 @@
+# decides whether an asset field counts as "missing" (ex. "", "none", "???", "MISSING")
+# every script that needs to know should ask here instead of keeping its own regex
+#
+# inventory values repeat a lot (the same rooms, models, and ways of writing "none"),
+# so answers for short values are memoized - and long values are decided without the
+# regex - so most lookups never reach the regex engine
+
+import re
+import functools
+
+# regex to match possible ways of saying "missing"
+MISSING_RXP = "(?i)none|missing|\\?+|^\\s*$"
+MISSING_PATTERN = re.compile(MISSING_RXP)
+
+# the number of distinct values is_missing() remembers
+MEMO_SIZE = 4096
+
+# the longest word MISSING_RXP matches ("missing") - anything longer can
+# only be missing if it is all question marks or all whitespace
+LONGEST_WORD = 7
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def _classify_short(value: str) -> bool:
+    return MISSING_PATTERN.fullmatch(value) is not None
+
+# returns True if value is one of the ways of saying "missing"
+# non-string values (ex. bools, numbers, None) are checked by their str() form
+def is_missing(value) -> bool:
+    if type(value) is not str:
+        value = str(value)
+
+    # long values (serials, notes, etc.) are nearly all unique - so they're not
+    # worth remembering, and never need the regex
+    if len(value) > LONGEST_WORD:
+        return value.isspace() or not value.strip('?')
+
+    return _classify_short(value)
+
+# classifies a whole column of values at once
+# each distinct value is only classified once per call
+#
+# returns: a list of bools (a mask) - True where the value is missing
+def missing_mask(values) -> list[bool]:
+    seen = dict()
+    mask = []
+
+    for value in values:
+        key = value if type(value) is str else str(value)
+
+        result = seen.get(key)
+        if result is None:
+            result = seen[key] = is_missing(key)
+
+        mask.append(result)
+
+    return mask
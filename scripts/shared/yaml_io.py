@@ -1,7 +1,13 @@
 import sys
 import os
+import copy
+import hashlib
+import difflib
+import collections
 import yaml
-import dict_utils
+import asset_cache
+import asset_snapshot
+from concurrent.futures import ProcessPoolExecutor
 
 # a wrapper class for quoted yaml string values
 # used instead of str so keys are not also quoted
@@ -11,9 +17,78 @@ class quoted(str):
 # the default Python yaml module doesn't preserve double quotes :(
 # can change that behavior with a representer
 # see "Constructors, representers, resolvers" in https://pyyaml.org/wiki/PyYAMLDocumentation
+#
+# note: the libyaml (C) emitter only accepts exact str values - not subclasses
 def quote_representer(dumper, data):
-    return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='"')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', str(data), style='"')
+
+# use PyYAML's libyaml (C) bindings when it was built with them
+# and fall back to the pure Python loader and dumper otherwise
+try:
+    from yaml import CSafeLoader as AssetLoader
+    from yaml import CSafeDumper as _CSafeDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader as AssetLoader
+    LIBYAML = False
+
+# dumpers with the double quote representer registered once
+class AssetDumper(yaml.SafeDumper):
+    pass
+
+AssetDumper.add_representer(quoted, quote_representer)
+
+if LIBYAML:
+    class CAssetDumper(_CSafeDumper):
+        pass
+
+    CAssetDumper.add_representer(quoted, quote_representer)
+
+# the line width at which both emitters start folding long scalars
+# libyaml picks different fold points than the Python emitter does, so assets
+# with a line that could get this long are always dumped by AssetDumper
+FOLD_WIDTH = 80
+
+# returns True if no line of nested (dumped at depth) could be folded by the emitter
+def _fits_unfolded(nested: dict, depth: int=0) -> bool:
+    for key, value in nested.items():
+        if isinstance(value, dict):
+            if not _fits_unfolded(value, depth + 1):
+                return False
+            continue
+
+        if isinstance(value, (list, tuple)):
+            return False
+
+        if isinstance(value, str):
+            # worst case escaped length - '\\' and '\"' for printable ASCII
+            # and up to '\Uxxxxxxxx' for anything else
+            if value.isascii() and value.isprintable():
+                length = 2 * len(value)
+            else:
+                length = 10 * len(value)
 
+            # indent + key + ': ' + value + quotes
+            if 2 * depth + len(str(key)) + 2 + length + 2 > FOLD_WIDTH:
+                return False
+
+    return True
+
+# dumps an asset's nested dict to a YAML string - the format every asset file is written in
+def dump_asset(nested: dict) -> str:
+    dumper = AssetDumper
+    if LIBYAML and _fits_unfolded(nested):
+        dumper = CAssetDumper
+
+    return yaml.dump(nested, Dumper=dumper, sort_keys=False)
+
+
+# read_yaml() only uses a process pool for directories with at least this many files
+# for smaller trees, starting the pool costs more than it saves
+PARALLEL_MIN_FILES = 256
+
+# how many files each worker process parses per task
+PARALLEL_CHUNK_SIZE = 64
 
 ASSET_TEMPLATE = {
     'acquisition' : {
@@ -52,21 +127,96 @@ ASSET_TEMPLATE = {
     },
 }
 
+# cache of compiled tag paths - maps a 'flat' yaml style tag (ex. location.rack)
+# to the tuple of nested keys it names (ex. ('location', 'rack'))
+# tags are resolved once here instead of on every get() and put()
+_PATH_CACHE = dict()
+
+# resolves a yaml style tag into a tuple of nested dict keys
+#
+# params:
+#   key - the yaml style tag (ex. hardware.condo_chassis.model)
+#
+# returns: the (cached) tuple of keys
+def compile_path(key: str) -> tuple:
+    path = _PATH_CACHE.get(key)
+    if path is None:
+        path = tuple(key.split('.'))
+        _PATH_CACHE[key] = path
+
+    return path
+
+# walks a nested dict down to the value at path
+# raises KeyError if path does not name a 'leaf' value - the same
+# way looking the tag up in a flattened dict would
+def _walk(nested: dict, path: tuple, key: str):
+    node = nested
+    for tag in path:
+        if not isinstance(node, dict) or tag not in node:
+            raise KeyError(key)
+        node = node[tag]
+
+    # a tag naming a whole sub-dict (ex. 'location') isn't a field
+    if isinstance(node, dict):
+        raise KeyError(key)
+
+    return node
+
+# walks (and creates if needed) the nested dicts along path
+# and stores value in the 'leaf' tag
+def _store(nested: dict, path: tuple, key: str, value):
+    node = nested
+    for tag in path[:-1]:
+        if tag not in node:
+            node[tag] = dict()
+
+        node = node[tag]
+        if not isinstance(node, dict):
+            raise KeyError(key)
+
+    if isinstance(node.get(path[-1]), dict):
+        raise KeyError(key)
+
+    node[path[-1]] = value
+
+# marks every (plain) string in a nested dict as quoted - in place
+# this is what a round trip through dict_utils.unflatten_dict() used to do
+def _quote_strings(nested: dict):
+    for key, value in nested.items():
+        if isinstance(value, dict):
+            _quote_strings(value)
+        elif type(value) is str:
+            nested[key] = quoted(value)
+
 # possible kwargs:
 #   file="filename"
 #   fqdn="fqdn"
+#   data=dict - the already parsed contents of file (file is not re-read)
+#   digest="sha1" - the content hash of file when data is given (if known)
+#
+# asset.digest is the content hash of the file as it was read (None for new assets)
+# writers use it to skip rewriting files that would come out byte-identical
 class Asset:
-    def __init__(self, file="", fqdn=""):
+    def __init__(self, file="", fqdn="", data=None, digest=None):
+        self.digest = digest
+
         if file:
-            with open(file, 'r') as infile:
-                # as far as I can tell safe_load doesn't have any relevant
-                # disadvantages over load() here - maybe it's overkill but might as well
-                self.asset = yaml.safe_load(infile)
-                self.filepath = file
-                self.fqdn = os.path.basename(file).removesuffix('.yaml')
+            if data is None:
+                with open(file, 'rb') as infile:
+                    raw = infile.read()
+
+                # as far as I can tell the safe loader doesn't have any relevant
+                # disadvantages over the full loader here - maybe it's overkill but might as well
+                data = yaml.load(raw, Loader=AssetLoader)
+                self.digest = asset_cache.hash_bytes(raw)
+
+            self.asset = data
+            self.filepath = file
+            self.fqdn = os.path.basename(file).removesuffix('.yaml')
         elif fqdn:
             # generate a blank template
-            self.asset = ASSET_TEMPLATE.copy()
+            # deep copy - put() modifies the nested dicts in place
+            self.asset = copy.deepcopy(ASSET_TEMPLATE)
             self.fqdn = fqdn
             self.filename = f"{self.fqdn}.yaml"
 
@@ -78,47 +228,543 @@ class Asset:
 
     # returns a data field from it's yaml style path (ex. location.rack)
     # this function eliminates some need for flattening and un-flattening
+    # raises KeyError if the tag does not exist
     def get(self, key: str):
-        flat = dict_utils.flatten_dict(self.asset)
-        ret = flat[key]
-        self.asset = dict_utils.unflatten_dict(flat)
-        return ret
+        return _walk(self.asset, compile_path(key), key)
+
+    # returns a list of data fields - one for each tag in keys (in order)
+    def get_many(self, keys: list[str]) -> list:
+        return [_walk(self.asset, compile_path(key), key) for key in keys]
 
     # stores value in the internal asset dict
     # takes a 'flat dict' yaml style tag (ex. location.rack)
     def put(self, key: str, value: str):
-        flat = dict_utils.flatten_dict(self.asset)
-        flat[key] = value
-        self.asset = dict_utils.unflatten_dict(flat)
+        self.put_many({key : value})
 
-# reads YAML data from all .yaml files in yaml_dir
+    # stores many values at once
+    # takes a dict mapping yaml style tags to their new values
+    def put_many(self, values: dict):
+        for key, value in values.items():
+            _store(self.asset, compile_path(key), key, value)
+
+        # strings written back out to YAML should be double quoted
+        _quote_strings(self.asset)
+
+# returns the nested keys (and leaf value types) of a template dict
+def _shape(nested: dict) -> list:
+    return [(key, _shape(value) if isinstance(value, dict) else type(value).__name__) for key, value in nested.items()]
+
+# a version stamp for the shape of ASSET_TEMPLATE
+# cached parse results are thrown away whenever the template changes
+def template_stamp() -> str:
+    return hashlib.sha1(repr(_shape(ASSET_TEMPLATE)).encode()).hexdigest()
+
+# parses a single asset file
+#
+# returns: a tuple of (parsed dict, error message, content hash)
+#          the dict and hash are None if the file could not be read
+def _parse_file(path: str) -> tuple:
+    try:
+        with open(path, 'rb') as infile:
+            raw = infile.read()
+
+        data = yaml.load(raw, Loader=AssetLoader)
+    except (OSError, yaml.YAMLError) as err:
+        return (None, f"{type(err).__name__}: {err}", None)
+
+    if not isinstance(data, dict):
+        return (None, "file does not contain a YAML mapping", None)
+
+    return (data, "", asset_cache.hash_bytes(raw))
+
+# parses a chunk of asset files - this is the unit of work
+# handed to each worker process by iter_yaml()
+def _parse_chunk(paths: list[str]) -> list[tuple]:
+    return [_parse_file(path) for path in paths]
+
+# parses every file in paths - across a process pool if workers > 1
+# only a bounded number of chunks are in flight at once so results can be
+# streamed to the caller instead of piling up in memory
+#
+# yields: a _parse_file() result for each path, in the same order as paths
+def _parse_stream(paths: list[str], workers: int):
+    if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+        chunks = [paths[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(paths), PARALLEL_CHUNK_SIZE)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = collections.deque()
+
+            # results are collected in the order chunks were submitted
+            for chunk in chunks:
+                pending.append(pool.submit(_parse_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+    else:
+        for path in paths:
+            yield _parse_file(path)
+
+# returns the paths of all .yaml files in yaml_dir - ordered by filename
+def _list_yaml(yaml_dir: str) -> list[str]:
+    return [yaml_dir + file for file in sorted(os.listdir(yaml_dir)) if file.endswith('.yaml')]
+
+# an Asset that doesn't open or parse its file until the first time
+# its data is used - fqdn and filepath are available right away
+class LazyAsset(Asset):
+    def __init__(self, file: str):
+        self.filepath = file
+        self.fqdn = os.path.basename(file).removesuffix('.yaml')
+        self.digest = None
+        self._asset = None
+
+    @property
+    def asset(self) -> dict:
+        if self._asset is None:
+            with open(self.filepath, 'rb') as infile:
+                raw = infile.read()
+
+            self._asset = yaml.load(raw, Loader=AssetLoader)
+            self.digest = asset_cache.hash_bytes(raw)
+
+        return self._asset
+
+    @asset.setter
+    def asset(self, value: dict):
+        self._asset = value
+
+    # True once the file has been read
+    def loaded(self) -> bool:
+        return self._asset is not None
+
+# looks up a single asset by its fqdn without reading the rest of yaml_dir
+# the file itself is only parsed once one of its fields is used
+#
+# returns: a LazyAsset - or raises FileNotFoundError if there is no such asset
+def find_asset(yaml_dir: str, fqdn: str) -> LazyAsset:
+    if not yaml_dir.endswith('/'):
+        yaml_dir += '/'
+
+    path = f"{yaml_dir}{fqdn}.yaml"
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"no asset file for {fqdn} in {yaml_dir}")
+
+    return LazyAsset(path)
+
+# returns filename -> (mtime in ns, size) for each of the files in paths
+def _file_stats(paths: list[str]) -> dict:
+    stats = dict()
+    for path in paths:
+        stat = os.stat(path)
+        stats[os.path.basename(path)] = (stat.st_mtime_ns, stat.st_size)
+
+    return stats
+
+# opens the snapshot for yaml_dir - but only if it was made from exactly the files in
+# the directory and none of them has changed mtime or size since (like the asset cache)
+#
+# params:
+#   paths - every asset file currently in yaml_dir (ex. from _list_yaml())
+#
+# returns: an asset_snapshot.Snapshot - or None if there is no usable snapshot
+def _fresh_snapshot(yaml_dir: str, paths: list[str]):
+    path = asset_snapshot.snapshot_path_for(yaml_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        snapshot = asset_snapshot.Snapshot(path)
+    except (OSError, ValueError, KeyError) as err:
+        print(f"WARNING: ignoring unreadable asset snapshot '{path}': {err}", file=sys.stderr)
+        return None
+
+    try:
+        names = [os.path.basename(file).removesuffix('.yaml') for file in paths]
+        fresh = (
+            snapshot.stamp == template_stamp()
+            and len(names) == len(snapshot) + len(snapshot.skipped)
+            and all(name in snapshot or f"{name}.yaml" in snapshot.skipped for name in names)
+            and _file_stats(paths) == snapshot.files
+        )
+    except OSError:
+        fresh = False
+
+    if not fresh:
+        snapshot.close()
+        return None
+
+    return snapshot
+
+# packs every asset in yaml_dir into a single snapshot file (see asset_snapshot.py)
+# once written, read_yaml() loads from the snapshot for as long as no file in yaml_dir changes
+#
+# params:
+#   yaml_dir - the directory to pack
+#   path - where to write the snapshot (defaults to next to yaml_dir)
+#   workers - passed on to iter_yaml()
+#
+# returns: the number of assets in the snapshot
+def export_snapshot(yaml_dir: str, path: str=None, workers: int=0) -> int:
+    if not yaml_dir.endswith('/'):
+        yaml_dir += '/'
+
+    if path is None:
+        path = asset_snapshot.snapshot_path_for(yaml_dir)
+
+    # stat before reading - a file changed while the export runs makes the snapshot stale
+    paths = _list_yaml(yaml_dir)
+    files = _file_stats(paths)
+
+    with asset_snapshot.SnapshotWriter(path, template_stamp(), files) as writer:
+        read = set()
+        for asset in iter_yaml(yaml_dir, workers, use_snapshot=False):
+            writer.add(asset.fqdn, asset.digest, asset.asset)
+            read.add(asset.filepath)
+
+        for file in paths:
+            if file not in read:
+                writer.skip(os.path.basename(file))
+
+    return len(read)
+
+# checks a snapshot against the YAML files it was made from
+# every file is re-hashed and compared to the hash stored with its record
+#
+# returns: a list of problems found (empty if the snapshot matches yaml_dir exactly)
+def verify_snapshot(yaml_dir: str, path: str=None) -> list[str]:
+    if not yaml_dir.endswith('/'):
+        yaml_dir += '/'
+
+    if path is None:
+        path = asset_snapshot.snapshot_path_for(yaml_dir)
+
+    problems = []
+    with asset_snapshot.Snapshot(path) as snapshot:
+        if snapshot.stamp != template_stamp():
+            problems.append("snapshot was made with a different asset template")
+
+        on_disk = {os.path.basename(file).removesuffix('.yaml') : file for file in _list_yaml(yaml_dir)}
+        seen = set()
+
+        for fqdn, digest, data in snapshot:
+            seen.add(fqdn)
+
+            file = on_disk.get(fqdn)
+            if file is None:
+                problems.append(f"{fqdn}: in the snapshot but not in {yaml_dir}")
+                continue
+
+            with open(file, 'rb') as infile:
+                if asset_cache.hash_bytes(infile.read()) != digest:
+                    problems.append(f"{fqdn}: file has changed since the snapshot was made")
+
+            if snapshot.get(fqdn)[0] != digest:
+                problems.append(f"{fqdn}: index does not point at its record")
+
+        for fqdn in on_disk:
+            if fqdn not in seen and f"{fqdn}.yaml" not in snapshot.skipped:
+                problems.append(f"{fqdn}: in {yaml_dir} but not in the snapshot")
+
+    return problems
+
+# reads a single asset from the snapshot for yaml_dir by seeking straight to its record
+# the asset's own file is checked to be unchanged (mtime and size) since the snapshot was made
+#
+# returns: an Asset - or raises KeyError if the snapshot doesn't hold a current copy of fqdn
+#          (and FileNotFoundError if there is no snapshot)
+def snapshot_asset(yaml_dir: str, fqdn: str, path: str=None) -> Asset:
+    if not yaml_dir.endswith('/'):
+        yaml_dir += '/'
+
+    if path is None:
+        path = asset_snapshot.snapshot_path_for(yaml_dir)
+
+    file = f"{yaml_dir}{fqdn}.yaml"
+    with asset_snapshot.Snapshot(path) as snapshot:
+        try:
+            current = snapshot.current(os.path.basename(file), os.stat(file))
+        except OSError:
+            current = False
+
+        if not current or snapshot.stamp != template_stamp():
+            raise KeyError(fqdn)
+
+        digest, data = snapshot.get(fqdn)
+
+    return Asset(file, data=data, digest=digest)
+
+# returns an Asset for a file that has been read
+def _asset(path: str, data: dict, digest: str) -> Asset:
+    return Asset(path, data=data, digest=digest)
+
+# returns an asset_record.AssetRecord for a file that has been read
+def _record(path: str, data: dict, digest: str):
+    # asset_record imports this module - so it can only be imported once this one is loaded
+    import asset_record
+    return asset_record.AssetRecord.from_dict(os.path.basename(path).removesuffix('.yaml'), data, path, digest)
+
+# yields assets read from all .yaml files in yaml_dir one at a time
+# so the whole inventory never has to be held in memory at once
+# files that cannot be read or parsed are reported and skipped
+#
+# unless use_cache is False, parsed files are remembered in a cache file next to
+# yaml_dir (see asset_cache.py) and only new or changed files are parsed again
+# the cache is only written back once the generator is run to the end
 #
 # params:
 #   yaml_dir - the directory to read YAML from
+#   workers - if > 1, parse files across this many processes
+#             (fewer than PARALLEL_MIN_FILES files are always parsed serially)
+#   use_cache - set to False to bypass the parsed asset cache
+#   lazy - if True, yield LazyAssets that parse their file on first use
+#          (workers, use_cache, use_snapshot, and records are ignored)
+#   use_snapshot - if a snapshot of yaml_dir exists (see export_snapshot()) and no file in
+#                  it has changed since, read everything from the snapshot instead
+#   records - if True, yield asset_record.AssetRecords instead of Assets - they take much
+#             less memory for tools that only read the inventory (ex. the sheet sync)
 #
-# returns: a list of Asset objects corresponding to each file
-def read_yaml(yaml_dir: str) -> list[Asset]:
+# yields: an Asset for each file - ordered by filename
+def iter_yaml(yaml_dir: str, workers: int=0, use_cache: bool=True, lazy: bool=False, use_snapshot: bool=True, records: bool=False):
     # allow dirs to be typed without the '/'
     if not yaml_dir.endswith('/'):
         yaml_dir += '/'
 
-    ret = []
+    paths = _list_yaml(yaml_dir)
+
+    if lazy:
+        for path in paths:
+            yield LazyAsset(path)
+        return
+
+    make = _record if records else _asset
+
+    snapshot = _fresh_snapshot(yaml_dir, paths) if use_snapshot else None
+    if snapshot is not None:
+        with snapshot:
+            for file in snapshot.skipped:
+                print(f"WARNING: skipping asset file '{yaml_dir}{file}': could not be parsed when the snapshot was made", file=sys.stderr)
+
+            for fqdn, digest, data in snapshot:
+                yield make(f"{yaml_dir}{fqdn}.yaml", data, digest)
+        return
+
+    cache = None
+    if use_cache:
+        cache = asset_cache.AssetCache(asset_cache.cache_path_for(yaml_dir), template_stamp())
+
+    # pair each file with its cache entry - or the stat it's parsed under if it's stale
+    plan = []
+    for path in paths:
+        if cache is None:
+            plan.append((path, None, None))
+            continue
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # let _parse_file() report it
+            plan.append((path, None, None))
+            continue
+
+        plan.append((path, cache.lookup(path, stat), stat))
+
+    parsed = _parse_stream([path for path, entry, stat in plan if entry is None], workers)
+
+    for path, entry, stat in plan:
+        if entry is not None:
+            yield make(path, entry.load(), entry.digest)
+            continue
+
+        data, err, digest = next(parsed)
+        if err:
+            print(f"WARNING: skipping asset file '{path}': {err}", file=sys.stderr)
+            continue
+
+        # the cache pickles its own copy - so it's safe to hand out data
+        if cache is not None and stat is not None:
+            cache.store(path, stat, digest, data)
 
-    for file in os.listdir(yaml_dir):
-        if file.endswith('.yaml'):
-            ret.append(Asset(yaml_dir + file))
+        yield make(path, data, digest)
 
-    return ret
+    if cache is not None:
+        cache.evict(paths)
+        cache.save()
+
+# reads YAML data from all .yaml files in yaml_dir
+# see iter_yaml() for the params
+#
+# returns: a list of Asset objects corresponding to each file - ordered by filename
+def read_yaml(yaml_dir: str, workers: int=0, use_cache: bool=True, lazy: bool=False, use_snapshot: bool=True, records: bool=False) -> list[Asset]:
+    return list(iter_yaml(yaml_dir, workers, use_cache, lazy, use_snapshot, records))
+
+# returns True if filepath already holds exactly raw
+#
+# digest is the content hash of what filepath held when it was read (if known). when raw
+# doesn't match it the asset has changed and the file isn't read. a match isn't trusted
+# on its own - the digest may come from a cache, snapshot, or state made before the file
+# was edited some other way - so the file is still compared byte for byte
+def _file_holds(filepath: str, raw: bytes, digest: str=None) -> bool:
+    try:
+        if digest is not None and asset_cache.hash_bytes(raw) != digest:
+            return False
+
+        if os.path.getsize(filepath) == len(raw):
+            with open(filepath, 'rb') as infile:
+                return infile.read() == raw
+    except OSError:
+        # the file doesn't exist yet (or can't be read)
+        pass
+
+    return False
+
+# writes raw to filepath - unless the file already holds exactly those bytes
+# the data goes to a temp file in the same directory first and is then moved into
+# place, so a crash mid-write never leaves a truncated asset file behind
+#
+# params:
+#   filepath - the file to write
+#   raw - the encoded file contents
+#   digest - the content hash of what filepath held when it was read (if any)
+#            saves reading the file back when the asset has changed since
+#
+# returns: True if the file was written, False if it was left alone
+def _write_file(filepath: str, raw: bytes, digest: str=None) -> bool:
+    if _file_holds(filepath, raw, digest):
+        return False
+
+    tmp_path = os.path.join(os.path.dirname(filepath), f".{os.path.basename(filepath)}.tmp")
+    try:
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(raw)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return True
+
+# returns the bytes an asset is written as - along with the content hash
+# of what filepath is known to hold (if any)
+def _render(asset: Asset, filepath: str) -> tuple:
+    # files always have unix (LF) line endings - the dumper never emits '\r'
+    raw = dump_asset(asset.asset).encode('utf-8')
+
+    # the known hash only describes filepath if that's where the asset was read from
+    digest = getattr(asset, "digest", None)
+    if getattr(asset, "filepath", None) != filepath:
+        digest = None
+
+    return (raw, digest)
+
+# writes a single asset out - returns True if its file was written
+def _write_asset(asset: Asset, filepath: str) -> bool:
+    raw, digest = _render(asset, filepath)
+    written = _write_file(filepath, raw, digest)
+
+    # the file now holds exactly raw - so an unchanged asset won't be written again
+    if isinstance(asset, Asset):
+        asset.filepath = filepath
+        asset.digest = asset_cache.hash_bytes(raw)
+
+    return written
+
+# collects asset writes during a batch operation and writes them all at the end
+# only files whose contents actually change are touched, each one atomically
+#
+# usage:
+#   with yaml_io.AssetWriter() as writer:
+#       for asset in assets:
+#           asset.put(...)
+#           writer.add(asset, asset.filepath)
+#
+#   the batch is flushed when the with block exits (unless it raised)
+#   writer.written and writer.unchanged then hold the paths of each kind
+#
+# a dry_run writer never touches the disk - writer.written lists the files that
+# would have been written, and writer.diffs holds a unified diff for each of them
+class AssetWriter:
+    def __init__(self, dry_run: bool=False):
+        self.dry_run = dry_run
+
+        # filepath -> asset - adding the same path again replaces the earlier asset
+        self.pending = dict()
+        self.written = []
+        self.unchanged = []
+        self.diffs = dict()
+
+    # queues asset to be written to filepath (defaults to asset.filepath)
+    # the asset is dumped when the batch is flushed, so later changes to it are included
+    def add(self, asset: Asset, filepath: str=None):
+        if filepath is None:
+            filepath = asset.filepath
+
+        # re-adding moves the path to the end - writes happen in the order assets were last added
+        self.pending.pop(filepath, None)
+        self.pending[filepath] = asset
+
+    # returns the asset queued for filepath - or None if nothing is waiting to be written there
+    def get(self, filepath: str):
+        return self.pending.get(filepath)
+
+    # writes every queued asset whose file would change
+    #
+    # returns: the paths that were written
+    def flush(self) -> list[str]:
+        written = []
+
+        while self.pending:
+            filepath, asset = next(iter(self.pending.items()))
+            del self.pending[filepath]
+
+            if self.dry_run:
+                changed = self._diff(asset, filepath)
+            else:
+                changed = _write_asset(asset, filepath)
+
+            if changed:
+                written.append(filepath)
+            else:
+                self.unchanged.append(filepath)
+
+        self.written.extend(written)
+        return written
+
+    # works out what writing asset to filepath would change - without writing it
+    #
+    # returns: True if the file would change
+    def _diff(self, asset: Asset, filepath: str) -> bool:
+        raw, digest = _render(asset, filepath)
+        if _file_holds(filepath, raw, digest):
+            return False
+
+        try:
+            with open(filepath, 'r') as infile:
+                old = infile.read()
+        except OSError:
+            old = ""
+
+        new = raw.decode('utf-8')
+        diff = difflib.unified_diff(old.splitlines(keepends=True), new.splitlines(keepends=True), filepath, filepath)
+        self.diffs[filepath] = "".join(diff)
+
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
 
 # writes Asset objects to YAML files
+# the file is replaced atomically - and not touched at all if its contents wouldn't change
 #
 # params:
 #   asset - the Asset object to write
 #   filepath - where to output the yaml file
-def write_yaml(asset: Asset, filepath: str):
-    # register the yaml representer for double quoted strings
-    yaml.add_representer(quoted, quote_representer)
-
-    # newline='\n' writes files with unix (LF) line endings
-    with open(filepath, 'w', newline='\n') as outfile:
-        yaml.dump(asset.asset, outfile, sort_keys=False)
+#
+# returns: True if the file was written
+def write_yaml(asset: Asset, filepath: str) -> bool:
+    return _write_asset(asset, filepath)
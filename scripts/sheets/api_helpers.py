@@ -8,7 +8,7 @@ from googleapiclient.discovery import Resource
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-import format_vars
+import sheets_client
 
 # Google APIs we expect to be able to access
 # the API token will be the final judge, any scopes
@@ -24,6 +24,16 @@ SCOPES = [
 SHEETS_API_VER = "v4"
 DRIVE_API_VER = "v3"
 
+# services handed out instead of building real ones - see use_services()
+SERVICES = {"sheets" : None, "drive" : None}
+
+# makes get_sheets_service() and get_drive_service() return the given services (ex. the
+# offline fakes in fake_service.py) instead of connecting to Google - None for either goes
+# back to the real API
+def use_services(sheets=None, drive=None):
+    SERVICES["sheets"] = sheets
+    SERVICES["drive"] = drive
+
 # generates a Credentials object from the key in keyfile
 # or produces an error if the file does not exist
 #
@@ -40,6 +50,9 @@ def get_creds(keyfile: str) -> Credentials:
 #
 # returns: the API Resource object - or causes HttpError 
 def get_sheets_service(keyfile: str="key.json") -> Resource:
+    if SERVICES["sheets"] is not None:
+        return SERVICES["sheets"]
+
     try:
         creds = get_creds(keyfile)
         return build("sheets", SHEETS_API_VER, credentials=creds)
@@ -52,6 +65,9 @@ def get_sheets_service(keyfile: str="key.json") -> Resource:
 #
 # returns: a Drive API resource - or HttpError
 def get_drive_service(keyfile: str="key.json") -> Resource:
+    if SERVICES["drive"] is not None:
+        return SERVICES["drive"]
+
     try:
         creds = get_creds(keyfile)
         return build("drive", DRIVE_API_VER, credentials=creds)
@@ -59,10 +75,17 @@ def get_drive_service(keyfile: str="key.json") -> Resource:
     except HttpError as err:
         raise err
 
+# wraps a Sheets API service in a quota-aware SheetsClient (see sheets_client.py)
+#
+# params:
+#   spreadsheet_id - the spreadsheet the client works on - None if it will create one
+#
+# returns: the SheetsClient
+def get_sheets_client(spreadsheet_id: str=None, keyfile: str="key.json") -> sheets_client.SheetsClient:
+    return sheets_client.SheetsClient(get_sheets_service(keyfile), spreadsheet_id)
+
 def get_sheet_ids(sheet_srv: Resource, spreadsheet_id: str) -> tuple:
-    main_id = sheet_srv.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=[format_vars.MAIN_SHEET_NAME]).execute()["sheets"][0]["properties"]["sheetId"]
-    swapped_id = sheet_srv.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=[format_vars.SWAP_SHEET_NAME]).execute()["sheets"][0]["properties"]["sheetId"]
-    return (main_id, swapped_id)
+    return sheets_client.SheetsClient(sheet_srv, spreadsheet_id).sheet_ids()
 
 # shares a Google Drive file with the specified email
 #
@@ -88,12 +111,11 @@ def share_file(fileId: str, email_addr: str, keyfile:str="key.json"):
             "sendNotificationEmail" : False,
         }
 
-        perm = drive_service.permissions().create( 
+        # a retried share would only set the same permission again
+        response = sheets_client.execute(lambda: drive_service.permissions().create(
             fileId=fileId,
             body=perm_data
-        )
-
-        response = perm.execute()
+        ))
 
     except HttpError as err:
         raise err
@@ -0,0 +1,392 @@
+# an offline stand-in for the Google Sheets and Drive API services - for timing and
+# testing the sheets scripts without using up API quota
+#
+# implements the subset of the API the scripts use: spreadsheets create/get/batchUpdate
+# (insert/delete/move dimension and pasteData change cells - formatting requests are
+# accepted and ignored), values get/update/batchUpdate, and Drive files list/delete and
+# permissions create. every tab is an in-memory grid of strings
+#
+# install a fake with api_helpers.use_services() - then get_sheets_service() and
+# get_drive_service() hand it out instead of building a real service:
+#
+#   sheets = fake_service.FakeSheetsService()
+#   api_helpers.use_services(sheets, fake_service.FakeDriveService())
+#
+# every call is counted in the service's stats (see FakeStats)
+
+import re
+import json
+
+# "Inventory", "Inventory!B5", "Inventory!A2:O10"
+RANGE_PATTERN = re.compile(r"(?P<sheet>[^!]+)!(?P<col1>[A-Z]+)(?P<row1>\d+)?(?::(?P<col2>[A-Z]+)(?P<row2>\d+)?)?")
+
+# requests that only change how cells look - nothing is stored for them
+FORMAT_REQUESTS = {
+    "autoResizeDimensions",
+    "updateBanding",
+    "addBanding",
+    "addProtectedRange",
+    "repeatCell",
+}
+
+# what the API has been asked to do so far
+class FakeStats:
+    def __init__(self):
+        # execute() calls - each one is a round trip to the real API
+        self.calls = 0
+        self.reads = 0
+        self.writes = 0
+
+        # the requests inside batchUpdate() bodies plus the ranges of value writes
+        self.subrequests = 0
+
+        # the size of the JSON sent and received
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    # returns the stats as a dict
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return f"{self.calls} calls ({self.reads} reads, {self.writes} writes), {self.subrequests} sub-requests, {self.sent_bytes} bytes sent, {self.received_bytes} bytes received"
+
+# returns the (0-indexed) column of an A1 notation column letter (ex. "B" -> 1)
+def column_index(letters: str) -> int:
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord('A') + 1
+
+    return col - 1
+
+# a single tab
+class FakeSheet:
+    def __init__(self, sheet_id: int, title: str):
+        self.sheet_id = sheet_id
+        self.title = title
+
+        # a list of rows (list[str]) - rows/cells past the end are empty
+        self.grid = []
+
+    # makes sure the grid has at least count rows
+    def _grow(self, count: int):
+        while len(self.grid) < count:
+            self.grid.append([])
+
+    # writes a block of values with its top left corner at (row, col)
+    def write(self, row: int, col: int, values: list[list]):
+        self._grow(row + len(values))
+
+        for offset, line in enumerate(values):
+            cells = self.grid[row + offset]
+            if len(cells) < col + len(line):
+                cells.extend([""] * (col + len(line) - len(cells)))
+
+            for i, value in enumerate(line):
+                cells[col + i] = "" if value is None else str(value)
+
+    # reads the values in [first_row, last_row) x [first_col, last_col) - the same way the
+    # API does: trailing empty cells and rows are left off
+    def read(self, first_row: int=0, last_row: int=None, first_col: int=0, last_col: int=None) -> list[list[str]]:
+        values = []
+        for cells in self.grid[first_row:last_row]:
+            line = cells[first_col:last_col]
+            while line and line[-1] == "":
+                line.pop()
+
+            values.append(line)
+
+        while values and not values[-1]:
+            values.pop()
+
+        return values
+
+    def insert_rows(self, start: int, end: int):
+        self._grow(start)
+        self.grid[start:start] = [[] for _ in range(end - start)]
+
+    def delete_rows(self, start: int, end: int):
+        del self.grid[start:end]
+
+    # moves [start, end) so it begins at dest - counted before the rows are taken out
+    def move_rows(self, start: int, end: int, dest: int):
+        self._grow(end)
+        rows = self.grid[start:end]
+        del self.grid[start:end]
+
+        if dest > start:
+            dest -= end - start
+
+        self.grid[dest:dest] = rows
+
+    def paste(self, row: int, col: int, data: str, delimiter: str):
+        lines = data.split("\n")
+        if lines and lines[-1] == "":
+            lines.pop()
+
+        self.write(row, col, [line.split(delimiter) for line in lines])
+
+# a single spreadsheet
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id: str, title: str):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.sheets = [FakeSheet(0, "Sheet1")]
+
+    def add_sheet(self, title: str) -> FakeSheet:
+        sheet = FakeSheet(max(sheet.sheet_id for sheet in self.sheets) + 1, title)
+        self.sheets.append(sheet)
+        return sheet
+
+    def by_id(self, sheet_id: int) -> FakeSheet:
+        for sheet in self.sheets:
+            if sheet.sheet_id == sheet_id:
+                return sheet
+
+        raise ValueError(f"no sheet with id {sheet_id}")
+
+    def by_title(self, title: str) -> FakeSheet:
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+
+        raise ValueError(f"no sheet named '{title}'")
+
+    # returns (sheet, first row, last row, first col, last col) for an A1 notation range
+    # the last row/col is None if the range is open ended
+    def parse_range(self, range_str: str) -> tuple:
+        # just a tab name - the whole tab
+        if "!" not in range_str:
+            return (self.by_title(range_str), 0, None, 0, None)
+
+        match = RANGE_PATTERN.fullmatch(range_str)
+        if match is None or match.group("col1") is None:
+            raise ValueError(f"bad range '{range_str}'")
+
+        sheet = self.by_title(match.group("sheet"))
+
+        first_col = column_index(match.group("col1"))
+        first_row = int(match.group("row1") or 1) - 1
+
+        # a single cell
+        if match.group("col2") is None:
+            return (sheet, first_row, first_row + 1 if match.group("row1") else None, first_col, first_col + 1)
+
+        last_col = column_index(match.group("col2")) + 1
+        last_row = int(match.group("row2")) if match.group("row2") else None
+        return (sheet, first_row, last_row, first_col, last_col)
+
+    # applies a single batchUpdate request
+    #
+    # returns: the request's reply
+    def apply(self, request: dict) -> dict:
+        kind, args = next(iter(request.items()))
+
+        if kind in FORMAT_REQUESTS:
+            return {}
+
+        if kind == "updateSpreadsheetProperties":
+            self.title = args["properties"].get("title", self.title)
+            return {}
+
+        if kind == "addSheet":
+            sheet = self.add_sheet(args["properties"]["title"])
+            return {"addSheet" : {"properties" : {"sheetId" : sheet.sheet_id, "title" : sheet.title}}}
+
+        if kind == "updateSheetProperties":
+            properties = args["properties"]
+            sheet = self.by_id(properties["sheetId"])
+            sheet.title = properties.get("title", sheet.title)
+            return {}
+
+        if kind in ("insertDimension", "deleteDimension", "moveDimension"):
+            dims = args["source"] if kind == "moveDimension" else args["range"]
+            if dims["dimension"] != "ROWS":
+                raise ValueError(f"{kind}: only ROWS are supported")
+
+            sheet = self.by_id(dims["sheetId"])
+            if kind == "insertDimension":
+                sheet.insert_rows(dims["startIndex"], dims["endIndex"])
+            elif kind == "deleteDimension":
+                sheet.delete_rows(dims["startIndex"], dims["endIndex"])
+            else:
+                sheet.move_rows(dims["startIndex"], dims["endIndex"], args["destinationIndex"])
+
+            return {}
+
+        if kind == "pasteData":
+            coordinate = args["coordinate"]
+            sheet = self.by_id(coordinate["sheetId"])
+            sheet.paste(coordinate.get("rowIndex", 0), coordinate.get("columnIndex", 0), args["data"], args.get("delimiter", ","))
+            return {}
+
+        raise ValueError(f"unsupported request '{kind}'")
+
+    # returns the spreadsheet resource - as returned by spreadsheets().get()/create()
+    def resource(self, ranges: list[str]=None) -> dict:
+        sheets = self.sheets
+        if ranges:
+            titles = [self.parse_range(range_str)[0].title for range_str in ranges]
+            sheets = [sheet for sheet in sheets if sheet.title in titles]
+
+        return {
+            "spreadsheetId" : self.spreadsheet_id,
+            "spreadsheetUrl" : f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}/edit",
+            "properties" : {"title" : self.title},
+            "sheets" : [{"properties" : {"sheetId" : sheet.sheet_id, "title" : sheet.title}} for sheet in sheets],
+        }
+
+# a call waiting on execute() - like googleapiclient's HttpRequest
+class FakeRequest:
+    def __init__(self, stats: FakeStats, fun, body=None, subrequests: int=0):
+        self.stats = stats
+        self.fun = fun
+        self.body = body
+        self.subrequests = subrequests
+
+    def execute(self):
+        self.stats.calls += 1
+
+        if self.body is None:
+            self.stats.reads += 1
+        else:
+            self.stats.writes += 1
+            self.stats.subrequests += self.subrequests
+            self.stats.sent_bytes += len(json.dumps(self.body))
+
+        response = self.fun()
+        self.stats.received_bytes += len(json.dumps(response))
+        return response
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId: str, range: str, **kwargs) -> FakeRequest:
+        def run():
+            sheet, first_row, last_row, first_col, last_col = self.service.spreadsheet(spreadsheetId).parse_range(range)
+            values = sheet.read(first_row, last_row, first_col, last_col)
+
+            response = {"range" : range, "majorDimension" : "ROWS"}
+            if values:
+                response["values"] = values
+
+            return response
+
+        return FakeRequest(self.service.stats, run)
+
+    def update(self, spreadsheetId: str, range: str, body: dict, **kwargs) -> FakeRequest:
+        def run():
+            sheet, first_row, last_row, first_col, last_col = self.service.spreadsheet(spreadsheetId).parse_range(range)
+            sheet.write(first_row, first_col, body.get("values", []))
+            return {"spreadsheetId" : spreadsheetId, "updatedRange" : range}
+
+        return FakeRequest(self.service.stats, run, body, 1)
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        def run():
+            spreadsheet = self.service.spreadsheet(spreadsheetId)
+            for data in body.get("data", []):
+                sheet, first_row, last_row, first_col, last_col = spreadsheet.parse_range(data["range"])
+                sheet.write(first_row, first_col, data.get("values", []))
+
+            return {"spreadsheetId" : spreadsheetId, "totalUpdatedRanges" : len(body.get("data", []))}
+
+        return FakeRequest(self.service.stats, run, body, len(body.get("data", [])))
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def values(self) -> FakeValues:
+        return FakeValues(self.service)
+
+    def create(self, body: dict) -> FakeRequest:
+        def run():
+            spreadsheet = self.service.add_spreadsheet(body.get("properties", {}).get("title", "Untitled spreadsheet"))
+            return spreadsheet.resource()
+
+        return FakeRequest(self.service.stats, run, body, 1)
+
+    def get(self, spreadsheetId: str, ranges: list[str]=None, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.stats, lambda: self.service.spreadsheet(spreadsheetId).resource(ranges))
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        def run():
+            spreadsheet = self.service.spreadsheet(spreadsheetId)
+            replies = [spreadsheet.apply(request) for request in body.get("requests", [])]
+            return {"spreadsheetId" : spreadsheetId, "replies" : replies}
+
+        return FakeRequest(self.service.stats, run, body, len(body.get("requests", [])))
+
+# stands in for the Resource api_helpers.get_sheets_service() builds
+class FakeSheetsService:
+    def __init__(self):
+        self.stats = FakeStats()
+
+        # spreadsheet id -> FakeSpreadsheet
+        self.spreadsheets_by_id = dict()
+
+    def spreadsheets(self) -> FakeSpreadsheets:
+        return FakeSpreadsheets(self)
+
+    def spreadsheet(self, spreadsheet_id: str) -> FakeSpreadsheet:
+        if spreadsheet_id not in self.spreadsheets_by_id:
+            raise ValueError(f"no spreadsheet with id '{spreadsheet_id}'")
+
+        return self.spreadsheets_by_id[spreadsheet_id]
+
+    # makes a new spreadsheet with a single "Sheet1" tab
+    def add_spreadsheet(self, title: str, spreadsheet_id: str=None) -> FakeSpreadsheet:
+        if spreadsheet_id is None:
+            spreadsheet_id = f"fake{len(self.spreadsheets_by_id):04d}"
+
+        spreadsheet = FakeSpreadsheet(spreadsheet_id, title)
+        self.spreadsheets_by_id[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    # starts counting from zero
+    def reset_stats(self):
+        self.stats = FakeStats()
+
+class FakeFiles:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.stats, lambda: {"files" : [{"id" : file_id, "name" : name} for file_id, name in self.service.stored_files.items()]})
+
+    def delete(self, fileId: str) -> FakeRequest:
+        def run():
+            self.service.stored_files.pop(fileId, None)
+            return {}
+
+        return FakeRequest(self.service.stats, run, {"fileId" : fileId}, 1)
+
+class FakePermissions:
+    def __init__(self, service):
+        self.service = service
+
+    def create(self, fileId: str, body: dict, **kwargs) -> FakeRequest:
+        def run():
+            self.service.shared.setdefault(fileId, []).append(body)
+            return {"id" : str(len(self.service.shared[fileId]))}
+
+        return FakeRequest(self.service.stats, run, body, 1)
+
+# stands in for the Resource api_helpers.get_drive_service() builds
+class FakeDriveService:
+    def __init__(self):
+        self.stats = FakeStats()
+
+        # file id -> name
+        self.stored_files = dict()
+
+        # file id -> list of permission bodies
+        self.shared = dict()
+
+    def files(self) -> FakeFiles:
+        return FakeFiles(self)
+
+    def permissions(self) -> FakePermissions:
+        return FakePermissions(self)
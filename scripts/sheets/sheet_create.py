@@ -2,7 +2,6 @@
 
 import os.path
 import argparse
-from api_helpers import get_sheets_service
 from api_helpers import get_drive_service
 from api_helpers import share_file
 from datetime import datetime
@@ -21,20 +20,19 @@ def main():
 
     # try is used to catch HttpError during the API call
     try:
+        # every sheets call goes through the client - it keeps us under the API's quotas and retries failed calls
         if args.keypath:
             drive_service = get_drive_service(args.keypath)
-            sheets_service = get_sheets_service(args.keypath)
+            client = api_helpers.get_sheets_client(keyfile=args.keypath)
         else:
             drive_service = get_drive_service()
-            sheets_service = get_sheets_service()
+            client = api_helpers.get_sheets_client()
 
         # create a spreadsheet
         date = datetime.now()
         title = f"CHTC Inventory {date.strftime('%Y-%m-%d %H:%M')}"
         sheet_data = {"properties" : {"title" : title}}
-        sheet = sheets_service.spreadsheets().create(body=sheet_data)
-
-        sheet_response = sheet.execute()
+        sheet_response = client.create(sheet_data)
 
         requests = []
 
@@ -62,13 +60,7 @@ def main():
         )
 
         # make initial requests
-        body = {"requests" : requests}
-
-        response = (
-            sheets_service.spreadsheets()
-            .batchUpdate(spreadsheetId=sheet_response.get("spreadsheetId"), body=body)
-            .execute()
-        )
+        client.batch_update(requests)
 
         # write the column headings - they will apprear in the order they are in the list
         # sheets API requires a 2D list - but in this case the outer list contains only the inner list
@@ -78,33 +70,16 @@ def main():
 
         # fqdn goes in column 1 - but is not in the YAML
         headings[0].insert(0, "Hostname")
-        data = [ {"range" : f"{format_vars.MAIN_SHEET_NAME}!A1:{chr(ord('A') + format_vars.NUM_COLUMNS)}1", "values" : headings} ]
-
-        data_body = {"valueInputOption" : "RAW", "data" : data}
-
-        header_request = (
-            sheets_service.spreadsheets()
-            .values()
-            .batchUpdate(spreadsheetId=sheet_response.get('spreadsheetId'), body=data_body)
-        )
-
-        header_request.execute()
-
-        # TODO this is not ideal - but do we have time to fix??
-        data = [ {"range" : f"{format_vars.SWAP_SHEET_NAME}!A1:{chr(ord('A') + format_vars.NUM_COLUMNS)}1", "values" : headings} ]
-
-        data_body = {"valueInputOption" : "RAW", "data" : data}
-
-        swap_header_request = (
-            sheets_service.spreadsheets()
-            .values()
-            .batchUpdate(spreadsheetId=sheet_response.get('spreadsheetId'), body=data_body)
-        )
+        # both tabs' headings are written in one call
+        data = [
+            {"range" : f"{format_vars.MAIN_SHEET_NAME}!A1:{chr(ord('A') + format_vars.NUM_COLUMNS)}1", "values" : headings},
+            {"range" : f"{format_vars.SWAP_SHEET_NAME}!A1:{chr(ord('A') + format_vars.NUM_COLUMNS)}1", "values" : headings},
+        ]
 
-        swap_header_request.execute()
+        client.batch_update_values(data)
 
         # requests to be done for both sheets
-        ids = api_helpers.get_sheet_ids(sheets_service, sheet_response.get('spreadsheetId'))
+        ids = client.sheet_ids()
         requests.clear()
 
         for sheet_id in ids:
@@ -201,13 +176,7 @@ def main():
                 },
             ])
 
-        body = {"requests" : requests}
-
-        response = (
-            sheets_service.spreadsheets()
-            .batchUpdate(spreadsheetId=sheet_response.get("spreadsheetId"), body=body)
-            .execute()
-        )
+        client.batch_update(requests)
 
         # print the spreadsheet URL
         print(f"A spreadsheet \"{title}\" was created and shared: ")
@@ -2,31 +2,22 @@
 
 import os
 import sys
-import math
-import copy
 from datetime import datetime
-from googleapiclient.discovery import Resource
 from googleapiclient.errors import HttpError
-from api_helpers import get_drive_service
-from api_helpers import get_sheets_service
+from sheets_client import SheetsClient
 
 sys.path.append(os.path.abspath("../shared/"))
 sys.path.append(os.path.abspath("scripts/shared"))
 
 import format_vars
 import api_helpers
+import sync_plan
 import config
-from yaml_io import read_yaml
-from yaml_io import Asset
-from dict_utils import flatten_dict
+from git_index import read_yaml
 
 # the global ID of the spreadsheet - as read from .spreadsheet_id
 SPREADSHEET_ID = ""
 
-# the key the spreadsheet will be sorted
-# (alphanumerically) by
-SORT_BY = "location.room"
-
 # these are set by the config
 YAML_PATH = ""
 SWAPPED_PATH = ""
@@ -35,19 +26,12 @@ SWAPPED_PATH = ""
 # canonical data - will be used for finding the 'diff' of the sheet and the YAML
 # note: does NOT read the first (header row)
 #
-# params: sheet_srv - an initialized Google Sheets API service
+# params: client - a SheetsClient for the spreadsheet
 #
 # returns a list of rows (list[str]) read from the sheet
-def read_spreadsheet(sheet_srv: Resource, sheet_name: str) -> list[list[str]]:
+def read_spreadsheet(client: SheetsClient, sheet_name: str) -> list[list[str]]:
     # want to specifiy the entire sheet
-    result = (
-        sheet_srv.spreadsheets()
-        .values()
-        .get(spreadsheetId=SPREADSHEET_ID, range=sheet_name)
-        .execute()
-    )
-
-    ret = result.get("values", [])
+    ret = client.get_values(sheet_name)
 
     #remove the first (header) row
     if ret:
@@ -55,239 +39,61 @@ def read_spreadsheet(sheet_srv: Resource, sheet_name: str) -> list[list[str]]:
 
     return ret
 
-# returns new_row's sorted index within rows - does not actually insert
-def find_sorted_position(rows: list[list[str]], new_row: list[str]) -> int:
-    key_index = format_vars.COLUMN_MAP.index(SORT_BY) + 1
-    index = 0
-
-    while index < len(rows) and new_row[key_index] > rows[index][key_index]:
-        index += 1
-
-    return index
-
-# finds the index of a new spreadsheet element
-# in a sorted spreadsheet and inserts a new row at the proper place
-def insert_batch_sorted(sheet_srv: Resource, sheet_id: int, rows: list[list[str]], new_rows: list[list[str]]):
-    rows_cpy = copy.deepcopy(rows)
-    requests = []
-
-    for new_row in new_rows:
-        row = new_row[0]
-        index = find_sorted_position(rows_cpy, row)
-
-        # insert a new row at index + 2 (+1 for 1-indexing, +1 to account for the header)
-        inherit = True if index != 0 else False
-
-        requests.append(
-            {
-                "insertDimension" : {
-                    "range" : {
-                        "sheetId" : sheet_id,
-                        "dimension" : "ROWS",
-                        "startIndex" : index + 1,
-                        "endIndex" : index + 2,
-                    },
-
-                    "inheritFromBefore" : inherit,
-                }
-            },
-        )
-
-        requests.append(
-            {
-                "pasteData" : {
-                    "coordinate" : {
-                        "sheetId" : sheet_id,
-                        "rowIndex" : index + 1,
-                    },
-
-                    "data" : f"{',,,'.join(row)}\n",
-                    "type" : "PASTE_NORMAL",
-                    "delimiter" : ",,,",
-                }
-            },
-        )
-
-        rows_cpy.insert(index, row)
-
-    body = {"requests" : requests}
-    request = (
-        sheet_srv.spreadsheets()
-        .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-    )
-    request.execute()
-
-# handles deleting rows whose underlying YAML no longer exists
+# reads every tab once and plans its sync against the YAML in memory
 #
 # params:
-#   sheet_srv - a Google Sheets API service
-#   assets - a list of Asset objects read from underlaying YAML
-def do_deletions(sheet_srv: Resource, assets: list[Asset], sheet_id: int, sheet_name: str):
-    rows = read_spreadsheet(sheet_srv, sheet_name)
-
-    # rows should be sorted in reverse order so when batch deletions happen
-    # the row number shifts won't mess things up
-    sheet_hostnames = [(rows[i][0], i) for i in reversed(range(len(rows)))]
-    yaml_hostnames = [asset.fqdn for asset in assets]
-
-    # pick out elements in sheet_data but not in file_data
-    # sadly, these need to be ordered so can't use my beloved python sets :(
-    delete_assets = []
-    for row in sheet_hostnames:
-        if row[0] not in yaml_hostnames:
-            delete_assets.append(row)
-
-    api_requests = []
-
-    # if no deletions - don't bother calling the API
-    if not delete_assets:
-        return
-
-    for pair in delete_assets:
-        api_requests.append (
-            {
-                "deleteDimension" : {
-                    "range" : {
-                        "sheetId" : sheet_id,
-                        "dimension" : "ROWS",
-                        "startIndex" : pair[1] + 1,
-                        "endIndex" : pair[1] + 2,
-                    }
-                }
-            }
-        )
-
-    # make the api request
-    body = {"requests" : api_requests}
-    response = (
-        sheet_srv.spreadsheets().
-        batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-        .execute()
-    )
-
-# handles adding spreadsheet rows for new underlying
-# YAML files
+#   client - a SheetsClient for the spreadsheet
+#   tabs - a list of (assets, sheet id, sheet name) for each tab
+#   strategy - how tabs are synced - one of sync_plan.STRATEGIES
 #
-# params:
-#   sheet_srv - a Google Sheets API service
-#   assets - a list of asset objects read from underlying YAML
-def do_additions(sheet_srv: Resource, assets: list[Asset], sheet_id: int, sheet_name: str):
-    rows = read_spreadsheet(sheet_srv, sheet_name)
-
-    # the + 1 is because spreasheets start indexing at 1
-    sheet_hostnames = {row[0] for row in rows}
-    yaml_hostnames = {assets[i].fqdn : i for i in range(len(assets))}
-
-    # seperate assets that are in the YAML but not the sheet
-    new_hostnames = set(yaml_hostnames.keys()) - sheet_hostnames
-
-    # if no additions - don't bother calling the API
-    if not new_hostnames:
-        return
-
-    # generate rows for the new assets
-    # for now append to the list
-    new_assets = []
-
-    for hostname in new_hostnames:
-        asset = assets[yaml_hostnames[hostname]]
-        flat = flatten_dict(asset.asset)
-        vals = [
-            [flat[key] for key in format_vars.COLUMN_MAP],
-        ]
+# returns: a list of sync_plan.SyncPlan - one per tab
+def plan_tabs(client: SheetsClient, tabs: list[tuple], strategy: str="auto") -> list[sync_plan.SyncPlan]:
+    plans = []
 
-        # prepend the hostname
-        vals[0].insert(0, asset.fqdn)
+    for assets, sheet_id, sheet_name in tabs:
+        rows = read_spreadsheet(client, sheet_name)
+        plans.append(sync_plan.plan_sync(rows, assets, sheet_id, sheet_name, strategy))
 
-        new_assets.append(vals)
+    return plans
 
-    insert_batch_sorted(sheet_srv, sheet_id, rows, new_assets)
-
-# handles updating (only) spreadsheet rows whose underlying YAML has changed
+# sends the planned updates of every tab - the row requests of all tabs go in one
+# batchUpdate (after any extra requests, ex. the title), then all the changed cells
+# the client splits either into more calls if they are too big for one
 #
 # params:
-#   sheet_srv - a Google Sheets API service
-#   assets - a list of Asset objects read from underlying YAML
-def do_changes(sheet_srv: Resource, assets: list[Asset], sheet_id: int, sheet_name: str):
-    rows = read_spreadsheet(sheet_srv, sheet_name)
-
-    # the nested comprehension is a bit gross - maybe I should find a cleaner way
-    yaml_data = {asset.fqdn : [flatten_dict(asset.asset)[key] for key in format_vars.COLUMN_MAP] for asset in assets}
-    row_nums = {rows[i][0] : i + 2 for i in range(len(rows))}
-
-    move_reqs = []
-    new_data = []
-
-    # update the sheet with per-cell granularity
-    for row in rows:
-        for i in range(1, len(row)):
-            # something changed in this file - update the sheet
-            # note: if a hostname changes the script will process it as
-            # a deletion and addition, not a change
-            # -- TODO: is this okay?
-            if row[i] != yaml_data[row[0]][i - 1]:
-                # track down what cell the change will occur in
-                # + 1 to account for the hostname
-                if i == format_vars.COLUMN_MAP.index(SORT_BY) + 1:
-                    # if we modify the field on which the sorted is based
-                    # we may need to move the row
-                    yaml_row = copy.deepcopy(yaml_data[row[0]])
-                    yaml_row.insert(0, row[0])
-                    new_index = find_sorted_position(rows, yaml_row)
-
-                    # create a new MoveDimensionRequest
-                    move_reqs.append({
-                        "moveDimension" : {
-                            "source" : {
-                                "sheetId" : sheet_id,
-                                "dimension" : "ROWS",
-                                "startIndex" : row_nums[row[0]] - 1, # rows are 0-indexed in API call, and 1-indexed in range strings
-                                "endIndex" : row_nums[row[0]],
-                            },
-
-                            "destinationIndex" : new_index + 1,
-                        }
-                    })
+#   client - a SheetsClient for the spreadsheet
+#   plans - the tabs' SyncPlans
+#   requests - requests to send ahead of the plans' (if any)
+def apply_plans(client: SheetsClient, plans: list[sync_plan.SyncPlan], requests: list[dict]=None):
+    requests = list(requests) if requests is not None else []
+    data = []
 
-                range_str = f"{sheet_name}!{chr(ord('A') + i)}{row_nums[row[0]]}"
+    for plan in plans:
+        print(plan)
+        requests.extend(plan.requests)
+        data.extend(plan.data)
 
-                # google sheets needs it in a 2D list
-                to_append = [ [yaml_data[row[0]][i - 1] ] ]
-                new_data.append({"range" : range_str, "values" : to_append})
+    if requests:
+        client.batch_update(requests)
 
-    # make the input API request
-    body = {"valueInputOption" : "RAW", "data" : new_data}
-
-    request = (
-        sheet_srv.spreadsheets()
-        .values()
-        .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-    )
-
-    request.execute()
-
-    # make the move API request
-    if move_reqs:
-        body = {"requests" : move_reqs}
-        move_req = (
-            sheet_srv.spreadsheets()
-            .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-        )
-
-        move_req.execute()
+    # ranges are where the rows end up - so they're written after the rows are in place
+    if data:
+        client.batch_update_values(data)
 
 def main():
     # get the YAML and swapped paths
     global YAML_PATH
-    global SWAP_PATH
+    global SWAPPED_PATH
 
     # in the github action, scripts are run from the project root
     c = config.get_config("config.yaml")
     YAML_PATH = c.yaml_path
-    SWAP_PATH = c.swapped_path
-    # read asset data from each YAML file in given dir
-    assets = read_yaml(YAML_PATH)
-    swapped = read_yaml(SWAPPED_PATH)
+    SWAPPED_PATH = c.swapped_path
+
+    # read asset data from each YAML file in given dir - only files git says changed are re-parsed
+    # the sync only reads the assets, so they're loaded as compact records (see asset_record.py)
+    assets = read_yaml(YAML_PATH, records=True)
+    swapped = read_yaml(SWAPPED_PATH, records=True)
 
     # read the new spreadsheet id
     global SPREADSHEET_ID
@@ -297,11 +103,11 @@ def main():
         SPREADSHEET_ID = infile.read()
 
     try:
-        sheets_service = get_sheets_service()
-        drive_service = get_drive_service()
+        # every call goes through the client - it keeps us under the API's quotas and retries failed calls
+        client = api_helpers.get_sheets_client(SPREADSHEET_ID)
 
         # get the ids of each sheet
-        ids = api_helpers.get_sheet_ids(sheets_service, SPREADSHEET_ID)
+        ids = client.sheet_ids()
 
         # update the title to reflect the time the sheet was updated
         # and also make sure there are enough rows for our data
@@ -317,24 +123,16 @@ def main():
             },
         ]
 
-        # as far as I can tell - the spreadsheet itself only has batchUpdate() and not update()?
-        body = {"requests" : pre_format_requests}
-        pre_format_request = (
-            sheets_service.spreadsheets()
-            .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-        )
-
-        pre_format_request.execute()
+        # read each tab once, up front - every change is planned against that snapshot
+        # so nothing is read back while it is half updated
+        plans = plan_tabs(client, [
+            (assets, ids[0], format_vars.MAIN_SHEET_NAME),
+            (swapped, ids[1], format_vars.SWAP_SHEET_NAME),
+        ])
 
         # do the actual updating
-        do_deletions(sheets_service, assets, ids[0], format_vars.MAIN_SHEET_NAME)
-        do_additions(sheets_service, assets, ids[0], format_vars.MAIN_SHEET_NAME)
-        do_changes(sheets_service, assets, ids[0], format_vars.MAIN_SHEET_NAME)
-
-        # do the same thing for swapped assets
-        do_deletions(sheets_service, swapped, ids[1], format_vars.SWAP_SHEET_NAME)
-        do_additions(sheets_service, swapped, ids[1], format_vars.SWAP_SHEET_NAME)
-        do_changes(sheets_service, swapped, ids[1], format_vars.SWAP_SHEET_NAME)
+        # as far as I can tell - the spreadsheet itself only has batchUpdate() and not update()?
+        apply_plans(client, plans, pre_format_requests)
 
         post_format_requests = []
 
@@ -392,13 +190,7 @@ def main():
                 },
             ])
 
-        body = {"requests" : post_format_requests}
-        post_format_request = (
-            sheets_service.spreadsheets()
-            .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
-        )
-
-        post_format_request.execute()
+        client.batch_update(post_format_requests)
 
     except HttpError as err:
         print(err)
@@ -0,0 +1,240 @@
+# a quota-aware layer over the Sheets API service from api_helpers
+#
+# every call the sheets scripts make goes through a SheetsClient, which:
+#   - splits big batchUpdates into chunks under the API's request count and size limits
+#   - waits for a token from a per-minute token bucket (reads and writes have separate quotas)
+#   - retries rate limited (429) and failed (5xx) calls with jittered exponential backoff
+#
+# batchUpdate requests that insert/delete/move rows shift the indexes of every request
+# after them, so their chunks are sent one at a time, in order, and nothing after a chunk
+# that failed is sent. such a chunk is only retried when the API rejected it outright
+# (429) - after a 5xx it may have been applied, and sending it again could shift rows
+# twice. the error is raised instead; since sheet_update plans from a fresh read of each
+# tab, running it again finishes the sync
+
+import time
+import json
+import random
+from googleapiclient.discovery import Resource
+from googleapiclient.errors import HttpError
+
+import format_vars
+
+# the Sheets API's per-minute, per-user quotas
+# see https://developers.google.com/sheets/api/limits
+READS_PER_MINUTE = 60
+WRITES_PER_MINUTE = 60
+
+# how many calls can go out back to back before the bucket makes them wait
+BURST = 10
+
+# the most sub-requests and bytes sent in a single batchUpdate - the API recommends
+# keeping payloads under 2 MB
+MAX_BATCH_REQUESTS = 1000
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+# the statuses worth trying again - rate limited or a server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# retries are spaced 1, 2, 4, ... seconds apart (plus up to a second of jitter), up to
+# BACKOFF_MAX seconds, and given up on after MAX_RETRIES
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 64.0
+
+# batchUpdate requests that can't safely be sent twice
+NOT_IDEMPOTENT = {
+    "insertDimension",
+    "deleteDimension",
+    "moveDimension",
+    "appendDimension",
+    "addSheet",
+    "addBanding",
+    "addProtectedRange",
+}
+
+# hands out calls at a steady rate - at most per_minute in any minute
+class TokenBucket:
+    # params:
+    #   per_minute - the calls allowed per minute
+    #   burst - the calls that can be made back to back (at most half of per_minute)
+    #   clock, sleep - time.monotonic and time.sleep (or stand-ins)
+    def __init__(self, per_minute: int, burst: int=BURST, clock=time.monotonic, sleep=time.sleep):
+        # the burst comes out of the minute's quota - the rest trickles in over the minute
+        self.capacity = min(float(burst), per_minute / 2)
+        self.rate = (per_minute - self.capacity) / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.stamp = clock()
+
+    # waits (if needed) for a token and takes it
+    def take(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+        if self.tokens < 1:
+            wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+            self.tokens = 1
+            self.stamp = now + wait
+
+        self.tokens -= 1
+
+# returns the HTTP status of an HttpError
+def error_status(err: HttpError) -> int:
+    return getattr(err.resp, "status", None)
+
+# returns how long to wait before retry number attempt (0 for the first retry)
+def backoff(attempt: int) -> float:
+    return min(BACKOFF_BASE * 2 ** attempt + random.uniform(0, 1), BACKOFF_MAX)
+
+# makes and executes a request - retrying it when the API says to
+#
+# params:
+#   make_request - returns a fresh request object (ex. lambda: srv.spreadsheets().get(...))
+#   statuses - the statuses to retry on
+#   bucket - a TokenBucket to wait on before each attempt (or None)
+#   sleep - time.sleep (or a stand-in)
+#
+# returns: the response - or raises the last HttpError
+def execute(make_request, statuses: set=RETRY_STATUSES, bucket: TokenBucket=None, sleep=time.sleep):
+    attempt = 0
+
+    while True:
+        if bucket is not None:
+            bucket.take()
+
+        try:
+            return make_request().execute()
+
+        except HttpError as err:
+            status = error_status(err)
+            if status not in statuses or attempt >= MAX_RETRIES:
+                raise err
+
+            delay = backoff(attempt)
+            print(f"WARNING: the Google API returned {status} - retrying in {delay:.1f}s")
+            sleep(delay)
+            attempt += 1
+
+# splits items into chunks of at most max_count items and (roughly) max_bytes of JSON each
+# an item bigger than max_bytes gets a chunk to itself
+def chunk(items: list, max_count: int, max_bytes: int) -> list[list]:
+    chunks = []
+    current = []
+    size = 0
+
+    for item in items:
+        item_size = len(json.dumps(item)) + 1
+        if current and (len(current) >= max_count or size + item_size > max_bytes):
+            chunks.append(current)
+            current = []
+            size = 0
+
+        current.append(item)
+        size += item_size
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+# splits a values range (ex. "Inventory!A2:O5001") that is bigger than max_bytes into
+# ranges of fewer rows - ranges that aren't "tab!<col><row>:<col><row>" are left whole
+def split_range(data: dict, max_bytes: int) -> list[dict]:
+    values = data["values"]
+    size = len(json.dumps(values))
+    if size <= max_bytes or len(values) < 2:
+        return [data]
+
+    sheet, _, cells = data["range"].partition("!")
+    first, _, last = cells.partition(":")
+    first_col = first.rstrip("0123456789")
+    last_col = last.rstrip("0123456789")
+    if not first_col or not last_col or first_col == first or last_col == last:
+        return [data]
+
+    row = int(first[len(first_col):])
+    rows_per_range = max(1, len(values) * max_bytes // size)
+
+    ranges = []
+    for start in range(0, len(values), rows_per_range):
+        part = values[start:start + rows_per_range]
+        ranges.append({"range" : f"{sheet}!{first_col}{row + start}:{last_col}{row + start + len(part) - 1}", "values" : part})
+
+    return ranges
+
+class SheetsClient:
+    # params:
+    #   service - a Sheets API service (see api_helpers.get_sheets_service())
+    #   spreadsheet_id - the spreadsheet calls are made against - None until create() is called
+    #   reads_per_minute, writes_per_minute - the quotas to stay under
+    #   clock, sleep - time.monotonic and time.sleep (or stand-ins)
+    def __init__(self, service: Resource, spreadsheet_id: str=None, reads_per_minute: int=READS_PER_MINUTE, writes_per_minute: int=WRITES_PER_MINUTE, clock=time.monotonic, sleep=time.sleep):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sleep = sleep
+        self.reads = TokenBucket(reads_per_minute, clock=clock, sleep=sleep)
+        self.writes = TokenBucket(writes_per_minute, clock=clock, sleep=sleep)
+
+    def _read(self, make_request):
+        return execute(make_request, RETRY_STATUSES, self.reads, self.sleep)
+
+    def _write(self, make_request, statuses: set=RETRY_STATUSES):
+        return execute(make_request, statuses, self.writes, self.sleep)
+
+    # creates a new spreadsheet and makes it the one the client works on
+    #
+    # returns: the new spreadsheet
+    def create(self, body: dict) -> dict:
+        # a retried create could make a second spreadsheet - only retry if it was rejected
+        spreadsheet = self._write(lambda: self.service.spreadsheets().create(body=body), {429})
+        self.spreadsheet_id = spreadsheet.get("spreadsheetId")
+        return spreadsheet
+
+    # returns the spreadsheet's properties (and those of its tabs in ranges)
+    def get(self, ranges: list[str]=None) -> dict:
+        return self._read(lambda: self.service.spreadsheets().get(spreadsheetId=self.spreadsheet_id, ranges=ranges))
+
+    # returns the ids of the main and swapped tabs - in a single call
+    def sheet_ids(self) -> tuple:
+        sheets = self.get([format_vars.MAIN_SHEET_NAME, format_vars.SWAP_SHEET_NAME])["sheets"]
+        ids = {sheet["properties"]["title"] : sheet["properties"]["sheetId"] for sheet in sheets}
+        return (ids[format_vars.MAIN_SHEET_NAME], ids[format_vars.SWAP_SHEET_NAME])
+
+    # returns the rows (list[str]) in an A1 notation range
+    def get_values(self, range_str: str) -> list[list[str]]:
+        result = self._read(lambda: self.service.spreadsheets().values().get(spreadsheetId=self.spreadsheet_id, range=range_str))
+        return result.get("values", [])
+
+    # sends batchUpdate requests - split into as many calls as the limits need, sent in order
+    #
+    # returns: the replies to every request
+    def batch_update(self, requests: list[dict]) -> list[dict]:
+        replies = []
+
+        for requests_chunk in chunk(requests, MAX_BATCH_REQUESTS, MAX_BATCH_BYTES):
+            body = {"requests" : requests_chunk}
+
+            statuses = RETRY_STATUSES
+            if any(kind in NOT_IDEMPOTENT for request in requests_chunk for kind in request):
+                statuses = {429}
+
+            response = self._write(lambda: self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body=body), statuses)
+            replies.extend(response.get("replies", []))
+
+        return replies
+
+    # writes values to ranges (a list of {"range" : ..., "values" : ...}) - split into as
+    # many calls as the limits need
+    def batch_update_values(self, data: list[dict], value_input_option: str="RAW"):
+        ranges = []
+        for item in data:
+            ranges.extend(split_range(item, MAX_BATCH_BYTES))
+
+        for data_chunk in chunk(ranges, MAX_BATCH_REQUESTS, MAX_BATCH_BYTES):
+            body = {"valueInputOption" : value_input_option, "data" : data_chunk}
+            self._write(lambda: self.service.spreadsheets().values().batchUpdate(spreadsheetId=self.spreadsheet_id, body=body))
@@ -0,0 +1,446 @@
+# plans the API requests that bring one tab of the spreadsheet in line with the YAML
+#
+# the tab is read once (see sheet_update.read_spreadsheet()) and diffed against the assets
+# in memory. deletions, moves, and insertions are planned - in that order - against a
+# simulated copy of the tab's row layout, so each request's row indexes are the ones the
+# sheet will have when that request runs and nothing has to be re-read between them.
+# changed cells are written last, at their rows' final positions
+#
+# when so much changed that patching row by row would take more (and bigger) requests than
+# writing the whole tab out again, the tab is rewritten in place instead (see rewrite_plan())
+#
+# this module doesn't call the API itself - sheet_update.py sends what it plans
+
+import json
+import bisect
+import format_vars
+
+# the key the spreadsheet will be sorted
+# (alphanumerically) by
+SORT_BY = "location.room"
+
+# the column of SORT_BY in a sheet row - + 1 for the hostname
+SORT_INDEX = format_vars.COLUMN_MAP.index(SORT_BY) + 1
+
+# what a single sub-request costs, in payload bytes - every one is a separate edit the API
+# has to apply (row inserts/deletes/moves also shift everything below them), so it is
+# worth sending about this many more bytes to save one
+REQUEST_BYTES = 1000
+
+# the ways a tab can be synced
+STRATEGIES = ["auto", "incremental", "rewrite"]
+
+# everything needed to sync a single tab
+class SyncPlan:
+    def __init__(self, sheet_id: int, sheet_name: str):
+        self.sheet_id = sheet_id
+        self.sheet_name = sheet_name
+
+        # spreadsheets().batchUpdate() requests - in the order they have to run
+        self.requests = []
+
+        # values().batchUpdate() ranges - written after the requests have run
+        self.data = []
+
+        # how many rows/cells each kind of change touched
+        self.deleted = 0
+        self.moved = 0
+        self.inserted = 0
+        self.changed = 0
+
+        # the tab's final rows, top to bottom
+        self.rows = []
+
+        # True if the whole tab is written out instead of patched
+        self.rewrite = False
+
+        # the estimated cost (see plan_cost()) of patching and of rewriting the tab
+        # set when plan_sync() picks between them
+        self.costs = None
+
+    def __str__(self) -> str:
+        ret = f"{self.sheet_name}: {self.deleted} deleted, {self.inserted} added, {self.moved} moved, {self.changed} cells changed"
+
+        if self.costs is not None:
+            ret += f" - patching costs {self.costs[0]}, rewriting costs {self.costs[1]}"
+
+        return ret + (" - rewriting the tab" if self.rewrite else "")
+
+    # returns True if the tab is already up to date
+    def empty(self) -> bool:
+        return not self.requests and not self.data
+
+# returns the sheet row for an asset - its hostname followed by the COLUMN_MAP values
+def sheet_row(asset) -> list[str]:
+    row = asset.get_many(format_vars.COLUMN_MAP)
+    row.insert(0, asset.fqdn)
+    return row
+
+# the API leaves off a row's trailing empty cells - put them back so rows can be compared cell by cell
+def pad_row(row: list[str]) -> list[str]:
+    return row + [""] * (format_vars.NUM_COLUMNS - len(row))
+
+# returns the A1 notation column letter of a (0-indexed) column
+def column_letter(col: int) -> str:
+    return chr(ord('A') + col)
+
+# returns the SORT_BY value of a sheet row
+def sort_key(row: list[str]) -> str:
+    return row[SORT_INDEX]
+
+# deletes rows whose underlying YAML no longer exists
+#
+# rows are deleted bottom up so a deletion never shifts the rows the later ones remove,
+# and runs of neighbouring rows are removed by a single request
+#
+# params:
+#   plan - the SyncPlan to add requests to
+#   layout - the hostname of every row in the tab, top to bottom - deleted rows are removed
+#   yaml_rows - a dict of hostname -> sheet row for every asset
+def plan_deletions(plan: SyncPlan, layout: list[str], yaml_rows: dict):
+    index = len(layout) - 1
+
+    while index >= 0:
+        if layout[index] in yaml_rows:
+            index -= 1
+            continue
+
+        # find the top of this run of deleted rows
+        end = index
+        while index >= 0 and layout[index] not in yaml_rows:
+            index -= 1
+
+        # + 1 to account for the header
+        plan.requests.append(
+            {
+                "deleteDimension" : {
+                    "range" : {
+                        "sheetId" : plan.sheet_id,
+                        "dimension" : "ROWS",
+                        "startIndex" : index + 2,
+                        "endIndex" : end + 2,
+                    }
+                }
+            }
+        )
+
+        plan.deleted += end - index
+
+    layout[:] = [hostname for hostname in layout if hostname in yaml_rows]
+
+# counts the rows at positions in an ordering as rows come and go (a Fenwick tree)
+# adding a row and counting the rows before a position both take O(log n)
+class RowCounts:
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    # adds delta rows at position
+    def add(self, position: int, delta: int):
+        position += 1
+        while position < len(self.tree):
+            self.tree[position] += delta
+            position += position & -position
+
+    # returns the number of rows at positions before position
+    def before(self, position: int) -> int:
+        count = 0
+        while position > 0:
+            count += self.tree[position]
+            position -= position & -position
+
+        return count
+
+# moves rows whose SORT_BY value changed to their new sorted position
+#
+# the rows that aren't moving are already sorted, so each moving row goes right before the
+# first row already in place whose key isn't smaller than its new one (found with a binary
+# search) - rows still waiting to move are skipped over since they're about to leave
+#
+# every place a row starts or ends up in is laid out in a single ordering up front, and the
+# rows are moved top down. the index a request needs is the number of rows before its place
+# at that point - kept in a RowCounts, so planning is O((n + m) log n) for m moving rows
+#
+# params:
+#   plan - the SyncPlan to add requests to
+#   layout - the hostname of every row in the tab, top to bottom - updated as rows move
+#   sheet - a dict of hostname -> (padded) row currently in the sheet
+#   yaml_rows - a dict of hostname -> sheet row for every asset
+def plan_moves(plan: SyncPlan, layout: list[str], sheet: dict, yaml_rows: dict):
+    moving = [hostname for hostname in layout if sort_key(yaml_rows[hostname]) != sort_key(sheet[hostname])]
+    if not moving:
+        return
+
+    moving_set = set(moving)
+    keys = [sort_key(yaml_rows[hostname]) for hostname in layout if hostname not in moving_set]
+
+    # (place, kind, hostname) - places are (gap, ...) where gap j is right before the j-th
+    # row that stays put. a gap holds the rows that start in it (in tab order), then the
+    # rows moved into it (by key - and the last one moved first among equal keys)
+    places = []
+    gap = 0
+    for index, hostname in enumerate(layout):
+        if hostname in moving_set:
+            places.append(((gap, 0, index), "source", hostname))
+        else:
+            places.append(((gap, 2), "staying", hostname))
+            gap += 1
+
+    for turn, hostname in enumerate(moving):
+        key = sort_key(yaml_rows[hostname])
+        places.append(((bisect.bisect_left(keys, key), 1, key, -turn), "dest", hostname))
+
+    places.sort(key=lambda place: place[0])
+
+    # where each moving row starts and ends up in the ordering
+    sources = dict()
+    dests = dict()
+    counts = RowCounts(len(places))
+    for position, (place, kind, hostname) in enumerate(places):
+        if kind == "dest":
+            dests[hostname] = position
+            continue
+
+        counts.add(position, 1)
+        if kind == "source":
+            sources[hostname] = position
+
+    for hostname in moving:
+        source = counts.before(sources[hostname])
+        counts.add(sources[hostname], -1)
+
+        dest = counts.before(dests[hostname])
+        counts.add(dests[hostname], 1)
+
+        # already in place
+        if dest == source:
+            continue
+
+        # the API's destination is counted before the row is taken out
+        # + 1 to account for the header
+        plan.requests.append({
+            "moveDimension" : {
+                "source" : {
+                    "sheetId" : plan.sheet_id,
+                    "dimension" : "ROWS",
+                    "startIndex" : source + 1,
+                    "endIndex" : source + 2,
+                },
+
+                "destinationIndex" : (dest if dest < source else dest + 1) + 1,
+            }
+        })
+
+        plan.moved += 1
+
+    layout[:] = [hostname for place, kind, hostname in places if kind != "source"]
+
+# finds where each new row goes in the sorted tab and inserts them
+#
+# the new rows are sorted and merged into the tab's (already sorted) rows with a binary
+# search each - O((n + k) log n) - and new rows that end up next to each other are added
+# with a single insert and paste
+#
+# params:
+#   plan - the SyncPlan to add requests to
+#   rows - the tab's rows, top to bottom - new rows are inserted into it
+#   new_rows - the rows to add
+def insert_batch_sorted(plan: SyncPlan, rows: list[list[str]], new_rows: list[list[str]]):
+    if not new_rows:
+        return
+
+    keys = [sort_key(row) for row in rows]
+
+    # the new rows that go before each existing row - (index in rows, [new rows])
+    # new rows with the same key stay in the order they were given
+    runs = []
+    index = 0
+    for row in sorted(new_rows, key=sort_key):
+        index = bisect.bisect_left(keys, sort_key(row), index)
+
+        if runs and runs[-1][0] == index:
+            runs[-1][1].append(row)
+        else:
+            runs.append((index, [row]))
+
+    # rows already inserted above shift each run down
+    merged = []
+    offset = 0
+    prev = 0
+    for index, run in runs:
+        start = index + offset
+
+        # insert new rows at start + 1 (+1 to account for the header)
+        inherit = True if start != 0 else False
+
+        plan.requests.append(
+            {
+                "insertDimension" : {
+                    "range" : {
+                        "sheetId" : plan.sheet_id,
+                        "dimension" : "ROWS",
+                        "startIndex" : start + 1,
+                        "endIndex" : start + len(run) + 1,
+                    },
+
+                    "inheritFromBefore" : inherit,
+                }
+            },
+        )
+
+        plan.requests.append(
+            {
+                "pasteData" : {
+                    "coordinate" : {
+                        "sheetId" : plan.sheet_id,
+                        "rowIndex" : start + 1,
+                    },
+
+                    "data" : "".join(f"{',,,'.join(row)}\n" for row in run),
+                    "type" : "PASTE_NORMAL",
+                    "delimiter" : ",,,",
+                }
+            },
+        )
+
+        merged.extend(rows[prev:index])
+        merged.extend(run)
+        prev = index
+        offset += len(run)
+
+    merged.extend(rows[prev:])
+    rows[:] = merged
+    plan.inserted += len(new_rows)
+
+# writes the cells of existing rows whose underlying YAML has changed
+# neighbouring changed cells of a row are written as one range
+#
+# params:
+#   plan - the SyncPlan to add ranges to
+#   rows - the tab's final rows, top to bottom
+#   sheet - a dict of hostname -> (padded) row currently in the sheet
+def plan_changes(plan: SyncPlan, rows: list[list[str]], sheet: dict):
+    for index, row in enumerate(rows):
+        old = sheet.get(row[0])
+
+        # a new row - already pasted in whole
+        if old is None:
+            continue
+
+        # note: if a hostname changes it is processed as a deletion and addition, not a change
+        col = 1
+        while col < len(row):
+            if row[col] == old[col]:
+                col += 1
+                continue
+
+            first = col
+            while col < len(row) and row[col] != old[col]:
+                col += 1
+
+            # + 2 since range strings are 1-indexed and the header is row 1
+            range_str = f"{plan.sheet_name}!{column_letter(first)}{index + 2}"
+            if col - first > 1:
+                range_str += f":{column_letter(col - 1)}{index + 2}"
+
+            # google sheets needs it in a 2D list
+            plan.data.append({"range" : range_str, "values" : [row[first:col]]})
+            plan.changed += col - first
+
+# estimates what sending a plan costs - its payload bytes plus REQUEST_BYTES for each
+# sub-request and each written range
+def plan_cost(plan: SyncPlan) -> int:
+    count = len(plan.requests) + len(plan.data)
+    size = len(json.dumps(plan.requests)) + len(json.dumps(plan.data))
+
+    return size + count * REQUEST_BYTES
+
+# plans writing a tab's final rows over the whole tab in one range instead of patching it
+#
+# the tab itself is kept - rows are only added or removed at the bottom to fit the new
+# row count - so its banding, protection, and formatting stay as they are
+#
+# params:
+#   plan - the tab's (incremental) SyncPlan
+#   sheet_rows - the number of rows currently in the tab (not counting the header)
+#
+# returns: a new SyncPlan
+def rewrite_plan(plan: SyncPlan, sheet_rows: int) -> SyncPlan:
+    rewrite = SyncPlan(plan.sheet_id, plan.sheet_name)
+    rewrite.deleted, rewrite.moved, rewrite.inserted, rewrite.changed = plan.deleted, plan.moved, plan.inserted, plan.changed
+    rewrite.rows = plan.rows
+    rewrite.rewrite = True
+
+    # + 1 to account for the header
+    if len(plan.rows) > sheet_rows:
+        rewrite.requests.append(
+            {
+                "insertDimension" : {
+                    "range" : {
+                        "sheetId" : plan.sheet_id,
+                        "dimension" : "ROWS",
+                        "startIndex" : sheet_rows + 1,
+                        "endIndex" : len(plan.rows) + 1,
+                    },
+
+                    "inheritFromBefore" : sheet_rows > 0,
+                }
+            }
+        )
+    elif len(plan.rows) < sheet_rows:
+        rewrite.requests.append(
+            {
+                "deleteDimension" : {
+                    "range" : {
+                        "sheetId" : plan.sheet_id,
+                        "dimension" : "ROWS",
+                        "startIndex" : len(plan.rows) + 1,
+                        "endIndex" : sheet_rows + 1,
+                    }
+                }
+            }
+        )
+
+    if plan.rows:
+        range_str = f"{plan.sheet_name}!A2:{column_letter(format_vars.NUM_COLUMNS - 1)}{len(plan.rows) + 1}"
+        rewrite.data.append({"range" : range_str, "values" : plan.rows})
+
+    return rewrite
+
+# plans the sync of a single tab
+#
+# params:
+#   rows - the tab's rows as read by sheet_update.read_spreadsheet() (no header)
+#   assets - the assets that belong in the tab
+#   sheet_id - the tab's sheet id
+#   sheet_name - the tab's name
+#   strategy - one of STRATEGIES - "auto" patches or rewrites the tab, whichever plan_cost() says is cheaper
+#
+# returns: a SyncPlan
+def plan_sync(rows: list[list[str]], assets, sheet_id: int, sheet_name: str, strategy: str="auto") -> SyncPlan:
+    plan = SyncPlan(sheet_id, sheet_name)
+
+    sheet = {row[0] : pad_row(row) for row in rows}
+    yaml_rows = {asset.fqdn : sheet_row(asset) for asset in assets}
+
+    layout = [row[0] for row in rows]
+    plan_deletions(plan, layout, yaml_rows)
+    plan_moves(plan, layout, sheet, yaml_rows)
+
+    final_rows = [yaml_rows[hostname] for hostname in layout]
+    insert_batch_sorted(plan, final_rows, [row for hostname, row in yaml_rows.items() if hostname not in sheet])
+    plan_changes(plan, final_rows, sheet)
+    plan.rows = final_rows
+
+    # nothing to do either way
+    if strategy == "incremental" or plan.empty():
+        return plan
+
+    rewrite = rewrite_plan(plan, len(rows))
+    if strategy == "rewrite":
+        return rewrite
+
+    costs = (plan_cost(plan), plan_cost(rewrite))
+    chosen = rewrite if costs[1] < costs[0] else plan
+    chosen.costs = costs
+
+    return chosen
@@ -0,0 +1,24 @@
+# the scripts import each other by module name (they add their directories to sys.path
+# when run from the repo's top level directory) - do the same for the tests
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+for script_dir in ["scripts/shared", "scripts/integrity_checker", "scripts/sheets", "scripts/benchmarks"]:
+    sys.path.append(os.path.join(ROOT, script_dir))
+
+import pytest
+
+import synthetic
+
+# makes a directory of synthetic asset files (see synthetic.make_inventory()) in the
+# test's tmp_path - asset_dir(count, seed) returns its path, ending in '/'
+@pytest.fixture
+def asset_dir(tmp_path):
+    def make(count: int, seed: int=0) -> str:
+        yaml_dir = str(tmp_path / "assets") + "/"
+        synthetic.write_inventory(yaml_dir, synthetic.make_inventory(count, seed))
+        return yaml_dir
+
+    return make
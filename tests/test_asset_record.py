@@ -0,0 +1,44 @@
+import pytest
+
+import yaml_io
+import git_index
+import sync_plan
+import asset_record
+
+def test_records_hold_the_same_data_as_assets(asset_dir):
+    yaml_dir = asset_dir(30)
+    assets = yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False)
+
+    # parsed, then from the cache, then from the snapshot
+    for step in ["parse", "cache", "snapshot"]:
+        if step == "snapshot":
+            yaml_io.export_snapshot(yaml_dir)
+
+        records = yaml_io.read_yaml(yaml_dir, records=True)
+        assert all(isinstance(record, asset_record.AssetRecord) for record in records)
+        assert [(record.fqdn, record.filepath, record.digest) for record in records] == [(asset.fqdn, asset.filepath, asset.digest) for asset in assets]
+        assert [record.to_dict() for record in records] == [asset.asset for asset in assets]
+
+def test_git_index_hands_out_records(tmp_path, asset_dir):
+    yaml_dir = asset_dir(10)
+
+    records = git_index.read_yaml(yaml_dir, records=True)
+    assert [record.to_dict() for record in records] == [asset.asset for asset in yaml_io.read_yaml(yaml_dir)]
+
+    git = pytest.importorskip("git")
+    repo = git.Repo.init(tmp_path)
+    repo.index.add([path.removeprefix(str(tmp_path) + "/") for path in yaml_io._list_yaml(yaml_dir)])
+    repo.index.commit("assets", author=git.Actor("test", "test@example.com"))
+
+    # the first load indexes everything, the second comes from the index
+    for _ in range(2):
+        records = git_index.read_yaml(yaml_dir, records=True)
+        assert all(isinstance(record, asset_record.AssetRecord) for record in records)
+        assert [record.to_dict() for record in records] == [asset.asset for asset in yaml_io.read_yaml(yaml_dir)]
+
+def test_sheet_rows_are_the_same_from_records(asset_dir):
+    yaml_dir = asset_dir(30)
+    assets = yaml_io.read_yaml(yaml_dir)
+    records = yaml_io.read_yaml(yaml_dir, records=True)
+
+    assert [sync_plan.sheet_row(record) for record in records] == [sync_plan.sheet_row(asset) for asset in assets]
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+import yaml_io
+import synthetic
+
+def test_snapshot_is_read_while_files_are_unchanged(asset_dir):
+    yaml_dir = asset_dir(20)
+    assert yaml_io.export_snapshot(yaml_dir) == 20
+
+    from_files = yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False)
+    from_snapshot = yaml_io.read_yaml(yaml_dir, use_cache=False)
+
+    assert [asset.asset for asset in from_snapshot] == [asset.asset for asset in from_files]
+    assert yaml_io.verify_snapshot(yaml_dir) == []
+
+def test_snapshot_is_stale_when_a_file_grows_with_its_mtime_kept(asset_dir):
+    yaml_dir = asset_dir(20)
+    yaml_io.export_snapshot(yaml_dir)
+
+    # ex. cp -p / rsync -t of an edited file
+    path = yaml_dir + sorted(os.listdir(yaml_dir))[0]
+    stat = os.stat(path)
+    with open(path, 'a') as outfile:
+        outfile.write("extra: 1\n")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assets = yaml_io.read_yaml(yaml_dir, use_cache=False)
+    assert assets[0].asset["extra"] == 1
+
+    fqdn = os.path.basename(path).removesuffix(".yaml")
+    with pytest.raises(KeyError):
+        yaml_io.snapshot_asset(yaml_dir, fqdn)
+
+def test_snapshot_is_stale_when_a_file_is_added(asset_dir):
+    yaml_dir = asset_dir(20)
+    yaml_io.export_snapshot(yaml_dir)
+
+    extra = synthetic.make_inventory(1, 1)
+    synthetic.write_inventory(yaml_dir, [("added.chtc.wisc.edu", extra[0][1])])
+
+    assets = yaml_io.read_yaml(yaml_dir, use_cache=False)
+    assert "added.chtc.wisc.edu" in [asset.fqdn for asset in assets]
@@ -0,0 +1,39 @@
+import synthetic
+import yaml_io
+
+def make_asset(yaml_dir: str) -> tuple:
+    fqdn, data = synthetic.make_inventory(1)[0]
+    asset = yaml_io.Asset(fqdn=fqdn)
+    asset.asset = data
+    return (asset, f"{yaml_dir}{fqdn}.yaml")
+
+def test_unchanged_assets_are_not_written_again(tmp_path):
+    asset, path = make_asset(str(tmp_path) + "/")
+
+    with yaml_io.AssetWriter() as writer:
+        writer.add(asset, path)
+    assert writer.written == [path]
+
+    with yaml_io.AssetWriter() as writer:
+        writer.add(asset, path)
+    assert writer.written == []
+    assert writer.unchanged == [path]
+
+def test_a_stale_digest_does_not_skip_the_write(tmp_path):
+    asset, path = make_asset(str(tmp_path) + "/")
+
+    with yaml_io.AssetWriter() as writer:
+        writer.add(asset, path)
+    with open(path, 'rb') as infile:
+        original = infile.read()
+
+    # edited behind the writer's back - asset.digest still describes what it wrote
+    with open(path, 'w') as outfile:
+        outfile.write("edited: elsewhere\n")
+
+    with yaml_io.AssetWriter() as writer:
+        writer.add(asset, path)
+
+    assert writer.written == [path]
+    with open(path, 'rb') as infile:
+        assert infile.read() == original
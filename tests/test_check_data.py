@@ -0,0 +1,31 @@
+import json
+
+import check_data
+import yaml_io
+
+def test_json_output_reports_unreadable_files(asset_dir, capsys):
+    yaml_dir = asset_dir(10)
+    with open(yaml_dir + "broken.chtc.wisc.edu.yaml", 'w') as outfile:
+        outfile.write("bad: [unclosed\n")
+
+    assets = yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False)
+    assert len(assets) == 10
+
+    # the loader's warning stays off stdout
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "broken.chtc.wisc.edu.yaml" in captured.err
+
+    stats = []
+    check_data.run_checks(assets, [], stats=stats)
+    unreadable = check_data.unreadable_files(yaml_dir, assets)
+
+    document = json.loads(check_data.format_json(stats, {"assets" : len(assets)}, False, unreadable))
+    assert document["summary"]["unreadable"] == 1
+    assert document["errors"][-1]["rule"] == "unreadable"
+    assert document["errors"][-1]["file"] == "broken.chtc.wisc.edu.yaml"
+
+    lines = check_data.format_json(stats, {"assets" : len(assets)}, True, unreadable).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert records[-2]["rule"] == "unreadable"
+    assert records[-1]["summary"]["unreadable"] == 1
@@ -0,0 +1,138 @@
+import os
+import random
+import functools
+
+import yaml_io
+import check_data
+import check_state
+import rule_config
+import inventory_table
+
+# the values edited assets get - missing spellings, shared racks/units/tags, and dates on
+# both sides of the age rules' cutoffs
+VALUES = ["", "none", "???", "MISSING", "R1", "R2", "U1", "U2", "1", "2-4", "3", "11-12", "2015-01-01", "2025-06-01"]
+TAGS = ["location.rack", "location.elevation", "location.room", "hardware.condo_chassis.identifier", "tags.uw", "acquisition.po", "acquisition.date", "hardware.model"]
+
+SELECTIONS = [[], ["missing"], ["conflicting"], ["uwtag"], ["overlap"], ["missing", "overlap"]]
+
+def load(yaml_dir: str) -> list:
+    return yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False)
+
+def text(errs: list) -> list[str]:
+    return [str(err) for err in errs]
+
+def full_check(yaml_dir: str, names: list) -> tuple:
+    fixes = []
+    errs = check_data.run_checks(inventory_table.InventoryTable(load(yaml_dir)), names, fixes)
+    return (text(errs), sorted((fix.asset.fqdn, sorted(fix.values.items())) for fix in fixes))
+
+def incremental_check(yaml_dir: str, names: list, state_path: str) -> tuple:
+    fixes = []
+    errs = check_data.run_incremental(load(yaml_dir), names, state_path, fixes)
+    return (text(errs), sorted((fix.asset.fqdn, sorted(fix.values.items())) for fix in fixes))
+
+# edits, removes, and copies a few asset files
+def mutate(yaml_dir: str, rng: random.Random, step: int):
+    files = sorted(os.listdir(yaml_dir))
+
+    for _ in range(rng.randrange(1, 5)):
+        name = rng.choice(files)
+        roll = rng.random()
+
+        if roll < 0.7:
+            asset = yaml_io.Asset(yaml_dir + name)
+            for _ in range(rng.randrange(1, 3)):
+                asset.put(rng.choice(TAGS), rng.choice(VALUES))
+            yaml_io.write_yaml(asset, yaml_dir + name)
+
+        elif roll < 0.85 and len(files) > 2:
+            os.remove(yaml_dir + name)
+            files.remove(name)
+
+        else:
+            copy = f"copy{step}-{rng.randrange(100)}.chtc.wisc.edu.yaml"
+            asset = yaml_io.Asset(yaml_dir + name)
+            yaml_io.write_yaml(asset, yaml_dir + copy)
+            files.append(copy)
+
+def test_incremental_matches_full_check_as_files_change(asset_dir):
+    yaml_dir = asset_dir(120, 3)
+    state_path = check_state.state_path_for(yaml_dir)
+    rng = random.Random(7)
+
+    for step in range(25):
+        names = rng.choice(SELECTIONS)
+        assert incremental_check(yaml_dir, names, state_path) == full_check(yaml_dir, names), f"step {step}, rules {names}"
+        mutate(yaml_dir, rng, step)
+
+def test_unchanged_assets_are_not_checked_again(asset_dir):
+    yaml_dir = asset_dir(120, 3)
+    state_path = check_state.state_path_for(yaml_dir)
+
+    assets = load(yaml_dir)
+
+    # a fresh run looks at every asset once per rule - like run_checks()
+    stats = []
+    check_data.run_incremental(assets, [], state_path, stats=stats)
+    assert {rule.name : rule.assets for rule in stats} == {name : len(assets) for name in check_data.RULES}
+
+    # age rules depend on today's date, so only they look at everything again
+    stats = []
+    check_data.run_incremental(load(yaml_dir), [], state_path, stats=stats)
+    for rule in stats:
+        expected = len(assets) if check_data.DEFINITIONS[rule.name].type == "age" else 0
+        assert rule.assets == expected, rule.name
+
+def test_state_round_trips(tmp_path):
+    path = str(tmp_path / "state")
+
+    state = check_state.CheckState(path, ["tags.uw"], ["missing"])
+    state.add("a.yaml", check_state.AssetResult("da", {}, {}, {}, {"tags.uw" : "U1"}))
+    state.add("b.yaml", check_state.AssetResult("db", {}, {}, {}, {"tags.uw" : "U1"}))
+    state.save()
+
+    loaded = check_state.CheckState(path, ["tags.uw"], ["missing"])
+    assert loaded.group("tags.uw", "U1") == ["a.yaml", "b.yaml"]
+    assert loaded.results["a.yaml"].digest == "da"
+
+    loaded.remove("a.yaml")
+    loaded.remove("b.yaml")
+    assert loaded.members["tags.uw"] == {}
+
+def test_state_made_for_other_rules_is_thrown_away(tmp_path):
+    path = str(tmp_path / "state")
+
+    state = check_state.CheckState(path, ["tags.uw"], ["missing"])
+    state.add("a.yaml", check_state.AssetResult("da", {}, {}, {}, {"tags.uw" : "U1"}))
+    state.save()
+
+    assert check_state.CheckState(path, ["tags.uw"], []).results == {}
+    assert check_state.CheckState(path, ["location.rack"], ["missing"]).results == {}
+
+def test_unreadable_state_is_ignored(tmp_path, capsys):
+    path = tmp_path / "state"
+    path.write_bytes(b"not a pickle")
+
+    assert check_state.CheckState(str(path), ["tags.uw"]).results == {}
+    assert "ignoring unreadable check state" in capsys.readouterr().err
+
+def test_editing_a_rule_throws_the_state_away(tmp_path, asset_dir, monkeypatch):
+    yaml_dir = asset_dir(120, 3)
+    state_path = check_state.state_path_for(yaml_dir)
+    assert incremental_check(yaml_dir, [], state_path) == full_check(yaml_dir, [])
+
+    # tags.uw needs a value now - and the message says so
+    with open(rule_config.RULES_PATH, 'r') as infile:
+        text = infile.read()
+    assert "    - tags.uw\n" in text and "message: tags are missing values" in text
+
+    rules_path = tmp_path / "rules.yaml"
+    rules_path.write_text(text.replace("    - tags.uw\n", "", 1).replace("message: tags are missing values", "message: tags (tags.uw too) are missing values", 1))
+
+    definitions = rule_config.load_rules(str(rules_path))
+    monkeypatch.setattr(check_data, "DEFINITIONS", definitions)
+    monkeypatch.setattr(check_data, "RULES", {name : functools.partial(check_data.RULE_CLASSES[definition.type], definition) for name, definition in definitions.items()})
+
+    incremental = incremental_check(yaml_dir, [], state_path)
+    assert incremental == full_check(yaml_dir, [])
+    assert any("tags.uw too" in err for err in incremental[0])
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import yaml_io
+import git_index
+
+def fqdns(assets: list) -> list:
+    return [(asset.fqdn, asset.asset) for asset in assets]
+
+def test_outside_a_repo_falls_back_to_read_yaml(asset_dir):
+    yaml_dir = asset_dir(10)
+    yaml_io.export_snapshot(yaml_dir)
+
+    index = git_index.GitIndex(yaml_dir)
+    assets = index.load()
+
+    assert fqdns(assets) == fqdns(yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False))
+    assert index.full
+
+    # nothing to tie an index to
+    assert not os.path.exists(index.path)
+
+def test_only_changed_files_are_parsed_after_the_first_commit(tmp_path, asset_dir):
+    git = pytest.importorskip("git")
+
+    yaml_dir = asset_dir(10)
+    repo = git.Repo.init(tmp_path)
+    repo.index.add([os.path.join("assets", name) for name in os.listdir(yaml_dir)])
+    repo.index.commit("assets", author=git.Actor("test", "test@example.com"))
+
+    first = git_index.GitIndex(yaml_dir)
+    assets = first.load()
+    assert first.full
+    assert os.path.exists(first.path)
+
+    name = sorted(os.listdir(yaml_dir))[0]
+    asset = yaml_io.Asset(yaml_dir + name)
+    asset.asset["hardware"]["notes"] = "changed"
+    yaml_io.write_yaml(asset, yaml_dir + name)
+
+    second = git_index.GitIndex(yaml_dir)
+    assets = second.load()
+    assert not second.full
+    assert second.changed == [name]
+    assert fqdns(assets) == fqdns(yaml_io.read_yaml(yaml_dir, use_cache=False, use_snapshot=False))
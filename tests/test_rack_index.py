@@ -0,0 +1,44 @@
+import itertools
+import random
+
+import rack_index
+
+def overlap(first: tuple, second: tuple) -> bool:
+    return first[0] <= second[1] and second[0] <= first[1]
+
+def test_a_chain_of_overlaps_is_not_one_group():
+    spans = [(1, 2, "a"), (2, 3, "b"), (3, 4, "c")]
+    assert rack_index.overlapping(spans) == [["a", "b"], ["b", "c"]]
+
+def test_ranges_sharing_a_unit_are_one_group():
+    spans = [(1, 4, "big"), (2, 2, "x"), (2, 3, "y"), (6, 7, "alone")]
+    assert rack_index.overlapping(spans) == [["big", "x", "y"]]
+
+def test_a_range_can_be_in_more_than_one_group():
+    spans = [(1, 4, "big"), (1, 2, "low"), (3, 4, "high")]
+    assert rack_index.overlapping(spans) == [["low", "big"], ["big", "high"]]
+
+def test_groups_are_exactly_the_largest_sets_that_overlap_pairwise():
+    rng = random.Random(0)
+
+    for _ in range(300):
+        spans = []
+        for member in range(rng.randrange(0, 9)):
+            low = rng.randrange(1, 12)
+            spans.append((low, low + rng.randrange(0, 3), member))
+
+        by_member = {member : (low, high) for low, high, member in spans}
+        groups = [set(group) for group in rack_index.overlapping(spans)]
+
+        # every pair in a group overlaps...
+        for group in groups:
+            assert all(overlap(by_member[a], by_member[b]) for a, b in itertools.combinations(group, 2))
+
+        # ...and every overlapping pair is in a group, which no other range could join
+        for a, b in itertools.combinations(by_member, 2):
+            if overlap(by_member[a], by_member[b]):
+                assert any({a, b} <= group for group in groups)
+
+        for group in groups:
+            for other in by_member.keys() - group:
+                assert not all(overlap(by_member[other], by_member[member]) for member in group)
@@ -0,0 +1,225 @@
+import json
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import format_vars
+import fake_service
+import sheets_client
+
+# time that only moves when something sleeps
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({"status" : status}), b"")
+
+# a call that fails with the next of a list of statuses - and runs once they run out
+class FailingRequest:
+    def __init__(self, request, failures: list[int]):
+        self.request = request
+        self.failures = failures
+
+    def execute(self):
+        if self.failures:
+            raise http_error(self.failures.pop(0))
+
+        return self.request.execute()
+
+# the spreadsheets() of a fake service whose batchUpdate() calls fail first
+class FailingSpreadsheets:
+    def __init__(self, service, failures: list[int]):
+        self.spreadsheets = fake_service.FakeSpreadsheets(service)
+        self.failures = failures
+
+    def __getattr__(self, name: str):
+        return getattr(self.spreadsheets, name)
+
+    def batchUpdate(self, **kwargs):
+        return FailingRequest(self.spreadsheets.batchUpdate(**kwargs), self.failures)
+
+class FailingService(fake_service.FakeSheetsService):
+    def __init__(self, failures: list[int]):
+        fake_service.FakeSheetsService.__init__(self)
+        self.failures = failures
+
+    def spreadsheets(self):
+        return FailingSpreadsheets(self, self.failures)
+
+def make_client(service, clock: FakeClock) -> sheets_client.SheetsClient:
+    spreadsheet = service.add_spreadsheet("test", "test")
+    spreadsheet.sheets[0].title = format_vars.MAIN_SHEET_NAME
+    spreadsheet.sheets[0].write(0, 0, [["a"], ["b"], ["c"]])
+
+    return sheets_client.SheetsClient(service, "test", clock=clock, sleep=clock.sleep)
+
+def insert_row(index: int) -> dict:
+    return {"insertDimension" : {"range" : {"sheetId" : 0, "dimension" : "ROWS", "startIndex" : index, "endIndex" : index + 1}}}
+
+def title(text: str) -> dict:
+    return {"updateSpreadsheetProperties" : {"properties" : {"title" : text}, "fields" : "title"}}
+
+def test_chunk_keeps_order_under_both_limits():
+    items = [{"n" : i} for i in range(25)]
+
+    chunks = sheets_client.chunk(items, 10, 10 ** 6)
+    assert [len(part) for part in chunks] == [10, 10, 5]
+    assert [item for part in chunks for item in part] == items
+
+    size = len(json.dumps(items[0])) + 1
+    chunks = sheets_client.chunk(items, 100, size * 4)
+    assert all(len(part) <= 4 for part in chunks)
+    assert [item for part in chunks for item in part] == items
+
+def test_chunk_gives_an_oversized_item_its_own_chunk():
+    items = [{"n" : 1}, {"big" : "x" * 100}, {"n" : 2}]
+    assert sheets_client.chunk(items, 10, 50) == [[items[0]], [items[1]], [items[2]]]
+    assert sheets_client.chunk([], 10, 50) == []
+
+def test_split_range_splits_rows_and_keeps_their_cells():
+    values = [[f"r{row}", "x" * 20] for row in range(100)]
+    data = {"range" : "Inventory!A2:B101", "values" : values}
+
+    ranges = sheets_client.split_range(data, 500)
+    assert len(ranges) > 1
+    assert all(len(json.dumps(part["values"])) <= 500 for part in ranges)
+    assert [row for part in ranges for row in part["values"]] == values
+
+    row = 2
+    for part in ranges:
+        assert part["range"] == f"Inventory!A{row}:B{row + len(part['values']) - 1}"
+        row += len(part["values"])
+
+def test_split_range_leaves_small_and_open_ended_ranges_whole():
+    small = {"range" : "Inventory!A2:B3", "values" : [["a", "b"], ["c", "d"]]}
+    assert sheets_client.split_range(small, 1000) == [small]
+
+    values = [["x" * 20] for row in range(100)]
+    for range_str in ["Inventory", "Inventory!A:B", "Inventory!A2"]:
+        data = {"range" : range_str, "values" : values}
+        assert sheets_client.split_range(data, 100) == [data]
+
+def test_token_bucket_allows_a_burst_then_paces_calls():
+    clock = FakeClock()
+    bucket = sheets_client.TokenBucket(60, burst=10, clock=clock, sleep=clock.sleep)
+
+    for _ in range(10):
+        bucket.take()
+    assert clock.sleeps == []
+
+    bucket.take()
+    assert clock.sleeps == [pytest.approx(60 / 50)]
+
+def test_token_bucket_stays_under_the_quota():
+    clock = FakeClock()
+    bucket = sheets_client.TokenBucket(60, clock=clock, sleep=clock.sleep)
+
+    times = []
+    for _ in range(300):
+        bucket.take()
+        times.append(clock.now)
+
+    # no minute holds more than 60 calls - and the quota isn't left unused either
+    for first, start in enumerate(times):
+        assert sum(1 for time in times[first:] if time < start + 60.0 - 1e-6) <= 60
+    assert times[-1] == pytest.approx((300 - sheets_client.BURST) * 60 / (60 - sheets_client.BURST))
+
+def test_token_bucket_refills_while_idle():
+    clock = FakeClock()
+    bucket = sheets_client.TokenBucket(60, burst=10, clock=clock, sleep=clock.sleep)
+
+    for _ in range(10):
+        bucket.take()
+
+    clock.now += 3600
+    for _ in range(10):
+        bucket.take()
+    assert clock.sleeps == []
+
+def test_execute_retries_only_retryable_statuses(monkeypatch):
+    monkeypatch.setattr(sheets_client.random, "uniform", lambda low, high: 0.0)
+    clock = FakeClock()
+
+    failures = [503, 429, 500]
+    response = sheets_client.execute(lambda: FailingRequest(fake_service.FakeRequest(fake_service.FakeStats(), lambda: "done"), failures), sleep=clock.sleep)
+    assert response == "done"
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+    with pytest.raises(HttpError):
+        sheets_client.execute(lambda: FailingRequest(None, [400]), sleep=clock.sleep)
+
+def test_execute_gives_up_after_max_retries():
+    clock = FakeClock()
+    failures = [503] * (sheets_client.MAX_RETRIES + 1)
+
+    with pytest.raises(HttpError):
+        sheets_client.execute(lambda: FailingRequest(None, failures), sleep=clock.sleep)
+
+    assert len(clock.sleeps) == sheets_client.MAX_RETRIES
+    assert all(delay <= sheets_client.BACKOFF_MAX for delay in clock.sleeps)
+
+def test_row_changes_are_not_retried_after_a_server_error():
+    clock = FakeClock()
+    service = FailingService([503])
+    client = make_client(service, clock)
+
+    with pytest.raises(HttpError):
+        client.batch_update([insert_row(1)])
+
+    # tried once - it may have been applied, so sending it again could shift rows twice
+    assert service.stats.calls == 0
+    assert clock.sleeps == []
+
+def test_row_changes_are_retried_when_rate_limited():
+    clock = FakeClock()
+    service = FailingService([429])
+    client = make_client(service, clock)
+
+    client.batch_update([insert_row(1)])
+    assert service.stats.calls == 1
+    assert len(service.spreadsheet("test").sheets[0].grid) == 4
+
+def test_other_requests_are_retried_after_a_server_error():
+    clock = FakeClock()
+    service = FailingService([503, 502])
+    client = make_client(service, clock)
+
+    client.batch_update([title("retried")])
+    assert service.spreadsheet("test").title == "retried"
+    assert len(clock.sleeps) == 2
+
+def test_big_batches_go_out_in_order(monkeypatch):
+    monkeypatch.setattr(sheets_client, "MAX_BATCH_REQUESTS", 3)
+    clock = FakeClock()
+    service = fake_service.FakeSheetsService()
+    client = make_client(service, clock)
+
+    client.batch_update([title(f"title {i}") for i in range(10)])
+    assert service.stats.calls == 4
+    assert service.stats.subrequests == 10
+    assert service.spreadsheet("test").title == "title 9"
+
+def test_calls_wait_on_the_write_quota():
+    clock = FakeClock()
+    service = fake_service.FakeSheetsService()
+    client = make_client(service, clock)
+
+    for i in range(sheets_client.WRITES_PER_MINUTE):
+        client.batch_update([title(f"title {i}")])
+
+    # the burst goes out right away, the rest trickle in over the minute
+    assert clock.now == pytest.approx(60.0)
+    assert service.stats.calls == sheets_client.WRITES_PER_MINUTE
@@ -0,0 +1,130 @@
+import copy
+import random
+
+import pytest
+
+import yaml_io
+import format_vars
+import fake_service
+import sync_plan
+import synthetic
+
+SPREADSHEET_ID = "test"
+
+# the tags edited assets get a new value for (besides their room)
+EDITED_TAGS = [("hardware", "notes"), ("hardware", "purpose"), ("tags", "uw"), ("location", "elevation")]
+
+def make_assets(count: int, seed: int, prefix: str="") -> list:
+    return [yaml_io.Asset(f"{prefix}{fqdn}.yaml", data=data) for fqdn, data in synthetic.make_inventory(count, seed)]
+
+# returns a changed copy of assets - removed, moved to another room, edited, and added to
+def change_assets(assets: list, rate: float, seed: int) -> list:
+    rng = random.Random(seed)
+    changed = []
+
+    for asset in assets:
+        if rng.random() >= rate:
+            changed.append(asset)
+            continue
+
+        roll = rng.random()
+        if roll < 0.25:
+            continue
+
+        data = copy.deepcopy(asset.asset)
+        if roll < 0.6:
+            data["location"]["room"] = rng.choice(synthetic.ROOMS)[0]
+        else:
+            section, tag = rng.choice(EDITED_TAGS)
+            data[section][tag] = f"edited {rng.randrange(1000)}"
+
+        changed.append(yaml_io.Asset(asset.filepath, data=data))
+
+    changed.extend(make_assets(int(len(assets) * rate / 2) + 1, seed, "new"))
+    return sorted(changed, key=lambda asset: asset.fqdn)
+
+# returns a fake service whose inventory tab holds assets - sorted
+def make_service(assets: list):
+    service = fake_service.FakeSheetsService()
+    spreadsheet = service.add_spreadsheet("test", SPREADSHEET_ID)
+
+    sheet = spreadsheet.sheets[0]
+    sheet.title = format_vars.MAIN_SHEET_NAME
+    sheet.write(0, 0, [["Hostname"] + format_vars.PRETTY_COL_NAMES])
+    sheet.write(1, 0, sorted((sync_plan.sheet_row(asset) for asset in assets), key=sync_plan.sort_key))
+
+    return service
+
+# reads the tab, plans its sync to assets, and sends the plan - like sheet_update.py
+def sync(service, assets: list, strategy: str="auto") -> sync_plan.SyncPlan:
+    spreadsheets = service.spreadsheets()
+    rows = spreadsheets.values().get(spreadsheetId=SPREADSHEET_ID, range=format_vars.MAIN_SHEET_NAME).execute().get("values", [])[1:]
+
+    plan = sync_plan.plan_sync(rows, assets, 0, format_vars.MAIN_SHEET_NAME, strategy)
+    if plan.requests:
+        spreadsheets.batchUpdate(spreadsheetId=SPREADSHEET_ID, body={"requests" : plan.requests}).execute()
+    if plan.data:
+        spreadsheets.values().batchUpdate(spreadsheetId=SPREADSHEET_ID, body={"valueInputOption" : "RAW", "data" : plan.data}).execute()
+
+    return plan
+
+# returns the tab's rows (no header) - padded out to every column
+def tab_rows(service) -> list:
+    return [sync_plan.pad_row(row) for row in service.spreadsheet(SPREADSHEET_ID).sheets[0].read(1)]
+
+@pytest.mark.parametrize("strategy", sync_plan.STRATEGIES)
+@pytest.mark.parametrize("count, rate", [(0, 0.0), (1, 1.0), (40, 0.1), (80, 0.5), (60, 1.0)])
+def test_sync_leaves_the_tab_sorted_and_matching(strategy, count, rate):
+    for seed in range(5):
+        before = make_assets(count, seed)
+        after = change_assets(before, rate, seed + 100)
+        service = make_service(before)
+
+        sync(service, after, strategy)
+
+        rows = tab_rows(service)
+        keys = [sync_plan.sort_key(row) for row in rows]
+        assert keys == sorted(keys)
+        assert sorted(rows) == sorted(sync_plan.sheet_row(asset) for asset in after)
+
+        # and there is nothing left to do
+        assert sync(service, after, strategy).empty()
+
+def test_one_asset_changing_room_is_a_single_move():
+    before = make_assets(60, 1)
+    service = make_service(before)
+
+    # the top row goes to the room that sorts last
+    top = tab_rows(service)[0][0]
+    after = []
+    for asset in before:
+        if asset.fqdn == top:
+            data = copy.deepcopy(asset.asset)
+            data["location"]["room"] = max(room for room, building in synthetic.ROOMS)
+            asset = yaml_io.Asset(asset.filepath, data=data)
+        after.append(asset)
+
+    plan = sync(service, after, "incremental")
+    assert (plan.deleted, plan.moved, plan.inserted) == (0, 1, 0)
+    assert [kind for request in plan.requests for kind in request] == ["moveDimension"]
+
+    rows = tab_rows(service)
+    keys = [sync_plan.sort_key(row) for row in rows]
+    assert keys == sorted(keys)
+    assert sorted(rows) == sorted(sync_plan.sheet_row(asset) for asset in after)
+
+def test_auto_picks_the_cheaper_plan():
+    before = make_assets(200, 3)
+    service = make_service(before)
+
+    # a single edit is cheaper to patch...
+    few = change_assets(before, 0.005, 4)
+    plan = sync(service, few)
+    assert not plan.rewrite
+    assert plan.costs[0] <= plan.costs[1]
+
+    # ...and a tab that is mostly new is cheaper to write out again
+    many = change_assets(few, 1.0, 5)
+    plan = sync(service, many)
+    assert plan.rewrite
+    assert plan.costs[1] < plan.costs[0]